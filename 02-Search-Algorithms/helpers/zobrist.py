@@ -0,0 +1,15 @@
+from typing import List
+from helpers.mt19937 import RandomGenerator
+
+# Zobrist hashing gives a random 64-bit key to every (cell, piece) pair that can appear in a state.
+# The key of a state is the XOR of the keys of its pairs. Since XOR is its own inverse, when a piece moves,
+# the key of the new state is computed from the parent's key in O(1): key ^ keys[old cell] ^ keys[new cell].
+# The random numbers come from a seeded generator, so the keys are the same in every run.
+
+# Returns a random 64-bit integer (made of two 32-bit random numbers)
+def random_key(rng: RandomGenerator) -> int:
+    return (rng.generate() << 32) | rng.generate()
+
+# Returns a table of random 64-bit keys (one for each of the "count" cells)
+def random_table(count: int, rng: RandomGenerator) -> List[int]:
+    return [random_key(rng) for _ in range(count)]
@@ -1,10 +1,12 @@
 from dataclasses import dataclass
-from typing import FrozenSet, Iterable
+from typing import FrozenSet, Iterable, List
 from enum import Enum
 
 from mathutils import Direction, Point
 from problem import Problem
 from helpers.utils import track_call_count
+from helpers.mt19937 import RandomGenerator
+from helpers.zobrist import random_table
 
 # This file contains the definition for the Sokoban problem
 # In this problem, the agent can move Up, Down, Left or Right
@@ -26,25 +28,47 @@ class SokobanTile(str, Enum):
 # we only need the default equality which compares objects by pointers.
 # The layout contains the problem details that are unchangeable across states such as:
 #   The walkable area (locations without walls) and the locations of the goals
+# It also contains the random Zobrist keys of the player and the crates at every cell (see "helpers/zobrist.py")
+# where the cell of the point (x, y) is at the index "y * width + x"
 @dataclass(eq=False, frozen=True)
 class SokobanLayout:
-    __slots__ = ("width", "height", "walkable", "goals")
+    __slots__ = ("width", "height", "walkable", "goals", "player_keys", "crate_keys")
     width: int
     height: int
     walkable: FrozenSet[Point]
     goals: FrozenSet[Point]
+    player_keys: List[int]
+    crate_keys: List[int]
+
+    # Creates a layout and generates its Zobrist keys (using a fixed seed, so the keys are the same in every run)
+    @staticmethod
+    def create(width: int, height: int, walkable: FrozenSet[Point], goals: FrozenSet[Point], seed: int = 0) -> 'SokobanLayout':
+        rng = RandomGenerator(seed)
+        return SokobanLayout(width, height, walkable, goals, random_table(width * height, rng), random_table(width * height, rng))
+
+    # Computes the Zobrist key of a state from scratch
+    def compute_key(self, player: Point, crates: FrozenSet[Point]) -> int:
+        key = self.player_keys[player.y * self.width + player.x]
+        for crate in crates:
+            key ^= self.crate_keys[crate.y * self.width + crate.x]
+        return key
 
 # For the sokoban state, we use dataclass with frozen=True to automatically implement:
-#   the constructor, the == operator, the hash function and to make the class immutable
-# Now it can be added to sets and used as keys in dictionaries
+#   the constructor, the == operator and to make the class immutable
+# The hash function returns the Zobrist key of the state, which "get_successor" updates incrementally from the parent's key,
+# so the state can be added to sets and used as keys in dictionaries without hashing the crates every time.
 # This will contain a reference to the sokoban layout and it will contain environment details that change across states such as:
 #   The player location and the locations of the crates 
 @dataclass(frozen=True)
 class SokobanState:
-    __slots__ = ("layout", "player", "crates")
+    __slots__ = ("layout", "player", "crates", "key")
     layout: SokobanLayout
     player: Point
     crates: FrozenSet[Point]
+    key: int # The Zobrist key of the state (see "SokobanLayout.compute_key")
+
+    def __hash__(self) -> int:
+        return self.key
 
     # This operator will convert the state to a string containing the grid representation of the level at the current state
     def __str__(self) -> str:
@@ -100,6 +124,9 @@ class SokobanProblem(Problem[SokobanState, Direction]):
     def get_successor(self, state: SokobanState, action: Direction) -> SokobanState:
         player = state.player + action.to_vector()
         crates = state.crates
+        layout = self.layout
+        width = layout.width
+        key = state.key ^ layout.player_keys[state.player.y * width + state.player.x] ^ layout.player_keys[player.y * width + player.x]
         if player not in self.layout.walkable:
             # If we try to walk into a wall, then this action is wrong
             raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
@@ -110,7 +137,8 @@ class SokobanProblem(Problem[SokobanState, Direction]):
                 raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
             # If we walk to a crate, we push it
             crates = crates.symmetric_difference({player,crate_position})
-        return SokobanState(state.layout, player, crates)
+            key ^= layout.crate_keys[player.y * width + player.x] ^ layout.crate_keys[crate_position.y * width + crate_position.x]
+        return SokobanState(state.layout, player, crates, key)
 
     def get_cost(self, state: SokobanState, action: Direction) -> float:
         # All actions have the same cost
@@ -140,8 +168,9 @@ class SokobanProblem(Problem[SokobanState, Direction]):
                         crates.add(Point(x, y))
                         goals.add(Point(x, y))
         problem = SokobanProblem()
-        problem.layout = SokobanLayout(width, height, frozenset(walkable), frozenset(goals))
-        problem.initial_state = SokobanState(problem.layout, player, frozenset(crates))
+        problem.layout = SokobanLayout.create(width, height, frozenset(walkable), frozenset(goals))
+        crates = frozenset(crates)
+        problem.initial_state = SokobanState(problem.layout, player, crates, problem.layout.compute_key(player, crates))
         return problem
 
     # Read a sokoban problem from file containing a grid of tiles
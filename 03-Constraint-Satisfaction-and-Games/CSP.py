@@ -1,4 +1,6 @@
-from typing import Callable, Dict, List, Any, Tuple
+from typing import Callable, Dict, FrozenSet, Iterable, List, Any, Optional, Tuple, Union
+from dataclasses import dataclass
+import operator, functools, pickle
 from helpers.utils import track_call_count
 
 # This is the type definition for an Assignment
@@ -6,23 +8,175 @@ from helpers.utils import track_call_count
 # If a variable is missing from an assignment, then its is still unassigned.
 Assignment = Dict[str, Any]
 
+# A relation is a declarative (and picklable) description of a constraint's condition.
+# Unlike lambdas, relations can be sent to other processes, saved to files and compared.
+# A relation can be called like the condition it describes, but it can also:
+#   - "compile" itself into a fast predicate (which is what the constraints actually call during the search).
+#   - build a lookup table of the supports of each value (only for binary relations) using "supports".
+@dataclass(frozen=True)
+class Relation:
+    # The number of values that the relation takes (1 for unary relations and 2 for binary relations).
+    arity = 2
+
+    def __call__(self, *values: Any) -> bool:
+        return self.compile()(*values)
+
+    # Returns a function that checks the relation as fast as possible.
+    # NOTE: The returned function is not necessarily picklable, so it should not be stored instead of the relation.
+    def compile(self) -> Callable[..., bool]:
+        raise NotImplementedError()
+
+    # For a binary relation, returns a dictionary that maps each value in domain1 to the set of values in domain2
+    # that satisfy the relation with it (as the first and the second arguments respectively).
+    def supports(self, domain1: Iterable[Any], domain2: Iterable[Any]) -> Dict[Any, FrozenSet[Any]]:
+        predicate = self.compile()
+        return {
+            value1: frozenset(value2 for value2 in domain2 if predicate(value1, value2))
+            for value1 in domain1
+        }
+
+# The unary relation: value == self.value
+@dataclass(frozen=True)
+class EqualTo(Relation):
+    value: Any
+    arity = 1
+
+    def compile(self) -> Callable[[Any], bool]:
+        return functools.partial(operator.eq, self.value)
+
+# The unary relation: value != self.value
+@dataclass(frozen=True)
+class NotEqualTo(Relation):
+    value: Any
+    arity = 1
+
+    def compile(self) -> Callable[[Any], bool]:
+        return functools.partial(operator.ne, self.value)
+
+# The binary relation: value1 == value2
+@dataclass(frozen=True)
+class Equal(Relation):
+    def compile(self) -> Callable[[Any, Any], bool]:
+        return operator.eq
+
+    def supports(self, domain1: Iterable[Any], domain2: Iterable[Any]) -> Dict[Any, FrozenSet[Any]]:
+        domain2 = frozenset(domain2)
+        empty = frozenset()
+        return {value1: (frozenset((value1,)) if value1 in domain2 else empty) for value1 in domain1}
+
+# The binary relation: value1 != value2
+@dataclass(frozen=True)
+class NotEqual(Relation):
+    def compile(self) -> Callable[[Any, Any], bool]:
+        return operator.ne
+
+    def supports(self, domain1: Iterable[Any], domain2: Iterable[Any]) -> Dict[Any, FrozenSet[Any]]:
+        domain2 = frozenset(domain2)
+        return {value1: domain2.difference((value1,)) for value1 in domain1}
+
+# The binary relation: value1 == value2 + self.offset
+@dataclass(frozen=True)
+class Offset(Relation):
+    offset: int
+
+    def compile(self) -> Callable[[Any, Any], bool]:
+        offset = self.offset
+        return lambda value1, value2: value1 == value2 + offset
+
+    def supports(self, domain1: Iterable[Any], domain2: Iterable[Any]) -> Dict[Any, FrozenSet[Any]]:
+        domain2 = frozenset(domain2)
+        empty = frozenset()
+        return {
+            value1: (frozenset((value1 - self.offset,)) if value1 - self.offset in domain2 else empty)
+            for value1 in domain1
+        }
+
+# The binary relation: value1 == value2 // self.divisor
+@dataclass(frozen=True)
+class Quotient(Relation):
+    divisor: int
+
+    def compile(self) -> Callable[[Any, Any], bool]:
+        divisor = self.divisor
+        return lambda value1, value2: value1 == value2 // divisor
+
+# The binary relation: value1 == value2 % self.divisor
+@dataclass(frozen=True)
+class Remainder(Relation):
+    divisor: int
+
+    def compile(self) -> Callable[[Any, Any], bool]:
+        divisor = self.divisor
+        return lambda value1, value2: value1 == value2 % divisor
+
+# The binary relation: the sum of the digits of value1 (written in the given base) == value2
+# For example, DigitSum(10) relates 123 to 6 (since 1 + 2 + 3 = 6).
+@dataclass(frozen=True)
+class DigitSum(Relation):
+    base: int = 10
+
+    def compile(self) -> Callable[[Any, Any], bool]:
+        base = self.base
+        def digit_sum_equals(value1: int, value2: int) -> bool:
+            total = 0
+            while value1 > 0:
+                value1, digit = divmod(value1, base)
+                total += digit
+            return total == value2
+        return digit_sum_equals
+
+# The binary relation defined by a table of the allowed (value1, value2) pairs.
+@dataclass(frozen=True)
+class Table(Relation):
+    pairs: FrozenSet[Tuple[Any, Any]]
+
+    # Builds the table of a relation (or any condition) over the given domains.
+    @staticmethod
+    def of(condition: Callable[[Any, Any], bool], domain1: Iterable[Any], domain2: Iterable[Any]) -> 'Table':
+        domain2 = list(domain2)
+        return Table(frozenset((value1, value2) for value1 in domain1 for value2 in domain2 if condition(value1, value2)))
+
+    def compile(self) -> Callable[[Any, Any], bool]:
+        pairs = self.pairs
+        return lambda value1, value2: (value1, value2) in pairs
+
+    def supports(self, domain1: Iterable[Any], domain2: Iterable[Any]) -> Dict[Any, FrozenSet[Any]]:
+        domain2 = frozenset(domain2)
+        related = {value1: [] for value1 in domain1}
+        for value1, value2 in self.pairs:
+            values = related.get(value1)
+            if values is not None and value2 in domain2:
+                values.append(value2)
+        return {value1: frozenset(values) for value1, values in related.items()}
+
 # The is the base class for all the constraints
 # The only function defined in a constraint is "is_satisfied" that checks if an assignment satisfies this constraint.
 class Constraint:
+    # If the constraint was created from a relation, this is the relation. Otherwise, it is None.
+    relation: Optional[Relation] = None
+
     # Given an assignment, this function returns True if it satisfies the constraint, and False otherwise.
     def is_satisfied(self, assignment: Assignment) -> bool:
         return False
 
 # This is a class for unary constraints (constraints involving one variable only).
+# The condition can be a function or a relation. If it is a relation, the constraint stores the relation and
+# uses its compiled predicate as the condition, so the constraint can be pickled.
 class UnaryConstraint(Constraint):
     variable: str  # The name of the variable that is in the constraint.
     condition: Callable[[Any], bool] # A function that takes the variable's value and returns whether it satisfies the constraint or not.
 
-    def __init__(self, variable: str, condition: Callable[[Any], bool]) -> None:
+    def __init__(self, variable: str, condition: Union[Callable[[Any], bool], Relation]) -> None:
         super().__init__()
         self.variable = variable
+        if isinstance(condition, Relation):
+            self.relation = condition
+            condition = condition.compile()
         self.condition = condition
 
+    def __reduce__(self):
+        return (type(self), (self.variable, self.relation if self.relation is not None else self.condition))
+
     # This function looks for the variable in the assignment and checks if it satisfies the constraint.
     # If the variable is unassigned, the assignment does not satisfy the condition.
     # Important: If the value of a variable in the assignment is None, then it is assumed as if it is unassigned.
@@ -36,10 +190,16 @@ class BinaryConstraint(Constraint):
     variables: Tuple[str, str]  # The name of the two variables that are in the constraint.
     condition: Callable[[Any, Any], bool] # A function that takes the variables' values and returns whether they satisfies the constraint or not.
 
-    def __init__(self, variables: Tuple[str, str], condition: Callable[[Any, Any], bool]) -> None:
+    def __init__(self, variables: Tuple[str, str], condition: Union[Callable[[Any, Any], bool], Relation]) -> None:
         super().__init__()
         self.variables = variables
+        if isinstance(condition, Relation):
+            self.relation = condition
+            condition = condition.compile()
         self.condition = condition
+
+    def __reduce__(self):
+        return (type(self), (self.variables, self.relation if self.relation is not None else self.condition))
     
     # This function looks for the variables in the assignment and checks if they satisfy the constraint.
     # If any of the variables are unassigned, the assignment does not satisfy the condition.
@@ -72,3 +232,126 @@ class Problem:
     # Return True if the assignment satisfies all the constraints.
     def satisfies_constraints(self, assignment: Assignment) -> bool:
         return all(constraint.is_satisfied(assignment) for constraint in self.constraints)
+
+    # Saves the problem to a file, so it can be loaded (using "Problem.load") much faster than parsing it again.
+    # IMPORTANT: All the constraints must be created from relations since functions (e.g. lambdas) cannot be saved.
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Loads a problem saved by "save".
+    # If a loader is given, the loaded constraints are shared with the other problems loaded by the same loader
+    # (see "ProblemLoader" and "__setstate__"), otherwise the constraints are not shared with any other problem.
+    @staticmethod
+    def load(path: str, loader: Optional['ProblemLoader'] = None) -> 'Problem':
+        previous = Problem.__loading_constraints
+        Problem.__loading_constraints = loader.constraints if loader is not None else {}
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        finally:
+            Problem.__loading_constraints = previous
+
+    # The cached index of the binary constraints is not saved (it is rebuilt when needed).
+    # The domains that are ranges of integers (e.g. the digits) are saved as ranges, since a set is rebuilt from a range
+    # much faster than it is unpickled value by value.
+    # If all the constraints were created from relations, they are saved compactly: every distinct relation is saved once,
+    # and each constraint is saved as (the index of its relation, its variable(s)).
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state.pop("_Problem__constraint_index", None)
+        domains = state.get("domains")
+        if domains:
+            state["domains"] = {variable: Problem.__compact_domain(domain) for variable, domain in domains.items()}
+        constraints = state.get("constraints")
+        if constraints and all(constraint.relation is not None for constraint in constraints):
+            relations: Dict[Relation, int] = {}
+            state["constraints"] = [
+                (
+                    relations.setdefault(constraint.relation, len(relations)),
+                    constraint.variables if isinstance(constraint, BinaryConstraint) else constraint.variable,
+                )
+                for constraint in constraints
+            ]
+            state["relations"] = list(relations)
+        return state
+
+    # The loaded constraints are looked up in the cache of the current load, which maps every relation to its constraints
+    # (by their variables). The cache belongs to the loader (if any), so loading many problems that have the same constraints
+    # (e.g. sudoku puzzles of the same size) with the same loader creates every constraint once, and later loads only look
+    # them up (like "SudokuSkeleton" does when the puzzles are parsed).
+    # The constraints are never modified by the solvers, so they can be shared between problems.
+    # The missing constraints are created without calling their constructors (every relation is only compiled once).
+    __loading_constraints: Optional[Dict[Relation, Dict[Any, Constraint]]] = None # The cache of the current load
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        domains = state.get("domains")
+        if domains:
+            state["domains"] = {
+                variable: (set(domain) if type(domain) is range else domain) for variable, domain in domains.items()
+            }
+        relations = state.pop("relations", None)
+        if relations is not None:
+            loaded_constraints = Problem.__loading_constraints
+            if loaded_constraints is None: # The problem is unpickled directly (not by "load")
+                loaded_constraints = {}
+            caches = [loaded_constraints.setdefault(relation, {}) for relation in relations]
+            conditions: List[Optional[Callable[..., bool]]] = [None] * len(relations)
+            constraints = []
+            for index, scope in state["constraints"]:
+                constraint = caches[index].get(scope)
+                if constraint is None:
+                    relation, condition = relations[index], conditions[index]
+                    if condition is None:
+                        condition = conditions[index] = relation.compile()
+                    if relation.arity == 2:
+                        constraint = object.__new__(BinaryConstraint)
+                        constraint.__dict__ = {"variables": scope, "relation": relation, "condition": condition}
+                    else:
+                        constraint = object.__new__(UnaryConstraint)
+                        constraint.__dict__ = {"variable": scope, "relation": relation, "condition": condition}
+                    caches[index][scope] = constraint
+                constraints.append(constraint)
+            state["constraints"] = constraints
+        self.__dict__.update(state)
+
+    # Returns the domain as a range if it is a set of consecutive integers, otherwise it is returned as it is
+    @staticmethod
+    def __compact_domain(domain: Any) -> Any:
+        if type(domain) is not set or not domain or not all(type(value) is int for value in domain):
+            return domain
+        low, high = min(domain), max(domain)
+        return range(low, high + 1) if high - low + 1 == len(domain) else domain
+
+    # Returns the binary constraints that involve the given variable (in the same order as they appear in "constraints").
+    # The index is built once and cached. It is rebuilt if "constraints" is replaced by another list or if its size changes
+    # (for example, after 1-Consistency removes the unary constraints).
+    def get_binary_constraints(self, variable: str) -> List[BinaryConstraint]:
+        cache = getattr(self, "_Problem__constraint_index", None)
+        if cache is None or cache[0] is not self.constraints or cache[1] != len(self.constraints):
+            index = {}
+            for constraint in self.constraints:
+                if isinstance(constraint, BinaryConstraint):
+                    variable1, variable2 = constraint.variables
+                    index.setdefault(variable1, []).append(constraint)
+                    if variable2 != variable1:
+                        index.setdefault(variable2, []).append(constraint)
+            cache = self.__constraint_index = (self.constraints, len(self.constraints), index)
+        return cache[2].get(variable, [])
+
+# Loads many problems saved by "Problem.save" and shares the constraints between them.
+# The problems that have the same constraints (e.g. sudoku puzzles of the same size) get the same constraint objects,
+# so every constraint is only created once per loader. The cache lives as long as the loader (or until it is cleared).
+class ProblemLoader:
+    constraints: Dict[Relation, Dict[Any, Constraint]]  # The loaded constraints of every relation (by their variables)
+
+    def __init__(self) -> None:
+        self.constraints = {}
+
+    # Loads a problem saved by "Problem.save"
+    def load(self, path: str) -> Problem:
+        return Problem.load(path, self)
+
+    # Forgets the loaded constraints, so the problems loaded later do not share them with the problems loaded before
+    def clear(self) -> None:
+        self.constraints.clear()
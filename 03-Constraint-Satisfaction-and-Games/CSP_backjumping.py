@@ -0,0 +1,172 @@
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+from collections import OrderedDict
+from CSP import Assignment, BinaryConstraint, Problem
+from CSP_solver import SupportCounts, least_restraining_values, minimum_remaining_values, one_consistency
+
+# A nogood is a partial assignment that cannot be extended to a solution.
+# It is stored as a frozenset of (variable, value) pairs so that it can be hashed.
+Nogood = FrozenSet[Tuple[str, Any]]
+
+# This class stores the nogoods learned during the search.
+# The store is bounded: when it is full, the least recently used nogood is evicted.
+# A nogood is "used" when it is added or when it prunes a value during the search.
+class NogoodStore:
+    capacity: int                                   # The maximum number of nogoods in the store.
+    nogoods: "OrderedDict[Nogood, None]"            # The stored nogoods ordered from the least to the most recently used.
+    index: Dict[Tuple[str, Any], Set[Nogood]]       # For each (variable, value) pair, the nogoods that contain it.
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.nogoods = OrderedDict()
+        self.index = {}
+
+    def __len__(self) -> int:
+        return len(self.nogoods)
+
+    # Adds a nogood to the store and evicts the least recently used nogood if the store is full.
+    def add(self, nogood: Nogood) -> None:
+        if self.capacity <= 0:
+            return
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+        if len(self.nogoods) >= self.capacity:
+            evicted, _ = self.nogoods.popitem(last=False)
+            for literal in evicted:
+                self.index[literal].discard(evicted)
+        self.nogoods[nogood] = None
+        for literal in nogood:
+            self.index.setdefault(literal, set()).add(nogood)
+
+    # Returns a nogood that contains the given variable & value and is violated by the assignment, or None if there is none.
+    # The assignment must already contain the given variable & value.
+    def find_violated(self, assignment: Assignment, variable: str, value: Any) -> Optional[Nogood]:
+        for nogood in self.index.get((variable, value), ()):
+            if all(assignment.get(other) == other_value for other, other_value in nogood):
+                self.nogoods.move_to_end(nogood)
+                return nogood
+        return None
+
+# This function solves CSP problems using backtracking search with forward checking and conflict-directed backjumping (FC-CBJ).
+# Every unassigned variable keeps a set of the assigned variables whose forward checking pruned its domain (its "culprits").
+# When a variable runs out of values, the search jumps back to the deepest variable in its conflict set instead of
+# the previous variable, and the assignment of the conflict set is recorded as a nogood so that it is never explored again.
+# The arguments are:
+#   - variable_ordering: either "mrv" (minimum remaining values) or "dom/wdeg" (the domain size divided by the
+#     weighted degree, where the weight of a constraint is increased every time it wipes out a domain).
+#   - nogood_capacity: the maximum number of stored nogoods (0 disables nogood learning).
+# The value ordering is decided by the "least restraining value" heuristic.
+# Like "CSP_solver.solve", the explored nodes are counted by calling "problem.is_complete" once for every explored assignment.
+def solve_with_backjumping(
+    problem: Problem,
+    variable_ordering: str = "mrv",
+    nogood_capacity: int = 10000,
+) -> Optional[Assignment]:
+    if variable_ordering not in ("mrv", "dom/wdeg"):
+        raise ValueError(f"Unknown variable ordering: {variable_ordering}")
+
+    if not one_consistency(problem):
+        return None
+
+    # For each variable, the list of (constraint index, other variable) for the binary constraints that involve it
+    neighbors: Dict[str, List[Tuple[int, str]]] = {variable: [] for variable in problem.variables}
+    binary_constraints: List[BinaryConstraint] = []
+    for constraint in problem.constraints:
+        if isinstance(constraint, BinaryConstraint):
+            variable1, variable2 = constraint.variables
+            neighbors[variable1].append((len(binary_constraints), variable2))
+            neighbors[variable2].append((len(binary_constraints), variable1))
+            binary_constraints.append(constraint)
+    weights = [1] * len(binary_constraints)
+    order = {variable: index for index, variable in enumerate(problem.variables)}
+
+    supports = SupportCounts(problem, problem.domains)
+    nogoods = NogoodStore(nogood_capacity)
+
+    # Returns the next variable to assign based on the selected variable ordering.
+    # Ties are broken by the order in which the variables appear in "problem.variables".
+    def select_variable(domains: Dict[str, set]) -> str:
+        if variable_ordering == "mrv":
+            return minimum_remaining_values(problem, domains)
+        def score(variable: str) -> Tuple[float, int]:
+            weighted_degree = sum(weights[index] for index, other in neighbors[variable] if other in domains)
+            return len(domains[variable]) / max(weighted_degree, 1), order[variable]
+        return min(domains, key=score)
+
+    # Applies forward checking after assigning the value to the variable.
+    # It modifies "domains" and "culprits" and returns the variable whose domain was wiped out (or None if there is none).
+    def forward_check(
+        variable: str,
+        value: Any,
+        domains: Dict[str, set],
+        culprits: Dict[str, FrozenSet[str]],
+    ) -> Optional[str]:
+        for index, other in neighbors[variable]:
+            domain = domains.get(other)
+            if domain is None:
+                continue
+            constraint = binary_constraints[index]
+            condition = constraint.condition
+            if constraint.variables[0] == variable:
+                new_domain = {other_value for other_value in domain if condition(value, other_value)}
+            else:
+                new_domain = {other_value for other_value in domain if condition(other_value, value)}
+            if len(new_domain) == len(domain):
+                continue
+            domains[other] = new_domain
+            culprits[other] = culprits[other] | {variable}
+            if not new_domain:
+                weights[index] += 1
+                return other
+        return None
+
+    # Returns the solution (or None) and the conflict set that explains the failure (or None if a solution was found).
+    def recursive_search(
+        assignment: Assignment,
+        domains: Dict[str, set],
+        culprits: Dict[str, FrozenSet[str]],
+    ) -> Tuple[Optional[Assignment], Optional[Set[str]]]:
+        if problem.is_complete(assignment):
+            return assignment, None
+
+        variable = select_variable(domains)
+        # The variables that pruned this variable's domain are responsible for the values it can no longer take
+        conflict = set(culprits[variable])
+
+        for value in least_restraining_values(problem, variable, domains, supports):
+            new_assignment = assignment.copy()
+            new_assignment[variable] = value
+
+            # If the new assignment violates a learned nogood, skip the value
+            nogood = nogoods.find_violated(new_assignment, variable, value)
+            if nogood is not None:
+                conflict.update(other for other, _ in nogood if other != variable)
+                continue
+
+            new_domains = domains.copy()
+            del new_domains[variable]
+            new_culprits = culprits.copy()
+            wiped = forward_check(variable, value, new_domains, new_culprits)
+            if wiped is not None:
+                # The value failed because of this variable and the variables that previously pruned the wiped domain
+                conflict |= culprits[wiped]
+                continue
+
+            result, child_conflict = recursive_search(new_assignment, new_domains, new_culprits)
+            if result is not None:
+                return result, None
+
+            # If this variable is not responsible for the failure below it, changing its value is useless, so we jump over it
+            if variable not in child_conflict:
+                return None, child_conflict
+            child_conflict.discard(variable)
+            conflict |= child_conflict
+
+        # No value works, so the assignment of the conflict set cannot be extended to a solution
+        if conflict:
+            nogoods.add(frozenset((other, assignment[other]) for other in conflict))
+        return None, conflict
+
+    culprits = {variable: frozenset() for variable in problem.domains}
+    solution, _ = recursive_search({}, problem.domains, culprits)
+    return solution
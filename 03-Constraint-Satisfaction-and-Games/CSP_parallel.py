@@ -0,0 +1,175 @@
+from typing import Any, List, Optional, Tuple, Type
+import multiprocessing, os, queue
+from CSP import Assignment, Problem
+from CSP_solver import SupportCounts, backtracking_search, forward_checking, least_restraining_values, minimum_remaining_values, one_consistency
+from CSP_backjumping import solve_with_backjumping
+from helpers.mt19937 import RandomGenerator
+from helpers.utils import fetch_tracked_call_count
+
+# The parallel solvers do not send the problem itself to the workers (it only works if all its constraints are relations).
+# Instead, they send the problem type and the text from which the problem was read (which is much smaller),
+# and every worker rebuilds its own copy of the problem using "problem_type.from_text(text)".
+
+# A portfolio entry is (solver, variable ordering, seed) where:
+#   - the solver is either "backtrack" (CSP_solver) or "backjump" (CSP_backjumping).
+#   - the variable ordering is either "mrv" or "dom/wdeg" (only "mrv" is supported by "backtrack").
+#   - if the seed is not None, the variables are shuffled (using the seed) to change how the ties in the variable ordering are broken.
+PortfolioEntry = Tuple[str, str, Optional[int]]
+
+DEFAULT_PORTFOLIO: List[PortfolioEntry] = [
+    ("backtrack", "mrv", None),
+    ("backjump", "mrv", None),
+    ("backjump", "dom/wdeg", None),
+]
+
+# Returns the default portfolio extended (with seeded entries) to contain the given number of entries.
+def default_portfolio(size: int) -> List[PortfolioEntry]:
+    portfolio = DEFAULT_PORTFOLIO[:size]
+    seed = 0
+    while len(portfolio) < size:
+        _, ordering, _ = DEFAULT_PORTFOLIO[1 + seed % 2]
+        portfolio.append(("backjump", ordering, seed))
+        seed += 1
+    return portfolio
+
+# Shuffles the given list in place using the Fisher-Yates algorithm.
+def shuffle(items: List[Any], rng: RandomGenerator) -> None:
+    for index in range(len(items) - 1, 0, -1):
+        other = rng.int(0, index)
+        items[index], items[other] = items[other], items[index]
+
+# Runs a single portfolio entry on a fresh copy of the problem.
+def run_portfolio_entry(problem_type: Type[Problem], text: str, entry: PortfolioEntry) -> Optional[Assignment]:
+    solver, ordering, seed = entry
+    problem = problem_type.from_text(text)
+    if seed is not None:
+        shuffle(problem.variables, RandomGenerator(seed))
+    if solver == "backjump":
+        return solve_with_backjumping(problem, ordering)
+    if not one_consistency(problem):
+        return None
+    return backtracking_search(problem, {}, problem.domains, SupportCounts(problem, problem.domains))
+
+# This is the function run by each worker process.
+# A task is either ("split", (assignment, domains)) to continue the search from a split point,
+# or ("portfolio", entry) to solve the whole problem with a portfolio entry.
+# A None task tells the worker to stop.
+# For each task, the worker sends back the solution (or None) and the number of explored nodes.
+def worker(problem_type: Type[Problem], text: str, tasks: "multiprocessing.Queue", results: "multiprocessing.Queue") -> None:
+    problem, supports = None, None
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        kind, payload = task
+        fetch_tracked_call_count(Problem.is_complete) # Clear the call counter
+        if kind == "split":
+            if problem is None:
+                problem = problem_type.from_text(text)
+                one_consistency(problem)
+                supports = SupportCounts(problem, problem.domains)
+            assignment, domains = payload
+            solution = backtracking_search(problem, assignment, domains, supports)
+        else:
+            solution = run_portfolio_entry(problem_type, text, payload)
+        results.put((solution, fetch_tracked_call_count(Problem.is_complete)))
+
+# Sends the tasks to a pool of worker processes and returns the first solution found (or None if no task finds a solution).
+# As soon as a solution is found, all the workers are terminated (since the rest of the work is no longer needed).
+# The nodes explored by the workers are added to the call counter of "Problem.is_complete",
+# so they can be read by "fetch_tracked_call_count" as if the search ran in the current process.
+def run_tasks(problem_type: Type[Problem], text: str, tasks: List[Tuple[str, Any]], workers: int) -> Optional[Assignment]:
+    context = multiprocessing.get_context()
+    task_queue, result_queue = context.Queue(), context.Queue()
+    for task in tasks:
+        task_queue.put(task)
+    for _ in range(workers):
+        task_queue.put(None)
+    processes = [
+        context.Process(target=worker, args=(problem_type, text, task_queue, result_queue), daemon=True)
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    solution, remaining, explored = None, len(tasks), 0
+    try:
+        while remaining > 0:
+            try:
+                result, nodes = result_queue.get(timeout=0.1)
+            except queue.Empty:
+                # If all the workers died (e.g. due to an error), there is nothing left to wait for
+                if not any(process.is_alive() for process in processes) and result_queue.empty():
+                    break
+                continue
+            remaining -= 1
+            explored += nodes
+            if result is not None:
+                solution = result
+                break
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+    Problem.is_complete.calls = getattr(Problem.is_complete, "calls", 0) + explored
+    return solution
+
+# This function solves a CSP problem by splitting the top levels of the search tree into independent tasks.
+# The search tree is expanded (using MRV, LRV & forward checking like "CSP_solver.solve") up to "split_depth" levels,
+# and each node at that depth becomes a task that a worker continues using backtracking search.
+# The tasks are queued in the same order in which "CSP_solver.solve" would explore them.
+# The problem is given as its type and source text (see the note at the top of this file).
+def solve_by_splitting(
+    problem_type: Type[Problem],
+    text: str,
+    workers: Optional[int] = None,
+    split_depth: int = 2,
+) -> Optional[Assignment]:
+    workers = workers or os.cpu_count() or 1
+    problem = problem_type.from_text(text)
+    if not one_consistency(problem):
+        return None
+    supports = SupportCounts(problem, problem.domains)
+
+    tasks = []
+    # Expands the search tree and collects the tasks. It returns a solution if one is found before reaching the split depth.
+    def split(assignment: Assignment, domains: dict, depth: int) -> Optional[Assignment]:
+        if not domains:
+            return assignment
+        if depth == split_depth:
+            tasks.append(("split", (assignment, domains)))
+            return None
+        variable = minimum_remaining_values(problem, domains)
+        for value in least_restraining_values(problem, variable, domains, supports):
+            new_assignment = assignment.copy()
+            new_assignment[variable] = value
+            new_domains = domains.copy()
+            del new_domains[variable]
+            if forward_checking(problem, variable, value, new_domains):
+                solution = split(new_assignment, new_domains, depth + 1)
+                if solution is not None:
+                    return solution
+        return None
+
+    solution = split({}, problem.domains, 0)
+    if solution is not None or not tasks:
+        return solution
+    return run_tasks(problem_type, text, tasks, min(workers, len(tasks)))
+
+# This function solves a CSP problem by running a portfolio of solvers (different orderings and seeds) in parallel.
+# The first solution found by any of them is returned.
+# If no portfolio is given, the default portfolio is extended to have one entry per worker.
+# The problem is given as its type and source text (see the note at the top of this file).
+def solve_by_portfolio(
+    problem_type: Type[Problem],
+    text: str,
+    workers: Optional[int] = None,
+    portfolio: Optional[List[PortfolioEntry]] = None,
+) -> Optional[Assignment]:
+    workers = workers or os.cpu_count() or 1
+    if portfolio is None:
+        portfolio = default_portfolio(max(workers, len(DEFAULT_PORTFOLIO)))
+    tasks = [("portfolio", entry) for entry in portfolio]
+    return run_tasks(problem_type, text, tasks, min(workers, len(tasks)))
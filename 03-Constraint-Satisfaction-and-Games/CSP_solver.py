@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from CSP import Assignment, BinaryConstraint, Problem, UnaryConstraint
 from helpers.utils import NotImplemented
 
@@ -60,48 +60,173 @@ def forward_checking(
 ) -> bool:
     # TODO: Write this function
     solvable = True
-    for constraint in problem.constraints:
-        if (
-            isinstance(constraint, BinaryConstraint)
-            and assigned_variable in constraint.variables
-        ):
-            # get the other variable
-            other_variable = constraint.get_other(assigned_variable)
-
-            # if the the other varaible is assigned so it will not be inside the domains so continue
-            if other_variable not in domains.keys():
-                continue
+    # loop over the binary constraints that involve the assigned variable only (they are indexed by the problem)
+    for constraint in problem.get_binary_constraints(assigned_variable):
+        # get the other variable
+        other_variable = constraint.get_other(assigned_variable)
 
-            # if other_variable == "U":
-            #     print("U domain reduction")
-            #     print("old_domain", domains[other_variable])
-            # update the other variable's domain to only include the values that satisfy the binary constraint with the assigned variable.
+        # if the the other varaible is assigned so it will not be inside the domains so continue
+        if other_variable not in domains.keys():
+            continue
+
+        # if other_variable == "U":
+        #     print("U domain reduction")
+        #     print("old_domain", domains[other_variable])
+        # update the other variable's domain to only include the values that satisfy the binary constraint with the assigned variable.
+        # the order of the arguments of the condition depends on the position of the assigned variable in the constraint
+        condition = constraint.condition
+        if constraint.variables[0] == assigned_variable:
             new_domain = {
                 value
                 for value in domains[other_variable]
-                if (
-                    constraint.variables[0] == assigned_variable
-                    and constraint.condition(assigned_value, value)
-                )
-                or (
-                    constraint.variables[1] == assigned_variable
-                    and constraint.condition(value, assigned_value)
-                )
+                if condition(assigned_value, value)
             }
-            domains[other_variable] = new_domain
-            # print("other_variable", other_variable)
-            # print("old_domain", domains[other_variable])
-            # print("new_domain", new_domain)
-            # if other_variable == "U":
-            #     print("new_domain", new_domain)
-            # if the domain of the other variable is empty, return False => the problem is not solvable
-            if len(new_domain) == 0:
-                solvable = False
-                break
+        else:
+            new_domain = {
+                value
+                for value in domains[other_variable]
+                if condition(value, assigned_value)
+            }
+        domains[other_variable] = new_domain
+        # print("other_variable", other_variable)
+        # print("old_domain", domains[other_variable])
+        # print("new_domain", new_domain)
+        # if other_variable == "U":
+        #     print("new_domain", new_domain)
+        # if the domain of the other variable is empty, return False => the problem is not solvable
+        if len(new_domain) == 0:
+            solvable = False
+            break
 
     return solvable
 
 
+# This class caches, for every value of every variable, how many values of each neighbor it is related to.
+# Every binary constraint is seen from both of its sides as an "arc" (variable -> other variable).
+# For each constraint, we track the sparser of the two relations:
+#   - the supports (the neighbor values that satisfy the constraint with the value), or
+#   - the conflicts (the neighbor values that violate the constraint with the value).
+# So for a "not equal" constraint, each value only has 1 conflict, and for an "equals" constraint, each value only has a few supports.
+# The counts of an arc are computed against a certain domain of the other variable (the "basis").
+# When the arc is needed again with a different domain (e.g. after forward checking pruned some values, or after backtracking),
+# the counts are updated incrementally using only the values that were removed from (or added back to) the basis.
+# NOTE: Forward checking never modifies a domain in place (it creates a new set), so the identity of the domain set
+#       is enough to know whether the counts are still up to date.
+class SupportCounts:
+    # For each variable, the list of arcs (arc index, other variable) that start at this variable.
+    # The arcs 2*i and 2*i+1 are the two sides of the constraint i, so the reverse of an arc is "arc ^ 1".
+    arcs: Dict[str, List[Tuple[int, str]]]
+    # The binary constraints from which the arcs are built.
+    constraints: List[BinaryConstraint]
+    # For each arc, whether its counts are supports (True) or conflicts (False).
+    tracks_supports: List[bool]
+    # NOTE: The following lists contain None for the arcs that have not been built yet.
+    # For each arc, a dictionary that maps each value of the variable to the set of related values of the other variable.
+    related: List[Optional[Dict[Any, frozenset]]]
+    # For each arc, a dictionary that maps each value of the variable to the number of related values in the basis.
+    counts: List[Optional[Dict[Any, int]]]
+    # For each arc, the domain of the other variable against which the counts were computed.
+    basis: List[Optional[set]]
+
+    def __init__(self, problem: Problem, domains: Dict[str, set]) -> None:
+        self.arcs = {variable: [] for variable in domains}
+        self.constraints = []
+        for constraint in problem.constraints:
+            if not isinstance(constraint, BinaryConstraint):
+                continue
+            variable1, variable2 = constraint.variables
+            if variable1 not in domains or variable2 not in domains:
+                continue
+            self.arcs[variable1].append((2 * len(self.constraints), variable2))
+            self.arcs[variable2].append((2 * len(self.constraints) + 1, variable1))
+            self.constraints.append(constraint)
+        arc_count = 2 * len(self.constraints)
+        self.tracks_supports = [False] * arc_count
+        self.related, self.counts, self.basis = [None] * arc_count, [None] * arc_count, [None] * arc_count
+
+    # Builds the relations and the counts of both arcs of the constraint that contains the given arc.
+    # This is done lazily (the first time one of the arcs is needed) since many arcs are never needed by the search.
+    # The relations are built for the current domains only (which are usually much smaller than the initial domains).
+    # If the search backtracks and a domain gets values that are not in the relations, the relations are rebuilt
+    # for the union of the old and the current values, so each constraint is only rebuilt a few times.
+    def build(self, arc: int, domain: set, other_domain: set) -> None:
+        arc1, arc2 = arc & ~1, arc | 1
+        domain1, domain2 = (domain, other_domain) if arc == arc1 else (other_domain, domain)
+        if self.related[arc1] is not None:
+            domain1 = domain1 | self.related[arc1].keys()
+            domain2 = domain2 | self.related[arc2].keys()
+        constraint = self.constraints[arc // 2]
+        if constraint.relation is not None:
+            # Relations can build their tables directly (which is faster for the common relations, e.g. "not equal")
+            related1 = constraint.relation.supports(domain1, domain2)
+        else:
+            condition = constraint.condition
+            related1 = {
+                value1: frozenset(value2 for value2 in domain2 if condition(value1, value2))
+                for value1 in domain1
+            }
+        tracks_supports = 2 * sum(map(len, related1.values())) <= len(domain1) * len(domain2)
+        if not tracks_supports:
+            frozen_domain2 = frozenset(domain2)
+            related1 = {value1: frozen_domain2 - values for value1, values in related1.items()}
+        related2 = {value2: [] for value2 in domain2}
+        for value1, values in related1.items():
+            for value2 in values:
+                related2[value2].append(value1)
+        related2 = {value2: frozenset(values) for value2, values in related2.items()}
+        self.tracks_supports[arc1] = self.tracks_supports[arc2] = tracks_supports
+        self.related[arc1], self.related[arc2] = related1, related2
+        self.counts[arc1] = {value: len(values) for value, values in related1.items()}
+        self.counts[arc2] = {value: len(values) for value, values in related2.items()}
+        self.basis[arc1], self.basis[arc2] = domain2, domain1
+
+    # Returns the counts of the given arc after bringing them up to date with the given domain of the other variable.
+    def get_counts(self, arc: int, domain: set, other_domain: set) -> Dict[Any, int]:
+        related = self.related[arc]
+        if related is None or not related.keys() >= domain or not self.related[arc ^ 1].keys() >= other_domain:
+            self.build(arc, domain, other_domain)
+        counts = self.counts[arc]
+        basis = self.basis[arc]
+        if basis is other_domain:
+            return counts
+        removed, added = basis - other_domain, other_domain - basis
+        if len(removed) + len(added) <= len(counts):
+            # The domain changed a little, so we only update the values related to the removed and added values
+            inverse = self.related[arc ^ 1]
+            for other_value in removed:
+                for value in inverse[other_value]:
+                    counts[value] -= 1
+            for other_value in added:
+                for value in inverse[other_value]:
+                    counts[value] += 1
+        else:
+            # The domain changed a lot, so it is cheaper to recount everything
+            counts = {value: len(values & other_domain) for value, values in self.related[arc].items()}
+            self.counts[arc] = counts
+        self.basis[arc] = other_domain
+        return counts
+
+    # Returns the domain of the given variable ordered by the "least restraining value" heuristic.
+    # The number of values removed from a neighbor's domain is the number of conflicts, or
+    # the size of the neighbor's domain minus the number of supports.
+    def order_values(self, variable_to_assign: str, domains: Dict[str, set]) -> List[Any]:
+        domain = domains[variable_to_assign]
+        removed_values = dict.fromkeys(domain, 0)
+        for arc, other in self.arcs[variable_to_assign]:
+            other_domain = domains.get(other)
+            if other_domain is None:
+                continue
+            counts = self.get_counts(arc, domain, other_domain)
+            if self.tracks_supports[arc]:
+                other_size = len(other_domain)
+                for value in removed_values:
+                    removed_values[value] += other_size - counts[value]
+            else:
+                for value in removed_values:
+                    removed_values[value] += counts[value]
+        return sorted(removed_values, key=lambda x: (removed_values[x], x))
+
+
 # This function should return the domain of the given variable order based on the "least restraining value" heuristic.
 # IMPORTANT: This function should not modify any of the given arguments.
 # Generally, this function is very similar to the forward checking function, but it differs as follows:
@@ -112,10 +237,19 @@ def forward_checking(
 #            order them in ascending order (from the lowest to the highest value).
 # IMPORTANT: Don't use the domains inside the problem, use and modify the ones given by the "domains" argument
 #            since they contain the current domains of unassigned variables only.
+# NOTE: If "supports" is given, the values are ordered using its cached counts instead of checking every pair of values.
+#       The result is the same in both cases.
 def least_restraining_values(
-    problem: Problem, variable_to_assign: str, domains: Dict[str, set]
+    problem: Problem,
+    variable_to_assign: str,
+    domains: Dict[str, set],
+    supports: Optional[SupportCounts] = None,
 ) -> List[Any]:
     # TODO: Write this function
+    # if the support counts are available, use them to order the values
+    if supports is not None:
+        return supports.order_values(variable_to_assign, domains)
+
     # keep the count of the removed values for each value in the domain of the variable to assign
     removed_values = {}
 
@@ -159,6 +293,52 @@ def least_restraining_values(
     return res
 
 
+# This function continues the backtracking search (with forward checking) from the given partial assignment.
+# The "domains" argument should contain the current domains of the unassigned variables only (after forward checking).
+# It returns the first solution found below the given assignment, or None if there is none.
+# This is used by "solve" starting from the empty assignment, and by the parallel solver starting from a split point.
+def backtracking_search(
+    problem: Problem,
+    assignment: Assignment,
+    domains: Dict[str, set],
+    supports: Optional[SupportCounts] = None,
+) -> Optional[Assignment]:
+    # print("assignment", assignment)
+    # check if the assignment is complete
+    if problem.is_complete(assignment):
+        # if it is, return the assignment
+        return assignment
+
+    # get the next variable to assign using the MRV heuristic
+    variable = minimum_remaining_values(problem, domains)
+
+    # get the values for this variable in the domain using the least restraining value heuristic
+    for value in least_restraining_values(problem, variable, domains, supports):
+        # create a copy of the assignment to not modify the original assignment as it is passed by reference
+        new_assignmet = assignment.copy()
+        # add the value to to the variable in the new assignment
+        new_assignmet[variable] = value
+
+        # create a copy of the domains to use in the forward checking because it will be passed by reference
+        new_domains = domains.copy()
+
+        # delete the varaible from the domains copy as it is assigned
+        del new_domains[variable]
+        # print(f"variable: {variable} = {value}")
+        # check if the forward checking is satisfied
+        if forward_checking(problem, variable, value, new_domains):
+            # if it is, call the recursive search with the new assignment and the new domains
+            result = backtracking_search(problem, new_assignmet, new_domains, supports)
+
+            # check if the result is not None
+            if result is not None:
+                # if it is not, return the result as it is the first solution found
+                return result
+
+    # if no solution was found, return None
+    return None
+
+
 # This function should solve CSP problems using backtracking search with forward checking.
 # The variable ordering should be decided by the MRV heuristic.
 # The value ordering should be decided by the "least restraining value" heurisitc.
@@ -178,43 +358,8 @@ def solve(problem: Problem) -> Optional[Assignment]:
         # if the problem is not 1-consistent, return None
         return None
 
-    def recursive_search(
-        assignment: Assignment, domains: Dict[str, set]
-    ) -> Optional[Assignment]:
-        # print("assignment", assignment)
-        # check if the assignment is complete
-        if problem.is_complete(assignment):
-            # if it is, return the assignment
-            return assignment
-
-        # get the next variable to assign using the MRV heuristic
-        variable = minimum_remaining_values(problem, domains)
-
-        # get the values for this variable in the domain using the least restraining value heuristic
-        for value in least_restraining_values(problem, variable, domains):
-            # create a copy of the assignment to not modify the original assignment as it is passed by reference
-            new_assignmet = assignment.copy()
-            # add the value to to the variable in the new assignment
-            new_assignmet[variable] = value
-
-            # create a copy of the domains to use in the forward checking because it will be passed by reference
-            new_domains = domains.copy()
-
-            # delete the varaible from the domains copy as it is assigned
-            del new_domains[variable]
-            # print(f"variable: {variable} = {value}")
-            # check if the forward checking is satisfied
-            if forward_checking(problem, variable, value, new_domains):
-                # if it is, call the recursive search with the new assignment and the new domains
-                result = recursive_search(new_assignmet, new_domains)
-
-                # check if the result is not None
-                if result is not None:
-                    # if it is not, return the result as it is the first solution found
-                    return result
-
-        # if no solution was found, return None
-        return None
+    # build the support counts once, they are updated incrementally as the forward checking prunes the domains
+    supports = SupportCounts(problem, problem.domains)
 
     # call the recursive search with the initial empty assignment and the domains
-    return recursive_search(assignment, problem.domains)
+    return backtracking_search(problem, assignment, problem.domains, supports)
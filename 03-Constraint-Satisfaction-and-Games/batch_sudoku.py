@@ -0,0 +1,72 @@
+from typing import Iterable, Iterator, Optional, TextIO
+from sudoku import SudokuProblem
+from CSP_solver import solve
+import argparse, multiprocessing, os, sys, time
+
+# This function solves a single puzzle given as a line (see "SudokuProblem.from_line").
+# It returns the solution as a line, or None if no solution was found.
+# NOTE: The problem is built inside the worker (using the cached skeleton of each worker process)
+#       since sending the line is much cheaper than sending the pickled problem.
+def solve_line(line: str) -> Optional[str]:
+    problem = SudokuProblem.from_line(line)
+    solution = solve(problem)
+    if solution is None:
+        return None
+    return problem.format_line(solution)
+
+# Reads the puzzles from a file (one puzzle per line). Empty lines and lines starting with '#' are skipped.
+def read_puzzles(file: TextIO) -> Iterator[str]:
+    for line in file:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+# Solves the puzzles and yields the results in the same order as the puzzles.
+# If workers > 1, the puzzles are solved by a pool of processes, and the results are streamed as soon as they are ready.
+def solve_lines(puzzles: Iterable[str], workers: int = 1, chunksize: int = 64) -> Iterator[Optional[str]]:
+    if workers <= 1:
+        yield from map(solve_line, puzzles)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap(solve_line, puzzles, chunksize)
+
+def main(args: argparse.Namespace):
+    start = time.time() # Track run time
+
+    workers = args.workers or os.cpu_count() or 1
+    output = open(args.output, 'w') if args.output else sys.stdout
+
+    solved, count = 0, 0
+    with open(args.puzzles, 'r') as puzzles:
+        for result in solve_lines(read_puzzles(puzzles), workers, args.chunksize):
+            count += 1
+            if result is None:
+                output.write("No solution\n")
+            else:
+                solved += 1
+                output.write(result + "\n")
+
+    if output is not sys.stdout:
+        output.close()
+
+    # Finally print the elapsed time and the throughput (to stderr so that they are not mixed with the solutions)
+    elapsed = time.time() - start
+    print(f"Solved {solved}/{count} puzzles using {workers} worker(s)", file=sys.stderr)
+    print(f"Done in {elapsed} seconds ({count / elapsed if elapsed > 0 else 0:.1f} puzzles/sec)", file=sys.stderr)
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Solve many Sudoku puzzles (one per line) using backtracking search")
+    parser.add_argument("puzzles", help="path to a file of puzzles where each line is a puzzle (row by row) with '.' or '0' for the empty cells")
+    parser.add_argument("--output", "-o", default=None,
+                        help="path to the file where the solutions are written (default: stdout)")
+    parser.add_argument("--workers", "-w", type=int, default=None,
+                        help="the number of worker processes (default: the number of CPUs)")
+    parser.add_argument("--chunksize", "-c", type=int, default=64,
+                        help="the number of puzzles sent to a worker at a time")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!")
@@ -0,0 +1,48 @@
+from dungeon import DungeonGame, dungeon_heuristic
+from search import alphabeta
+from search_parallel import parallel_alphabeta
+from helpers.utils import fetch_tracked_call_count
+import argparse, os, time
+
+# This script compares the serial alpha-beta search with the parallel one (see "search_parallel.py") for different numbers
+# of workers. For each search, it prints the time, the speedup relative to the serial search, the number of explored nodes
+# and whether the result is the same as the serial result.
+# NOTE: The parallel search explores more nodes than the serial one (the workers do not have the bounds that the serial
+#       search gets from the earlier actions), so the speedup is less than the number of workers.
+
+# Runs the search and returns its result, the elapsed time and the number of explored nodes
+def run(search_fn, game: DungeonGame, depth: int, **kwargs):
+    fetch_tracked_call_count(DungeonGame.is_terminal) # Clear the call counter
+    state = game.get_initial_state()
+    start = time.perf_counter()
+    result = search_fn(game, state, dungeon_heuristic, depth, **kwargs)
+    elapsed = time.perf_counter() - start
+    return result, elapsed, fetch_tracked_call_count(DungeonGame.is_terminal)
+
+def main(args: argparse.Namespace):
+    game = DungeonGame.from_file(args.dungeon)
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, *(1 << power for power in range(cpus.bit_length())), cpus})
+
+    print(f"Dungeon: {args.dungeon} / Depth: {args.depth} / CPUs: {cpus}")
+    serial, serial_time, serial_nodes = run(alphabeta, game, args.depth)
+    print(f"Serial alphabeta: {serial_time:.3f} seconds / {serial_nodes} nodes / Value: {serial[0]} / Action: {serial[1]}")
+    for count in workers:
+        result, elapsed, nodes = run(parallel_alphabeta, game, args.depth, workers=count)
+        print(f"Parallel alphabeta with {count} worker(s): {elapsed:.3f} seconds / Speedup: {serial_time / elapsed:.2f}x"
+              f" / {nodes} nodes / Same Result: {result == serial}")
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Compare the serial and the parallel alpha-beta search on a dungeon")
+    parser.add_argument("dungeon", help="path to the dungeon to search")
+    parser.add_argument("--depth", "-d", type=int, default=9,
+                        help="How deep the searches should go")
+    parser.add_argument("--workers", "-w", type=int, nargs="+", default=None,
+                        help="The numbers of workers to try (default: 1, 2, 4, ... up to the number of CPUs)")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!")
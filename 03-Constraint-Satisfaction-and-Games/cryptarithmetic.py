@@ -1,6 +1,6 @@
 from typing import Tuple
 import re
-from CSP import Assignment, Problem, UnaryConstraint, BinaryConstraint
+from CSP import Assignment, Problem, UnaryConstraint, BinaryConstraint, DigitSum, Equal, NotEqual, NotEqualTo, Quotient, Remainder
 
 # TODO (Optional): Import any builtin library or define any helper function you want to use
 
@@ -158,13 +158,13 @@ class CryptArithmeticProblem(Problem):
         """
         # The first letter in each string cannot be 0
         problem.constraints.append(
-            UnaryConstraint(LHS0_REVERSED[-1], lambda x: x != 0)
+            UnaryConstraint(LHS0_REVERSED[-1], NotEqualTo(0))
         )  # A != 0
         problem.constraints.append(
-            UnaryConstraint(LHS1_REVERSED[-1], lambda x: x != 0)
+            UnaryConstraint(LHS1_REVERSED[-1], NotEqualTo(0))
         )  # D != 0
         problem.constraints.append(
-            UnaryConstraint(RHS_REVERSED[-1], lambda x: x != 0)
+            UnaryConstraint(RHS_REVERSED[-1], NotEqualTo(0))
         )  # F != 0
 
         # Each letter is assigned a unique number (no two letters are assigned the same number).
@@ -174,7 +174,7 @@ class CryptArithmeticProblem(Problem):
                     problem.constraints.append(
                         BinaryConstraint(
                             (problem.variables[i], problem.variables[j]),
-                            lambda x, y: x != y,
+                            NotEqual(),
                         )
                     )
 
@@ -182,13 +182,13 @@ class CryptArithmeticProblem(Problem):
         problem.constraints.append(
             BinaryConstraint(
                 (LHS0_REVERSED[0], LHS0_REVERSED[0] + LHS1_REVERSED[0]),  # C = CE[0]
-                lambda x, y: x == y // 10,
+                Quotient(10),
             )
         )
         problem.constraints.append(
             BinaryConstraint(
                 (LHS1_REVERSED[0], LHS0_REVERSED[0] + LHS1_REVERSED[0]),  # E = CE[1]
-                lambda x, y: x == y % 10,
+                Remainder(10),
             )
         )
         problem.constraints.append(
@@ -197,7 +197,7 @@ class CryptArithmeticProblem(Problem):
                     RHS_REVERSED[0],
                     "C" + str(0) + RHS_REVERSED[0],
                 ),
-                lambda x, y: x == y % 10,
+                Remainder(10),
             )
         )
         # C1 = C1H // 10
@@ -207,17 +207,17 @@ class CryptArithmeticProblem(Problem):
                     "C" + str(0),
                     "C" + str(0) + RHS_REVERSED[0],
                 ),
-                lambda x, y: x == y // 10,
+                Quotient(10),
             )
         )
-        # CE == C0I
+        # CE == C0I (C + E, which is the sum of the digits of CE, equals C0I)
         problem.constraints.append(
             BinaryConstraint(
                 (
                     LHS0_REVERSED[0] + LHS1_REVERSED[0],
                     "C" + str(0) + RHS_REVERSED[0],
                 ),
-                lambda x, y: ((x // 10) + (x % 10)) == ((y // 10) * 10 + (y % 10)),
+                DigitSum(10),
             )
         )
 
@@ -231,7 +231,7 @@ class CryptArithmeticProblem(Problem):
                         LHS0_REVERSED[i],
                         LHS0_REVERSED[i] + LHS1_REVERSED[i],
                     ),
-                    lambda x, y: x == y // 10,
+                    Quotient(10),
                 )
             )
             # D = BD % 10
@@ -241,7 +241,7 @@ class CryptArithmeticProblem(Problem):
                         LHS1_REVERSED[i],
                         LHS0_REVERSED[i] + LHS1_REVERSED[i],
                     ),
-                    lambda x, y: x == y % 10,
+                    Remainder(10),
                 )
             )
             # BD = BDC0 // 10
@@ -251,7 +251,7 @@ class CryptArithmeticProblem(Problem):
                         LHS0_REVERSED[i] + LHS1_REVERSED[i],
                         LHS0_REVERSED[i] + LHS1_REVERSED[i] + "C" + str(i - 1),
                     ),
-                    lambda x, y: x == y // 10,
+                    Quotient(10),
                 )
             )
             # C0 = BDC0 % 10
@@ -261,7 +261,7 @@ class CryptArithmeticProblem(Problem):
                         "C" + str(i - 1),
                         LHS0_REVERSED[i] + LHS1_REVERSED[i] + "C" + str(i - 1),
                     ),
-                    lambda x, y: x == y % 10,
+                    Remainder(10),
                 )
             )
             # H =  C1H % 10
@@ -271,7 +271,7 @@ class CryptArithmeticProblem(Problem):
                         RHS_REVERSED[i],
                         "C" + str(i) + RHS_REVERSED[i],
                     ),
-                    lambda x, y: x == y % 10,
+                    Remainder(10),
                 )
             )
             # C1 = C1H // 10
@@ -281,7 +281,7 @@ class CryptArithmeticProblem(Problem):
                         "C" + str(i),
                         "C" + str(i) + RHS_REVERSED[i],
                     ),
-                    lambda x, y: x == y // 10,
+                    Quotient(10),
                 )
             )
             # BDC0 == C1H
@@ -291,10 +291,7 @@ class CryptArithmeticProblem(Problem):
                         LHS0_REVERSED[i] + LHS1_REVERSED[i] + "C" + str(i - 1),
                         "C" + str(i) + RHS_REVERSED[i],
                     ),
-                    lambda x, y: (
-                        (x // 100) + ((x - (x // 100) * 100) // 10) + (x % 10)
-                    )
-                    == ((y // 10) * 10 + (y % 10)),
+                    DigitSum(10),
                 )
             )
 
@@ -310,7 +307,7 @@ class CryptArithmeticProblem(Problem):
                             LHS0_REVERSED[i],
                             LHS0_REVERSED[i] + "C" + str(i - 1),
                         ),
-                        lambda x, y: x == y // 10,
+                        Quotient(10),
                     )
                 )
                 # C1 = AC1 % 10
@@ -320,7 +317,7 @@ class CryptArithmeticProblem(Problem):
                             "C" + str(i - 1),
                             LHS0_REVERSED[i] + "C" + str(i - 1),
                         ),
-                        lambda x, y: x == y % 10,
+                        Remainder(10),
                     )
                 )
                 # G = C2G % 10
@@ -330,7 +327,7 @@ class CryptArithmeticProblem(Problem):
                             RHS_REVERSED[i],
                             "C" + str(i) + RHS_REVERSED[i],
                         ),
-                        lambda x, y: x == y % 10,
+                        Remainder(10),
                     )
                 )
                 # C2 = C2G // 10
@@ -340,7 +337,7 @@ class CryptArithmeticProblem(Problem):
                             "C" + str(i),
                             "C" + str(i) + RHS_REVERSED[i],
                         ),
-                        lambda x, y: x == y // 10,
+                        Quotient(10),
                     )
                 )
                 # AC1 == C2G
@@ -350,8 +347,7 @@ class CryptArithmeticProblem(Problem):
                             LHS0_REVERSED[i] + "C" + str(i - 1),
                             "C" + str(i) + RHS_REVERSED[i],
                         ),
-                        lambda x, y: ((x // 10) + (x % 10))
-                        == ((y // 10) * 10 + (y % 10)),
+                        DigitSum(10),
                     )
                 )
             else:
@@ -362,7 +358,7 @@ class CryptArithmeticProblem(Problem):
                             LHS1_REVERSED[i],
                             LHS1_REVERSED[i] + "C" + str(i - 1),
                         ),
-                        lambda x, y: x == y // 10,
+                        Quotient(10),
                     )
                 )
                 # C1 = AC1 % 10
@@ -372,7 +368,7 @@ class CryptArithmeticProblem(Problem):
                             "C" + str(i - 1),
                             LHS1_REVERSED[i] + "C" + str(i - 1),
                         ),
-                        lambda x, y: x == y % 10,
+                        Remainder(10),
                     )
                 )
                 # G = C2G % 10
@@ -382,7 +378,7 @@ class CryptArithmeticProblem(Problem):
                             RHS_REVERSED[i],
                             "C" + str(i) + RHS_REVERSED[i],
                         ),
-                        lambda x, y: x == y % 10,
+                        Remainder(10),
                     )
                 )
                 # C2 = C2G // 10
@@ -392,7 +388,7 @@ class CryptArithmeticProblem(Problem):
                             "C" + str(i),
                             "C" + str(i) + RHS_REVERSED[i],
                         ),
-                        lambda x, y: x == y // 10,
+                        Quotient(10),
                     )
                 )
                 # AC1 == C2G
@@ -402,8 +398,7 @@ class CryptArithmeticProblem(Problem):
                             LHS1_REVERSED[i] + "C" + str(i - 1),
                             "C" + str(i) + RHS_REVERSED[i],
                         ),
-                        lambda x, y: ((x // 10) + (x % 10))
-                        == ((y // 10) * 10 + (y % 10)),
+                        DigitSum(10),
                     )
                 )
 
@@ -415,7 +410,7 @@ class CryptArithmeticProblem(Problem):
                         RHS_REVERSED[-1],
                         "C" + str(len(RHS) - 2),
                     ),
-                    lambda x, y: x == y,
+                    Equal(),
                 )
             )
         # for c in problem.constraints:
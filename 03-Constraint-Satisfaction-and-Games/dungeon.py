@@ -1,14 +1,19 @@
-from dataclasses import dataclass
-from copy import deepcopy
-from typing import Iterable, List, Optional, Set, Tuple
+from dataclasses import dataclass, field, replace
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 from enum import Enum
 
 from mathutils import Direction, Point
 from game import Game
 from helpers.utils import track_call_count
 from helpers.mt19937 import RandomGenerator
+from helpers.zobrist import random_key, random_table
 from agents import Agent
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # This file contains the definition for the Dungeon Crawler game
 # In this problem, the agent can move Up, Down, Left, Right or stay idle
 # and it has to get a key then reach the exit
@@ -24,21 +29,84 @@ class DungeonTile(str, Enum):
     DAGGER = "~"
     KEY = "K"
 
+# The random Zobrist keys of the states of a dungeon (see "helpers/zobrist.py")
+# The cell tables are indexed by "y * width + x" and the inventory tables are indexed by the item count.
+# A dead player (or monster) is the XOR of its key at its cell and its "dead" key.
+class DungeonZobrist:
+    width: int
+    player: List[int]           # The player at each cell
+    dead_player: int            # Added if the player is dead
+    coins: List[int]            # A coin at each cell
+    daggers: List[int]          # A dagger at each cell
+    keys: List[int]             # A key at each cell
+    monsters: List[List[int]]   # Each monster at each cell
+    dead_monsters: List[int]    # Added for each dead monster
+    inventory: Tuple[List[int], List[int], List[int]] # The counts of the daggers, coins & keys in the inventory
+    turns: List[int]            # Each turn
+    times: List[int]            # Each time (generated when needed since the time is unbounded)
+
+    def __init__(self, width: int, height: int, monsters: int, daggers: int, coins: int, keys: int, seed: int = 0) -> None:
+        rng = RandomGenerator(seed)
+        cells = width * height
+        self.width = width
+        self.player = random_table(cells, rng)
+        self.dead_player = random_key(rng)
+        self.coins = random_table(cells, rng)
+        self.daggers = random_table(cells, rng)
+        self.keys = random_table(cells, rng)
+        self.monsters = [random_table(cells, rng) for _ in range(monsters)]
+        self.dead_monsters = random_table(monsters, rng)
+        self.inventory = (random_table(daggers + 1, rng), random_table(coins + 1, rng), random_table(keys + 1, rng))
+        self.turns = random_table(monsters + 1, rng)
+        self.__time_rng = RandomGenerator(seed + 1)
+        self.times = []
+
+    # Returns the key of the given time
+    def time(self, time: int) -> int:
+        while len(self.times) <= time:
+            self.times.append(random_key(self.__time_rng))
+        return self.times[time]
+
+    # Returns the key of the player's inventory
+    def inventory_key(self, inventory: 'Player.Inventory') -> int:
+        daggers, coins, keys = self.inventory
+        return daggers[inventory.daggers] ^ coins[inventory.coins] ^ keys[inventory.keys]
+
+    # Computes the key of a state from scratch (the successors compute their keys incrementally from their parent's key)
+    def compute_key(self, time: int, turn: int, player: 'Player', coins: Iterable[Point], daggers: Iterable[Point],
+                    keys: Iterable[Point], monsters: Iterable['Monster']) -> int:
+        width = self.width
+        key = self.time(time) ^ self.turns[turn] ^ self.player[player.position.y * width + player.position.x]
+        if not player.alive:
+            key ^= self.dead_player
+        key ^= self.inventory_key(player.inventory)
+        for table, items in ((self.coins, coins), (self.daggers, daggers), (self.keys, keys)):
+            for item in items:
+                key ^= table[item.y * width + item.x]
+        for index, monster in enumerate(monsters):
+            key ^= self.monsters[index][monster.position.y * width + monster.position.x]
+            if not monster.alive:
+                key ^= self.dead_monsters[index]
+        return key
+
 # Dungeon layout specifies the walkable locations and the exit location
+# It also contains the Zobrist keys used to compute the keys of the states
 @dataclass
 class DungeonLayout:
     width: int
     height: int
     walkable: Set[Point]
     exit: Point
+    zobrist: Optional[DungeonZobrist] = None
 
     def __deepcopy__(self, memo):
         return self
 
 # The state of a player contains its position, whether it is alive or not and its inventory
-@dataclass
+# It is immutable, so it can be shared by many states (a changed player is a new object)
+@dataclass(frozen=True)
 class Player:
-    @dataclass
+    @dataclass(frozen=True)
     class Inventory:
         daggers: int
         coins: int
@@ -49,32 +117,35 @@ class Player:
     inventory: Inventory
 
 # The state of a monster contains its position and whether it is alive or not
-@dataclass
+@dataclass(frozen=True)
 class Monster:
     position: Point
     alive: bool
 
 # This will contain a reference to the dungeon layout and it will contain environment details that change across states such as:
 #   The player location and the locations of the monsters, remaining coins, daggers, key, etc. 
-@dataclass
+# The state is immutable, so the successors share all the parts that the action does not change with their parent (no copying needed).
+# The layout is not compared since it is the same for all the states of a game.
+# The hash function returns the Zobrist key of the state, which "get_successor" updates incrementally from the parent's key,
+# so states can be used as dictionary keys without hashing all their parts every time.
+@dataclass(frozen=True)
 class DungeonState:
     time: int
     turn: int
-    layout: DungeonLayout
+    layout: DungeonLayout = field(compare=False)
     player: Player
-    coins: Set[Point]
-    daggers: Set[Point]
-    keys: Set[Point]
-    monsters: List[Monster]
+    coins: FrozenSet[Point]
+    daggers: FrozenSet[Point]
+    keys: FrozenSet[Point]
+    monsters: Tuple[Monster, ...]
+    key: int # The Zobrist key of the state (see "DungeonZobrist.compute_key")
+
+    def __hash__(self) -> int:
+        return self.key
 
     # return the next turn (it ignore all the dead monsters)
     def next_turn(self) -> int:
-        turn = self.turn
-        while turn < len(self.monsters):
-            if self.monsters[turn].alive:
-                return turn+1
-            turn += 1
-        return 0
+        return next_turn(self.turn, self.monsters)
     
     # The score is 1 point for each coin, 10 points for each monster, -0.1 points for each passing second.
     def score(self) -> int:
@@ -102,6 +173,14 @@ class DungeonState:
         header = f"Inventory: {self.player.inventory.keys} Key(s), {self.player.inventory.daggers} Dagger(s), {self.player.inventory.coins} Coin(s)\n"
         return header + '\n'.join(''.join(position_to_str(Point(x, y)) for x in range(self.layout.width)) for y in range(self.layout.height))
 
+# return the turn that follows the given turn (it ignore all the dead monsters)
+def next_turn(turn: int, monsters: Tuple[Monster, ...]) -> int:
+    while turn < len(monsters):
+        if monsters[turn].alive:
+            return turn+1
+        turn += 1
+    return 0
+
 # This is the implementation of the dungeon game
 class DungeonGame(Game[DungeonState, Direction]):
     # The problem will contain the dungeon layout and the inital state
@@ -152,56 +231,92 @@ class DungeonGame(Game[DungeonState, Direction]):
             # prevent the monster from getting into a wall or another monster
             return [direction for direction, position in positions if position in state.layout.walkable and position not in monster_locations]
 
+    # Since the states are immutable, the successor is a new state that shares the unchanged parts of the given state
+    # The Zobrist key of the successor is computed from the key of the given state by XORing the keys of the changed parts
     def get_successor(self, state: DungeonState, action: Direction) -> DungeonState:
-        state = deepcopy(state)
         current_turn = state.turn
+        player, coins, daggers, keys, monsters = state.player, state.coins, state.daggers, state.keys, state.monsters
+        zobrist = state.layout.zobrist
+        width = zobrist.width
+        key = state.key
+        inventory = player.inventory
         if current_turn == 0:
             # This action is done by the player
-            new_position = state.player.position + action.to_vector()
-            state.player.position = new_position
-            if new_position in state.coins:
+            new_position = player.position + action.to_vector()
+            cell = new_position.y * width + new_position.x
+            key ^= zobrist.player[player.position.y * width + player.position.x] ^ zobrist.player[cell]
+            alive = player.alive
+            dagger_count, coin_count, key_count = inventory.daggers, inventory.coins, inventory.keys
+            if new_position in coins:
                 # If we walk over a coin, we take it
-                state.coins.remove(new_position)
-                state.player.inventory.coins += 1
-            if new_position in state.daggers:
+                coins = coins - {new_position}
+                coin_count += 1
+                key ^= zobrist.coins[cell]
+            if new_position in daggers:
                 # If we walk over a dagger, we take it
-                state.daggers.remove(new_position)
-                state.player.inventory.daggers += 1
-            if new_position in state.keys:
+                daggers = daggers - {new_position}
+                dagger_count += 1
+                key ^= zobrist.daggers[cell]
+            if new_position in keys:
                 # If we walk over a dagger, we take it
-                state.keys.remove(new_position)
-                state.player.inventory.keys += 1
+                keys = keys - {new_position}
+                key_count += 1
+                key ^= zobrist.keys[cell]
             # Find the monsters at the player position
-            monsters_at_player = [monster for monster in state.monsters if monster.position == new_position and monster.alive]
+            monsters_at_player = [index for index, monster in enumerate(monsters) if monster.position == new_position and monster.alive]
             if monsters_at_player:
-                if state.player.inventory.daggers < len(monsters_at_player):
+                if dagger_count < len(monsters_at_player):
                     # If we encounter a monster and we don't have a dagger, we die
-                    state.player.inventory.daggers = 0
-                    state.player.alive = False
+                    dagger_count = 0
+                    alive = False
+                    key ^= zobrist.dead_player
                 else:
                     # If we encounter a monster and we have a dagger, we kill it
-                    state.player.inventory.daggers -= len(monsters_at_player)
-                    for monster in monsters_at_player:
-                        monster.alive = False
+                    dagger_count -= len(monsters_at_player)
+                    monsters = tuple(
+                        Monster(monster.position, False) if index in monsters_at_player else monster
+                        for index, monster in enumerate(monsters)
+                    )
+                    for index in monsters_at_player:
+                        key ^= zobrist.dead_monsters[index]
+            if (dagger_count, coin_count, key_count) != (inventory.daggers, inventory.coins, inventory.keys):
+                key ^= zobrist.inventory_key(inventory)
+                inventory = Player.Inventory(dagger_count, coin_count, key_count)
+                key ^= zobrist.inventory_key(inventory)
+            player = Player(new_position, alive, inventory)
         else:
             # This action is done by a monster
-            monster = state.monsters[current_turn - 1]
+            index = current_turn - 1
+            monster = monsters[index]
             new_position = monster.position + action.to_vector()
-            monster.position = new_position
-            if new_position == state.player.position:
-                if state.player.inventory.daggers != 0:
+            table = zobrist.monsters[index]
+            key ^= table[monster.position.y * width + monster.position.x] ^ table[new_position.y * width + new_position.x]
+            alive = monster.alive
+            if new_position == player.position:
+                if inventory.daggers != 0:
                     # If we encounter a player and they have a dagger, we die
-                    monster.alive = False
-                    state.player.inventory.daggers -= 1
+                    alive = False
+                    key ^= zobrist.dead_monsters[index] ^ zobrist.inventory_key(inventory)
+                    player = replace(player, inventory=replace(inventory, daggers=inventory.daggers - 1))
+                    key ^= zobrist.inventory_key(player.inventory)
                 else:
                     # If we encounter a player and they don't have a dagger, we eat them
-                    state.player.alive = False
+                    player = replace(player, alive=False)
+                    key ^= zobrist.dead_player
+            monsters = monsters[:index] + (Monster(new_position, alive),) + monsters[index+1:]
         # Advance the turn
-        state.turn = state.next_turn()
-        if state.turn == 0:
+        turn = next_turn(current_turn, monsters)
+        key ^= zobrist.turns[current_turn] ^ zobrist.turns[turn]
+        time = state.time
+        if turn == 0:
             # if the new turn is 0 (the player's turn), we advance the clock 
-            state.time += 1
-        return state
+            key ^= zobrist.time(time) ^ zobrist.time(time + 1)
+            time += 1
+        return DungeonState(time, turn, state.layout, player, coins, daggers, keys, monsters, key)
+
+    # The Zobrist key identifies the state, so the transposition tables only need to compare integers
+    def get_state_key(self, state: DungeonState) -> int:
+        return state.key
 
     # Read a dungeon problem from text containing a grid of tiles
     @staticmethod
@@ -229,9 +344,11 @@ class DungeonGame(Game[DungeonState, Direction]):
                     elif char == DungeonTile.EXIT:
                         exit = Point(x, y)
         problem = DungeonGame()
-        problem.layout = DungeonLayout(width, height, walkable, exit)
+        zobrist = DungeonZobrist(width, height, len(monsters), len(daggers), len(coins), len(keys))
+        problem.layout = DungeonLayout(width, height, walkable, exit, zobrist)
         player = Player(player, True, Player.Inventory(0, 0, 0))
-        problem.initial_state = DungeonState(0, 0, problem.layout, player, coins, daggers, keys, monsters)
+        key = zobrist.compute_key(0, 0, player, coins, daggers, keys, monsters)
+        problem.initial_state = DungeonState(0, 0, problem.layout, player, frozenset(coins), frozenset(daggers), frozenset(keys), tuple(monsters), key)
         return problem
 
     # Read a dungeon problem from file containing a grid of tiles
@@ -280,47 +397,152 @@ class MonsterAgent(Agent):
 def path_length(path) -> int:
     return 0xffffffff if path is None else len(path)-1
 
+# The shortest paths between all the pairs of walkable cells in a dungeon layout.
+# For every source cell, a breadth first search (exploring the directions in the order of the "Direction" enum) finds:
+#   - "distances[source][cell]": the length of the shortest path from the source to the cell (UNREACHABLE if there is none),
+#   - "parents[source][cell]": the cell before the given cell on that path (-1 for the source and the unreachable cells).
+# The paths are rebuilt from the parents when needed, instead of storing a list of points for every pair of cells.
+# If NumPy is available, the searches from all the sources run together as array operations (one step per BFS level).
+# Otherwise, the same tables are built by a search from each source.
+# NOTE: The tables are stored as lists since the lookups (a few per heuristic call) are faster on lists than on arrays.
+class DistanceMaps:
+    UNREACHABLE = 0xffffffff
+
+    cells: List[Point]              # The walkable cells
+    index: Dict[Point, int]         # The index of each walkable cell in "cells"
+    distances: List[List[int]]      # The distances between each pair of cells
+    parents: List[List[int]]        # The parent of each cell in the search tree of each source
+
+    def __init__(self, layout: DungeonLayout) -> None:
+        self.cells = sorted(layout.walkable, key=lambda point: (point.y, point.x))
+        self.index = {cell: index for index, cell in enumerate(self.cells)}
+        # The neighbor of each cell in each direction (-1 if the neighbor is not walkable)
+        # NOTE: Direction.NONE is skipped since the cell itself is always visited before its neighbors.
+        directions = [direction.to_vector() for direction in Direction if direction != Direction.NONE]
+        neighbors = [[self.index.get(cell + direction, -1) for direction in directions] for cell in self.cells]
+        if np is not None:
+            distances, parents = DistanceMaps.__search_arrays(neighbors)
+            self.distances, self.parents = distances.tolist(), parents.tolist()
+        else:
+            self.distances, self.parents = DistanceMaps.__search_lists(neighbors)
+
+    # The searches from all the sources are run together, level by level.
+    # The frontier is a list of (source, cell) pairs ordered like the queue of a separate search from each source,
+    # so the first pair that reaches a cell from the same source is the one that a separate search would use.
+    @staticmethod
+    def __search_arrays(neighbors: List[List[int]]):
+        count = len(neighbors)
+        neighbors = np.array(neighbors, dtype=np.int64).reshape(count, -1)
+        distances = np.full((count, count), DistanceMaps.UNREACHABLE, dtype=np.int64)
+        parents = np.full((count, count), -1, dtype=np.int64)
+        sources = np.arange(count)
+        cells = np.arange(count)
+        distances[sources, cells] = 0
+        level = 0
+        while sources.size:
+            level += 1
+            # Expand every pair of the frontier in all the directions (row by row to keep the queue order)
+            children = neighbors[cells].ravel()
+            child_sources = np.repeat(sources, neighbors.shape[1])
+            child_parents = np.repeat(cells, neighbors.shape[1])
+            new = children >= 0
+            new[new] = distances[child_sources[new], children[new]] == DistanceMaps.UNREACHABLE
+            children, child_sources, child_parents = children[new], child_sources[new], child_parents[new]
+            # Keep the first pair that reaches each (source, cell)
+            _, first = np.unique(child_sources * count + children, return_index=True)
+            first.sort()
+            sources, cells = child_sources[first], children[first]
+            distances[sources, cells] = level
+            parents[sources, cells] = child_parents[first]
+        return distances, parents
+
+    @staticmethod
+    def __search_lists(neighbors: List[List[int]]):
+        from collections import deque
+        count = len(neighbors)
+        distances = [[DistanceMaps.UNREACHABLE] * count for _ in range(count)]
+        parents = [[-1] * count for _ in range(count)]
+        for source in range(count):
+            source_distances, source_parents = distances[source], parents[source]
+            source_distances[source] = 0
+            queue = deque([source])
+            while queue:
+                cell = queue.popleft()
+                for child in neighbors[cell]:
+                    if child < 0 or source_distances[child] != DistanceMaps.UNREACHABLE:
+                        continue
+                    source_distances[child] = source_distances[cell] + 1
+                    source_parents[child] = cell
+                    queue.append(child)
+        return distances, parents
+
+    # Returns the distance maps of the game's layout (they are computed once and cached inside the game object)
+    @staticmethod
+    def of(game: 'DungeonGame') -> 'DistanceMaps':
+        cache = game.cache()
+        maps = cache.get("distance_maps")
+        if maps is None:
+            maps = cache["distance_maps"] = DistanceMaps(game.layout)
+        return maps
+
+    # Returns the length of the shortest path between two points (UNREACHABLE if there is none)
+    def distance(self, p1: Point, p2: Point) -> int:
+        return self.distances[self.index[p1]][self.index[p2]]
+
+    # Returns the indices of the cells on the shortest path from p1 to p2 (including both) or None if there is no path
+    def path_indices(self, p1: Point, p2: Point) -> Optional[List[int]]:
+        source, cell = self.index[p1], self.index[p2]
+        if self.distances[source][cell] == DistanceMaps.UNREACHABLE:
+            return None
+        parents = self.parents[source]
+        path = [cell]
+        while cell != source:
+            cell = parents[cell]
+            path.append(cell)
+        path.reverse()
+        return path
+
+    # Returns the shortest path from p1 to p2 (including both) or None if there is no path
+    def path(self, p1: Point, p2: Point) -> Optional[List[Point]]:
+        path = self.path_indices(p1, p2)
+        return None if path is None else [self.cells[cell] for cell in path]
+
+    # Returns the index (in the path) of the cell nearest to the given point and its distance to it
+    # If many cells are equally near, the first of them is returned.
+    def nearest_on_path(self, point: Point, path: List[int]) -> Tuple[int, int]:
+        distances = self.distances[self.index[point]]
+        distance, nearest = min((distances[cell], index) for index, cell in enumerate(path))
+        return nearest, distance
+
 # Return the path between two points in the dungeom
-# The result is cached inside the game object
+# The distance maps of the layout are cached inside the game object
 def compute_path(game: DungeonGame, p1: Point, p2: Point) -> List[Point]:
-    cache = game.cache()
-    if p1 not in cache:
-        from collections import deque
-        path_map = {p1: [p1]}
-        queue = deque([p1])
-        while queue:
-            parent = queue.popleft()
-            path = path_map[parent]
-            for direction in Direction:
-                child = parent + direction.to_vector()
-                if child in path_map or child not in game.layout.walkable:
-                    continue
-                path_map[child] = path + [child]
-                queue.append(child)
-        cache[p1] = path_map
-    return cache[p1].get(p2, None)
+    return DistanceMaps.of(game).path(p1, p2)
 
 # Finds the shortest path from a point to a path in the dungeon
 def path_to_path(game: DungeonGame, p1: Point, path: List[Point]):
     if path is None: return None
-    paths = [compute_path(game, p1, p2) for p2 in path]
-    _, _, shortest = min((path_length(path), index, path) for index, path in enumerate(paths))
-    return shortest
+    maps = DistanceMaps.of(game)
+    nearest, _ = maps.nearest_on_path(p1, [maps.index[point] for point in path])
+    return maps.path(p1, path[nearest])
 
 # Checks if monsters can reach the player while traversing the shortest path to a goal point
 # Returns the number of monster that endanger the player and the length of the player's path
 def path_safety(game: DungeonGame, state: DungeonState, goal: Point):
-    path = compute_path(game, state.player.position, goal)
-    length = path_length(path)
-    # For each alive monster, find the shortest path from the the monster to the player's path
-    monster_paths = [path_to_path(game, monster.position, path) for monster in state.monsters if monster.alive]
-    # Find how long the monster will take to reach the player's path
-    monster_path_lengths = [path_length(monster_path) for monster_path in monster_paths]
-    # Find how it will take the player to get past the monster encounter position
-    monster_encounter_distance = [path.index(monster_path[-1]) for monster_path in monster_paths]
-    # Count dangerous monsters (the ones that can reach the player path before the player can outpace them)
-    danger = sum(encounter >= distance for encounter, distance in zip(monster_encounter_distance, monster_path_lengths))
-    return danger, length
+    maps = DistanceMaps.of(game)
+    path = maps.path_indices(state.player.position, goal)
+    if path is None:
+        return 0, DistanceMaps.UNREACHABLE
+    danger = 0
+    for monster in state.monsters:
+        if not monster.alive: continue
+        # Find the nearest position on the player's path to the monster and how long the monster will take to reach it.
+        # Since the player's path is a shortest path, the index of the position is how long the player will take to reach it.
+        encounter, distance = maps.nearest_on_path(monster.position, path)
+        # Count dangerous monsters (the ones that can reach the player path before the player can outpace them)
+        if encounter >= distance:
+            danger += 1
+    return danger, len(path) - 1
 
 # Returns a heuristic value for the dungeon game state
 # Argument:
@@ -352,7 +574,8 @@ def dungeon_heuristic(game: DungeonGame, state: DungeonState, agent: int) -> flo
 
     # find the distance to the nearest monster
     if alive_monsters:
-        nearest_monster = min(path_length(compute_path(game, state.player.position, monster.position)) for monster in alive_monsters)
+        maps = DistanceMaps.of(game)
+        nearest_monster = min(maps.distance(state.player.position, monster.position) for monster in alive_monsters)
     else:
         nearest_monster = area
     
@@ -0,0 +1,196 @@
+from typing import Dict, Generic, List, Optional, Tuple
+import math, multiprocessing, time
+from agents import Agent
+from game import HeuristicFunction, Game, S, A
+from helpers.mt19937 import RandomGenerator
+
+# This file contains an agent that selects its actions using Monte Carlo Tree Search (MCTS) with the UCT selection rule.
+# Every iteration of the search:
+#   1- Selection: walks down the search tree from the root choosing the children with the highest UCB score.
+#   2- Expansion: adds one untried action of the reached node to the tree.
+#   3- Simulation: evaluates the new node by playing random actions (a rollout) from it for a few steps and
+#      evaluating where the rollout ended (its terminal value or, if it is not terminal, the heuristic value).
+#   4- Backpropagation: adds the evaluation to the statistics of every node on the path back to the root.
+# All values are for the agent whose turn is at the root (the searching agent).
+# The other agents are either "adversarial" (they select the actions that are worst for the searching agent)
+# or "random" (they are chance nodes that select their actions uniformly at random, like the monsters in expectimax).
+
+# Squashes a value using a signed logarithm, so that the huge terminal values of some games (e.g. +-1e8 in the dungeon)
+# do not hide the differences between the ordinary values in the UCB scores.
+def squash(value: float) -> float:
+    return math.copysign(math.log1p(abs(value)), value)
+
+# A node in the MCTS search tree
+class MCTSNode(Generic[S, A]):
+    __slots__ = ("state", "turn", "children", "untried", "visits", "total", "terminal_value")
+
+    state: S
+    turn: int                               # The agent whose turn it is in the state
+    children: List[Tuple[A, 'MCTSNode']]    # The expanded children (in the order of their expansion)
+    untried: List[A]                        # The actions that have not been expanded yet
+    visits: int                             # How many iterations passed through this node
+    total: float                            # The sum of the (squashed) evaluations of these iterations
+    terminal_value: Optional[float]         # The (squashed) terminal value if the state is terminal, otherwise None
+
+    def __init__(self, game: Game[S, A], state: S, agent: int) -> None:
+        self.state = state
+        self.turn = game.get_turn(state)
+        self.children = []
+        self.visits = 0
+        self.total = 0.0
+        terminal, values = game.is_terminal(state)
+        if terminal:
+            self.terminal_value = squash(values[agent])
+            self.untried = []
+        else:
+            self.terminal_value = None
+            self.untried = list(game.get_actions(state))
+
+# Runs the MCTS iterations from the given state until the budget (a number of iterations and/or a time limit in seconds) runs out.
+# Returns the statistics of the root's children as a dictionary that maps each action to (visits, total).
+# The arguments are:
+#   - heuristic: used to evaluate the non-terminal states where the rollouts end (if None, they are evaluated as 0).
+#   - rollout_depth: the maximum number of random actions in a rollout (0 evaluates the expanded state directly).
+#   - rollouts: how many rollouts evaluate each expanded state (their mean is used as the evaluation).
+#   - exploration: the exploration constant of the UCB score (applied to values normalized to [0, 1]).
+#   - opponents: either "adversarial" or "random" (see the top of this file).
+def search_statistics(
+    game: Game[S, A],
+    state: S,
+    rng: RandomGenerator,
+    heuristic: Optional[HeuristicFunction] = None,
+    iterations: Optional[int] = 1000,
+    time_limit: Optional[float] = None,
+    rollout_depth: int = 10,
+    rollouts: int = 1,
+    exploration: float = math.sqrt(2),
+    opponents: str = "adversarial",
+) -> Dict[A, Tuple[int, float]]:
+    if opponents not in ("adversarial", "random"):
+        raise ValueError(f"Unknown opponents type: {opponents}")
+    if iterations is None and time_limit is None:
+        raise ValueError("The search needs an iteration budget or a time limit")
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+    agent = game.get_turn(state)
+    root = MCTSNode(game, state, agent)
+    # The range of the evaluations seen so far (used to normalize the node values to [0, 1])
+    low, high = math.inf, -math.inf
+
+    # Returns the normalized mean value of the node
+    def mean(node: MCTSNode) -> float:
+        if high <= low: return 0.5
+        return (node.total / node.visits - low) / (high - low)
+
+    # Selects the child to follow from a fully expanded node
+    def select(node: MCTSNode) -> MCTSNode:
+        if node.turn != agent and opponents == "random":
+            return node.children[rng.int(0, len(node.children) - 1)][1]
+        sign = 1 if node.turn == agent else -1
+        log_visits = math.log(node.visits)
+        best_score, best_child = -math.inf, None
+        for _, child in node.children:
+            score = sign * mean(child) + exploration * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best_score, best_child = score, child
+        return best_child
+
+    # Evaluates the state by playing random actions from it
+    def rollout(state: S) -> float:
+        for _ in range(rollout_depth):
+            terminal, values = game.is_terminal(state)
+            if terminal:
+                return squash(values[agent])
+            actions = game.get_actions(state)
+            if not actions: break
+            state = game.get_successor(state, actions[rng.int(0, len(actions) - 1)])
+        terminal, values = game.is_terminal(state)
+        if terminal:
+            return squash(values[agent])
+        return 0.0 if heuristic is None else squash(heuristic(game, state, agent))
+
+    iteration = 0
+    while (iterations is None or iteration < iterations) and (deadline is None or time.perf_counter() < deadline):
+        iteration += 1
+        node, path = root, [root]
+        # Selection
+        while node.terminal_value is None and not node.untried and node.children:
+            node = select(node)
+            path.append(node)
+        # Expansion
+        if node.untried:
+            action = node.untried.pop(rng.int(0, len(node.untried) - 1))
+            child = MCTSNode(game, game.get_successor(node.state, action), agent)
+            node.children.append((action, child))
+            node = child
+            path.append(node)
+        # Simulation
+        if node.terminal_value is not None:
+            value = node.terminal_value
+        else:
+            value = sum(rollout(node.state) for _ in range(rollouts)) / rollouts
+        low, high = min(low, value), max(high, value)
+        # Backpropagation
+        for visited in path:
+            visited.visits += 1
+            visited.total += value
+
+    return {action: (child.visits, child.total) for action, child in root.children}
+
+# Returns the action with the most visits (ties are broken by the higher mean value then by the order of the actions)
+def most_visited(statistics: Dict[A, Tuple[int, float]]) -> A:
+    _, _, _, action = max(
+        (visits, total / visits if visits else -math.inf, -index, action)
+        for index, (action, (visits, total)) in enumerate(statistics.items())
+    )
+    return action
+
+# This is the function run by each worker process of the root-parallel search
+def search_worker(args) -> Dict[A, Tuple[int, float]]:
+    game, state, seed, options = args
+    return search_statistics(game, state, RandomGenerator(seed), **options)
+
+# The MCTS agent selects the action with the most visits at the root of the search tree
+# If workers > 1, the search runs in parallel at the root: every worker process builds its own tree (with its own seed)
+# and the statistics of the roots' children are summed before selecting the action.
+# NOTE: For the parallel search, the game, the state and the heuristic must be picklable (e.g. the heuristic cannot be a lambda).
+class MCTSAgent(Agent[S, A]):
+    def __init__(self,
+        heuristic: Optional[HeuristicFunction] = None,
+        iterations: Optional[int] = 1000,
+        time_limit: Optional[float] = None,
+        rollout_depth: int = 10,
+        rollouts: int = 1,
+        exploration: float = math.sqrt(2),
+        opponents: str = "adversarial",
+        workers: int = 1,
+        seed: int = None) -> None:
+        super().__init__()
+        self.options = dict(
+            heuristic=heuristic, iterations=iterations, time_limit=time_limit,
+            rollout_depth=rollout_depth, rollouts=rollouts, exploration=exploration, opponents=opponents,
+        )
+        self.workers = workers
+        self.rng = RandomGenerator(seed)
+
+    def act(self, game: Game[S, A], state: S) -> A:
+        if self.workers <= 1:
+            return self.__select(game, state, search_statistics(game, state, self.rng, **self.options))
+        tasks = [(game, state, self.rng.generate(), self.options) for _ in range(self.workers)]
+        with multiprocessing.Pool(self.workers) as pool:
+            results = pool.map(search_worker, tasks)
+        # Sum the statistics of the roots' children (in the order in which the first worker expanded them)
+        statistics: Dict[A, Tuple[int, float]] = {}
+        for result in results:
+            for action, (visits, total) in result.items():
+                old_visits, old_total = statistics.get(action, (0, 0.0))
+                statistics[action] = (old_visits + visits, old_total + total)
+        return self.__select(game, state, statistics)
+
+    # Returns the most visited action, or the first legal action if no statistics were collected
+    # (e.g. if the time or the iteration budget is zero)
+    def __select(self, game: Game[S, A], state: S, statistics: Dict[A, Tuple[int, float]]) -> A:
+        if statistics:
+            return most_visited(statistics)
+        actions = game.get_actions(state)
+        return actions[0] if actions else None
@@ -1,7 +1,7 @@
 from dungeon import DungeonGame, Direction, DungeonState, DungeonTile, MonsterAgent
 from agents import HumanAgent, SearchAgent, RandomAgent
 from helpers.utils import fetch_tracked_call_count
-import argparse, time
+import argparse, functools, time
 
 def colored_dungeon(level: str):
     from helpers.utils import bcolors
@@ -26,6 +26,13 @@ def get_heuristic(name: str):
     print(f"Requested Heuristic '{name}' is invalid")
     exit(-1)
 
+# Return the search function with a transposition table if the user requested one (the table is kept between moves)
+def with_transposition_table(search_fn, args: argparse.Namespace):
+    if args.table_size <= 0:
+        return search_fn
+    from search import TranspositionTable
+    return functools.partial(search_fn, transposition_table=TranspositionTable(args.table_size))
+
 # Create an agent based on the user selections
 def create_agent(args: argparse.Namespace):
     agent_type: str = args.agent
@@ -56,19 +63,42 @@ def create_agent(args: argparse.Namespace):
     if agent_type == "minimax":
         from search import minimax
         heuristic = get_heuristic(args.heuristic)
-        return SearchAgent(minimax, heuristic, args.depth)
+        return SearchAgent(with_transposition_table(minimax, args), heuristic, args.depth)
     if agent_type == "alphabeta":
         from search import alphabeta
         heuristic = get_heuristic(args.heuristic)
-        return SearchAgent(alphabeta, heuristic, args.depth)
+        return SearchAgent(with_transposition_table(alphabeta, args), heuristic, args.depth)
     if agent_type == "alphabeta_order":
         from search import alphabeta_with_move_ordering
         heuristic = get_heuristic(args.heuristic)
-        return SearchAgent(alphabeta_with_move_ordering, heuristic, args.depth)
+        return SearchAgent(with_transposition_table(alphabeta_with_move_ordering, args), heuristic, args.depth)
+    if agent_type == "alphabeta_iterative":
+        from search import iterative_deepening
+        heuristic = get_heuristic(args.heuristic)
+        search_fn = functools.partial(iterative_deepening, time_limit=args.time_limit)
+        return SearchAgent(with_transposition_table(search_fn, args), heuristic, args.depth)
+    if agent_type == "alphabeta_parallel":
+        from search_parallel import parallel_alphabeta
+        heuristic = get_heuristic(args.heuristic)
+        return SearchAgent(functools.partial(parallel_alphabeta, workers=args.workers), heuristic, args.depth)
+    if agent_type == "pvs":
+        from search import principal_variation_search
+        heuristic = get_heuristic(args.heuristic)
+        return SearchAgent(with_transposition_table(principal_variation_search, args), heuristic, args.depth)
+    if agent_type == "pvs_iterative":
+        from search import iterative_deepening, principal_variation_search
+        heuristic = get_heuristic(args.heuristic)
+        search_fn = functools.partial(iterative_deepening, time_limit=args.time_limit, search_fn=principal_variation_search)
+        return SearchAgent(with_transposition_table(search_fn, args), heuristic, args.depth)
+    if agent_type == "mcts":
+        from mcts import MCTSAgent
+        heuristic = None if args.heuristic == "zero" else get_heuristic(args.heuristic)
+        return MCTSAgent(heuristic, args.iterations or None, None if args.iterations else args.time_limit,
+                         args.rollout_depth, opponents=args.opponents, workers=args.workers, seed=402)
     if agent_type == "expectimax":
         from search import expectimax
         heuristic = get_heuristic(args.heuristic)
-        return SearchAgent(expectimax, heuristic, args.depth)
+        return SearchAgent(with_transposition_table(expectimax, args), heuristic, args.depth)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
@@ -133,12 +163,25 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Dungeon as Human or AI")
     parser.add_argument("level", help="path to the dungeon to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'greedy', 'random', 'minimax', 'alphabeta', 'alphabeta_order', 'expectimax'],
+                        choices=['human', 'greedy', 'random', 'minimax', 'alphabeta', 'alphabeta_order', 'alphabeta_iterative', 'alphabeta_parallel', 'pvs', 'pvs_iterative', 'expectimax', 'mcts'],
                         help="the agent that will play the game")
     parser.add_argument("--heuristic", '-hf', default="zero",
                         choices=["zero", "heuristic"],
                         help="choose the heuristic to use")
-    parser.add_argument("--depth", "-d", type=int, default=5, help="How deep the algorithms should search")
+    parser.add_argument("--depth", "-d", type=int, default=5,
+                        help="How deep the algorithms should search (the maximum depth for alphabeta_iterative & pvs_iterative, where -1 means no limit)")
+    parser.add_argument("--time-limit", "-tl", type=float, default=1.0,
+                        help="How much time (seconds) alphabeta_iterative & pvs_iterative (or mcts with 0 iterations) can spend searching for each action")
+    parser.add_argument("--iterations", "-i", type=int, default=1000,
+                        help="How many iterations mcts runs for each action (0 to use the time limit instead)")
+    parser.add_argument("--rollout-depth", "-rd", type=int, default=10,
+                        help="The maximum number of random actions in each mcts rollout")
+    parser.add_argument("--opponents", "-op", default="random", choices=["random", "adversarial"],
+                        help="Whether mcts assumes that the monsters act randomly or adversarially")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+                        help="The number of processes that run mcts (each builds its own tree) or alphabeta_parallel in parallel")
+    parser.add_argument("--table-size", "-tt", type=int, default=0,
+                        help="The number of entries in the transposition table used by the search (0 disables the table)")
     parser.add_argument("--ansicolors", "-ac", action="store_true",
                         help="Print the dungeon on the console with ANSI colors (only works on some terminals)")
     parser.add_argument("--sleep", "-s", type=float, default=0, help="How much time (seconds) to wait between actions")
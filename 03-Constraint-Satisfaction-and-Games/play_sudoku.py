@@ -1,5 +1,7 @@
 from sudoku import SudokuProblem
 from CSP_solver import solve
+from CSP import Problem
+from helpers.utils import fetch_tracked_call_count
 import argparse, time
 
 # This function requests a solution from the user
@@ -52,11 +54,25 @@ def main(args: argparse.Namespace):
         solve_fn = solve_via_human
     elif agent_name == "backtrack":
         solve_fn = solve
+    elif agent_name == "backjump":
+        from CSP_backjumping import solve_with_backjumping
+        solve_fn = lambda problem: solve_with_backjumping(problem, args.ordering, args.nogoods)
+    elif agent_name == "split":
+        from CSP_parallel import solve_by_splitting
+        # The workers rebuild the problem from its text since the constraints cannot be sent to other processes
+        text = open(args.puzzle, 'r').read()
+        solve_fn = lambda _: solve_by_splitting(SudokuProblem, text, args.workers)
+    elif agent_name == "portfolio":
+        from CSP_parallel import solve_by_portfolio
+        text = open(args.puzzle, 'r').read()
+        solve_fn = lambda _: solve_by_portfolio(SudokuProblem, text, args.workers)
     else:
         print(f"Unknown Agent: {agent_name}. Please select a valid agent.")
         return
 
+    fetch_tracked_call_count(Problem.is_complete) # Clear the call counter
     result = solve_fn(problem)
+    explored_nodes = fetch_tracked_call_count(Problem.is_complete)
 
     print("The Result:")
     if result is None:
@@ -70,6 +86,8 @@ def main(args: argparse.Namespace):
                 print("The result is a complete assignment, but it does not satisfy all the constraints.")
         else:
             print("The result is an incomplete assignment.")
+    if agent_name != "human":
+        print(f"Search explored {explored_nodes} nodes")
     
     # Finally print the elapsed time for the whole process
     print(f"Done in {time.time() - start} seconds")
@@ -79,8 +97,15 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Sudoku as Human or AI")
     parser.add_argument("puzzle", help="path to the puzzle to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'backtrack'],
+                        choices=['human', 'backtrack', 'backjump', 'split', 'portfolio'],
                         help="the agent that will play the game")
+    parser.add_argument("--ordering", "-o", default="mrv",
+                        choices=['mrv', 'dom/wdeg'],
+                        help="the variable ordering used by the backjump agent")
+    parser.add_argument("--nogoods", "-n", type=int, default=10000,
+                        help="the maximum number of nogoods stored by the backjump agent (0 to disable nogood learning)")
+    parser.add_argument("--workers", "-w", type=int, default=None,
+                        help="the number of worker processes used by the split and portfolio agents (default: the number of CPUs)")
     
     args = parser.parse_args()
     try:
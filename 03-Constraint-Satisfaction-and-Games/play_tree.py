@@ -1,10 +1,10 @@
 import time
-from tree import TreeGame, TreeNode, tree_heuristic
+from tree import TreeGame, TreeState, tree_heuristic
 from agents import HumanAgent, SearchAgent, RandomAgent
 from helpers.utils import fetch_recorded_calls
 from helpers.pruned_tree import pruned_tree_string
 from helpers.mt19937 import RandomGenerator
-import argparse
+import argparse, functools
 
 seed_gen = RandomGenerator(0)
 
@@ -18,10 +18,10 @@ def get_heuristic(name: str):
     exit(-1)
 
 # Create an agent based on the user selections
-def create_agent(agent_type: str, heuristic_type: str):
+def create_agent(agent_type: str, args: argparse.Namespace):
     if agent_type == "human":
         # This function reads the action from the user (human)
-        def tree_user_action(game: TreeGame, state: TreeNode) -> int:
+        def tree_user_action(game: TreeGame, state: TreeState) -> str:
             possible_actions = list(game.get_actions(state))
             while True:
                 if possible_actions:
@@ -43,10 +43,25 @@ def create_agent(agent_type: str, heuristic_type: str):
         return SearchAgent(alphabeta)
     if agent_type == "alphabeta_order":
         from search import alphabeta_with_move_ordering
-        return SearchAgent(alphabeta_with_move_ordering, get_heuristic(heuristic_type))
+        return SearchAgent(alphabeta_with_move_ordering, get_heuristic(args.heuristic))
+    if agent_type == "alphabeta_iterative":
+        from search import iterative_deepening
+        return SearchAgent(functools.partial(iterative_deepening, time_limit=args.time_limit), get_heuristic(args.heuristic))
+    if agent_type == "pvs":
+        from search import principal_variation_search
+        return SearchAgent(principal_variation_search)
+    if agent_type == "pvs_iterative":
+        from search import iterative_deepening, principal_variation_search
+        search_fn = functools.partial(iterative_deepening, time_limit=args.time_limit, search_fn=principal_variation_search)
+        return SearchAgent(search_fn, get_heuristic(args.heuristic))
     if agent_type == "expectimax":
         from search import expectimax
         return SearchAgent(expectimax)
+    if agent_type == "mcts":
+        from mcts import MCTSAgent
+        heuristic = None if args.heuristic == "zero" else get_heuristic(args.heuristic)
+        return MCTSAgent(heuristic, args.iterations or None, None if args.iterations else args.time_limit,
+                         workers=args.workers, seed=seed_gen.generate())
     if agent_type == "random":
         return RandomAgent(seed_gen.generate())
     print(f"Requested Agent '{agent_type}' is invalid")
@@ -54,7 +69,7 @@ def create_agent(agent_type: str, heuristic_type: str):
 
 def main(args: argparse.Namespace):
     start = time.time() # Track run time
-    game = TreeGame.from_file(args.tree) # create the problem
+    game = TreeGame.from_file(args.tree, args.cache) # create the problem
     
     # Get the initial state
     state = game.get_initial_state()
@@ -63,7 +78,7 @@ def main(args: argparse.Namespace):
     
     # create the agents that will play the game
     agent_types = [args.agent, args.adversary]
-    agents = [create_agent(agent_type, args.heuristic) for agent_type in agent_types]
+    agents = [create_agent(agent_type, args) for agent_type in agent_types]
     
     step = 0 # This will store the current step
     
@@ -96,7 +111,7 @@ def main(args: argparse.Namespace):
             # draw the pruned tree
             if args.show_pruning and "alphabeta" in agent_types[turn]:
                 print("Pruned Tree:")
-                print(pruned_tree_string(state, explored_nodes))
+                print(pruned_tree_string(state.to_node(), explored_nodes))
         
         # Apply the action to the state
         state = game.get_successor(state, action)
@@ -114,15 +129,23 @@ if __name__ == "__main__":
     # Read the arguments from the command line
     parser = argparse.ArgumentParser(description="Play tree as Human or AI")
     parser.add_argument("tree", help="path to the tree to play")
+    parser.add_argument("--cache", action="store_true", default=False,
+                        help="save the tree to a binary file (the tree path + '.bin') and load it from there next time")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'minimax', 'alphabeta', 'alphabeta_order', 'expectimax', 'random'],
+                        choices=['human', 'minimax', 'alphabeta', 'alphabeta_order', 'alphabeta_iterative', 'pvs', 'pvs_iterative', 'expectimax', 'mcts', 'random'],
                         help="the agent that will play the game")
     parser.add_argument("--adversary", "-adv", default="human",
-                        choices=['human', 'minimax', 'alphabeta', 'alphabeta_order', 'expectimax', 'random'],
+                        choices=['human', 'minimax', 'alphabeta', 'alphabeta_order', 'alphabeta_iterative', 'pvs', 'pvs_iterative', 'expectimax', 'mcts', 'random'],
                         help="the agent that will play as your adversary (enemy) the game")
     parser.add_argument("--heuristic", '-hf', default="zero",
                         choices=["zero", "heuristic"],
                         help="choose the heuristic to use")
+    parser.add_argument("--time-limit", "-tl", type=float, default=1.0,
+                        help="How much time (seconds) alphabeta_iterative & pvs_iterative (or mcts with 0 iterations) can spend searching for each action")
+    parser.add_argument("--iterations", "-i", type=int, default=1000,
+                        help="How many iterations mcts runs for each action (0 to use the time limit instead)")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+                        help="The number of processes that run mcts in parallel (each builds its own tree)")
     parser.add_argument("--show-pruning", "-sp", action='store_true', default=False,
                         help="Draw the pruned tree in case the agent uses Alpha Beta pruning")
     parser.add_argument("--sleep", "-s", type=float, default=0, help="How much time (seconds) to wait between actions")
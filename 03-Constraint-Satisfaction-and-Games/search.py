@@ -1,15 +1,194 @@
-from typing import Tuple
+from typing import Dict, Hashable, List, Optional, Tuple
 from game import HeuristicFunction, Game, S, A
 from helpers.utils import NotImplemented
 
 # TODO: Import any modules you want to use
-import math
+import math, time
+from dataclasses import dataclass, field
 
 # All search functions take a problem, a state, a heuristic function and the maximum search depth.
 # If the maximum search depth is -1, then there should be no depth cutoff (The expansion should not stop before reaching a terminal state)
 
 # All the search functions should return the expected tree value and the best action to take based on the search results
 
+# The minimax, alphabeta, alphabeta_with_move_ordering, principal_variation_search and expectimax functions can optionally use a transposition table.
+
+
+# A transposition table stores the search results of the visited states, so that if a state is reached again
+# (e.g. by a different order of moves), its result can be reused instead of searching it again.
+# Each entry stores:
+#   - the remaining search depth below the state (math.inf if the state was searched until the terminal states),
+#   - a flag that tells whether the value is EXACT, a LOWER bound (the search failed high) or an UPPER bound (the search failed low),
+#   - the value and the best action found.
+# An entry can only be used for a search whose remaining depth is less than or equal to the entry's depth.
+# The table has a fixed number of entries. Each key is mapped to a bucket of 2 slots:
+#   - the first slot keeps the deepest entry (it is only replaced by an entry that is as deep or by any entry if the
+#     stored one is from an older search),
+#   - the second slot always accepts the entries rejected by the first slot.
+# IMPORTANT: The stored values depend on the heuristic, so a table must only be used with a single heuristic function.
+class TranspositionTable:
+    EXACT, LOWER, UPPER = 0, 1, 2
+
+    size: int                   # The maximum number of entries in the table
+    slots: List[Optional[tuple]] # The entries stored as (key, depth, flag, value, action, generation)
+    generation: int             # The index of the current search (used to replace the entries of the older searches)
+    probes: int                 # How many times the table was searched for an entry
+    hits: int                   # How many of these searches returned a usable entry
+
+    def __init__(self, size: int = 1 << 16) -> None:
+        self.size = max(2, size - size % 2)
+        self.slots = [None] * self.size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return sum(entry is not None for entry in self.slots)
+
+    # Should be called at the start of every search, so that the entries of the previous searches get replaced first
+    def new_search(self) -> None:
+        self.generation += 1
+
+    # Removes all the entries
+    def clear(self) -> None:
+        self.slots = [None] * self.size
+        self.generation = 0
+
+    # Returns the stored (value, action) for the key if it can be used for a search with the given remaining depth and window.
+    # Otherwise, it returns None.
+    def probe(self, key: Hashable, depth: float, alpha: float = -math.inf, beta: float = math.inf) -> Optional[Tuple[float, A]]:
+        result = self.probe_entry(key, depth, alpha, beta)
+        return None if result is None else result[1:]
+
+    # Like "probe", but it returns (the stored depth, value, action) so that the caller knows how deep the entry was searched.
+    def probe_entry(self, key: Hashable, depth: float, alpha: float = -math.inf, beta: float = math.inf) -> Optional[Tuple[float, float, A]]:
+        self.probes += 1
+        index = (hash(key) % (self.size >> 1)) << 1
+        for entry in (self.slots[index], self.slots[index + 1]):
+            if entry is None or entry[0] != key:
+                continue
+            _, entry_depth, flag, value, action, _ = entry
+            if entry_depth < depth:
+                return None
+            if flag == TranspositionTable.EXACT or \
+                (flag == TranspositionTable.LOWER and value >= beta) or \
+                (flag == TranspositionTable.UPPER and value <= alpha):
+                self.hits += 1
+                return entry_depth, value, action
+            return None
+        return None
+
+    # Stores the value and action that a search with the given remaining depth and window found for the key.
+    def store(self, key: Hashable, depth: float, value: float, action: A, alpha: float = -math.inf, beta: float = math.inf) -> None:
+        if value <= alpha:
+            flag = TranspositionTable.UPPER
+        elif value >= beta:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        entry = (key, depth, flag, value, action, self.generation)
+        index = (hash(key) % (self.size >> 1)) << 1
+        stored = self.slots[index]
+        if stored is None or stored[0] == key or stored[5] != self.generation or stored[1] <= depth:
+            self.slots[index] = entry
+        else:
+            self.slots[index + 1] = entry
+
+    # Returns the action stored for the key (regardless of the stored depth and flag), or None if the key is not stored.
+    # It is only a hint for the move ordering, so it is not counted as a probe.
+    def best_action(self, key: Hashable) -> Optional[A]:
+        index = (hash(key) % (self.size >> 1)) << 1
+        for entry in (self.slots[index], self.slots[index + 1]):
+            if entry is not None and entry[0] == key:
+                return entry[4]
+        return None
+
+# Returns a function that computes the transposition table key of a state for the given search.
+# The key contains the search kind (since the minimax & expectimax values differ) and the agent for which the
+# values are computed (since the values depend on it), in addition to the state key defined by the game.
+def transposition_key(game: Game[S, A], kind: str, agent: int):
+    get_state_key = game.get_state_key
+    return lambda state: (kind, agent, get_state_key(state))
+
+# Returns the remaining search depth for a node at the given depth (math.inf if there is no depth cutoff).
+def remaining_depth(depth: int, max_depth: int) -> float:
+    return math.inf if max_depth == -1 else max_depth - depth
+
+# Wraps a node search function (which takes the state and its depth, followed by alpha & beta if it uses alpha-beta pruning)
+# so that it looks for the state in the transposition table before searching it, and stores the result after searching it.
+# If a search context is given, the table keeps track of whether the maximum depth was reached below the stored states:
+#   - if the search of a state did not reach the maximum depth, its result does not depend on the depth,
+#     so it is stored with an infinite depth (it can be reused by deeper searches),
+#   - if a reused entry was stored by a search that reached its maximum depth, the context records that
+#     the maximum depth was reached (as if the state was searched again), so a deeper search may change the result.
+# If there is no table, the function is returned as is.
+def with_transposition_table(search_node, table: Optional[TranspositionTable], key, max_depth: int,
+                             context: Optional['SearchContext'] = None):
+    if table is None:
+        return search_node
+    def search_node_with_table(state, depth, *window):
+        state_key = key(state)
+        remaining = remaining_depth(depth, max_depth)
+        if context is None:
+            result = table.probe(state_key, remaining, *window)
+            if result is None:
+                result = search_node(state, depth, *window)
+                value, action = result
+                table.store(state_key, remaining, value, action, *window)
+            return result
+        result = table.probe_entry(state_key, remaining, *window)
+        if result is not None:
+            entry_depth, value, action = result
+            if entry_depth != math.inf:
+                context.reached_max_depth = True
+            return value, action
+        reached_before, context.reached_max_depth = context.reached_max_depth, False
+        value, action = search_node(state, depth, *window)
+        reached = context.reached_max_depth or remaining <= 0
+        table.store(state_key, remaining if reached else math.inf, value, action, *window)
+        context.reached_max_depth = reached_before or reached
+        return value, action
+    return search_node_with_table
+
+
+# This exception is raised by a search when its deadline passes (see "SearchContext").
+class SearchTimeout(Exception):
+    pass
+
+# The information that is shared between consecutive searches (e.g. the searches of iterative deepening)
+@dataclass
+class SearchContext:
+    best_moves: Dict[Hashable, A] = field(default_factory=dict) # The best action found for each state (by its key)
+    deadline: Optional[float] = None    # If not None, the search raises SearchTimeout once time.perf_counter() passes it
+    reached_max_depth: bool = False     # Whether the last search reached its maximum depth (so a deeper search may change its result)
+    killers: Dict[Tuple[int, int], List[A]] = field(default_factory=dict) # The last 2 actions that caused a cutoff at each (turn, depth)
+    history: Dict[Tuple[int, A], int] = field(default_factory=dict)       # How much each (turn, action) caused cutoffs (see "principal_variation_search")
+
+# Moves the (action, state) pair of the given action to the front of the list while keeping the order of the other pairs.
+# If the action is not in the list (or is None), the list is not changed.
+def move_to_front(actions_states: List[Tuple[A, S]], action: Optional[A]) -> None:
+    if action is None:
+        return
+    for index, (other, _) in enumerate(actions_states):
+        if other == action:
+            actions_states.insert(0, actions_states.pop(index))
+            return
+
+# Wraps a node search function (of alpha-beta pruning) so that it uses the search context:
+#   - it raises SearchTimeout if the deadline passed before searching the state,
+#   - it records whether a state at the maximum depth was reached,
+#   - it records the best action found for the state (to be searched first by the next search).
+def with_search_context(search_node, context: SearchContext, key, max_depth: int):
+    def search_node_with_context(state, depth, alpha, beta):
+        if context.deadline is not None and time.perf_counter() >= context.deadline:
+            raise SearchTimeout()
+        if depth == max_depth:
+            context.reached_max_depth = True
+        value, action = search_node(state, depth, alpha, beta)
+        if action is not None:
+            context.best_moves[key(state)] = action
+        return value, action
+    return search_node_with_context
 
 # This is a simple search function that looks 1-step ahead and returns the action that lead to highest heuristic value.
 # This algorithm is bad if the heuristic function is weak. That is why we use minimax search to look ahead for many steps.
@@ -41,7 +220,8 @@ def greedy(
 # for all the agents. So to get the value for the player (which acts at the max nodes), you need to
 # get values[0].
 def minimax(
-    game: Game[S, A], state: S, heuristic: HeuristicFunction, max_depth: int = -1
+    game: Game[S, A], state: S, heuristic: HeuristicFunction, max_depth: int = -1,
+    transposition_table: Optional[TranspositionTable] = None
 ) -> Tuple[float, A]:
     # TODO: Write this function
 
@@ -134,6 +314,13 @@ def minimax(
         # return the minimum value and the correct action
         return min_val, chosen_action
 
+    # if a transposition table is given, the results of the visited states are stored in it and reused
+    if transposition_table is not None:
+        transposition_table.new_search()
+        key = transposition_key(game, "minimax", orignal_turn)
+        max_value = with_transposition_table(max_value, transposition_table, key, max_depth)
+        min_value = with_transposition_table(min_value, transposition_table, key, max_depth)
+
     # if the current turn is 0, return the maximum value of the successors
     if orignal_turn == 0:
         return max_value(state, 0)
@@ -146,7 +333,8 @@ def minimax(
 # Apply Alpha Beta pruning and return the tree value and the best action
 # Hint: Read the hint for minimax.
 def alphabeta(
-    game: Game[S, A], state: S, heuristic: HeuristicFunction, max_depth: int = -1
+    game: Game[S, A], state: S, heuristic: HeuristicFunction, max_depth: int = -1,
+    transposition_table: Optional[TranspositionTable] = None
 ) -> Tuple[float, A]:
     # TODO: Write this function
 
@@ -266,6 +454,13 @@ def alphabeta(
         # return the maximum value and the correct action
         return max_val, correct_action
 
+    # if a transposition table is given, the results of the visited states are stored in it and reused
+    if transposition_table is not None:
+        transposition_table.new_search()
+        key = transposition_key(game, "minimax", orignal_turn)
+        max_value = with_transposition_table(max_value, transposition_table, key, max_depth)
+        min_value = with_transposition_table(min_value, transposition_table, key, max_depth)
+
     # if the current turn is 0, return the maximum value of the successors
     if orignal_turn == 0:
         return max_value(state, 0, -math.inf, math.inf)
@@ -277,8 +472,11 @@ def alphabeta(
 
 # Apply Alpha Beta pruning with move ordering and return the tree value and the best action
 # Hint: Read the hint for minimax.
+# If a search context is given (see "iterative_deepening"), the best action previously found for each state is searched first.
 def alphabeta_with_move_ordering(
-    game: Game[S, A], state: S, heuristic: HeuristicFunction, max_depth: int = -1
+    game: Game[S, A], state: S, heuristic: HeuristicFunction, max_depth: int = -1,
+    transposition_table: Optional[TranspositionTable] = None,
+    context: Optional[SearchContext] = None
 ) -> Tuple[float, A]:
     # TODO: Write this function
     # get the turn of the player that starts the game
@@ -305,6 +503,10 @@ def alphabeta_with_move_ordering(
         # sort actions_states by heuristic value in ascending order in a stable way
         actions_states.sort(key=lambda x: heuristic(game, x[1], orignal_turn))
 
+        # if the best action of this state is known from a previous search, search it first
+        if context is not None:
+            move_to_front(actions_states, context.best_moves.get(game.get_state_key(state)))
+
         # initialize the minimum value to infinity
         min_val = math.inf
 
@@ -366,6 +568,10 @@ def alphabeta_with_move_ordering(
             key=lambda x: heuristic(game, x[1], orignal_turn), reverse=True
         )
 
+        # if the best action of this state is known from a previous search, search it first
+        if context is not None:
+            move_to_front(actions_states, context.best_moves.get(game.get_state_key(state)))
+
         # initialize the maximum value to negative infinity
         max_val = -math.inf
 
@@ -404,6 +610,19 @@ def alphabeta_with_move_ordering(
         # return the maximum value and the correct action
         return max_val, correct_action
 
+    # if a transposition table is given, the results of the visited states are stored in it and reused
+    if transposition_table is not None:
+        transposition_table.new_search()
+        key = transposition_key(game, "minimax", orignal_turn)
+        max_value = with_transposition_table(max_value, transposition_table, key, max_depth, context)
+        min_value = with_transposition_table(min_value, transposition_table, key, max_depth, context)
+
+    # if a search context is given, record the best actions and stop at the deadline
+    if context is not None:
+        context.reached_max_depth = False
+        max_value = with_search_context(max_value, context, game.get_state_key, max_depth)
+        min_value = with_search_context(min_value, context, game.get_state_key, max_depth)
+
     # if the current turn is 0, return the maximum value of the successors
     if orignal_turn == 0:
         return max_value(state, 0, -math.inf, math.inf)
@@ -413,11 +632,133 @@ def alphabeta_with_move_ordering(
         return min_value(state, 0, -math.inf, math.inf)
 
 
+# Apply Principal Variation Search (PVS, also known as NegaScout) and return the tree value and the best action
+# Hint: Read the hint for minimax. The returned value is the same as the value returned by alphabeta.
+# The first action of every node is searched with the full window. Every other action is searched with a null window
+# (a window of width zero around alpha at the max nodes or around beta at the min nodes) which only tests whether
+# the action is better than the first one, and it is searched again with the full window only if the test succeeds.
+# This works well if the first action is usually the best, so the actions are ordered without calling the heuristic
+# (unlike alphabeta_with_move_ordering which calls it for every successor):
+#   1- the best action stored in the transposition table (or found by a previous search in the context),
+#   2- the killer moves: the last 2 actions that caused a cutoff at the same depth (for the same agent),
+#   3- the rest by their history score: the number of cutoffs caused by the action (for the same agent),
+#      where every cutoff is weighted by the square of the remaining depth (since the deeper cutoffs prune more nodes).
+# The killer moves and the history scores are kept in the search context, so they are reused by the next searches.
+def principal_variation_search(
+    game: Game[S, A], state: S, heuristic: HeuristicFunction, max_depth: int = -1,
+    transposition_table: Optional[TranspositionTable] = None,
+    context: Optional[SearchContext] = None
+) -> Tuple[float, A]:
+    # get the turn of the player that starts the game
+    orignal_turn = game.get_turn(state)
+
+    # the killer moves and the history scores are stored in the context (a new one is used if none is given)
+    search_context = context if context is not None else SearchContext()
+    killers, history = search_context.killers, search_context.history
+
+    # the values are the same as the minimax values, so the table entries are shared with the other minimax searches
+    key = transposition_key(game, "minimax", orignal_turn)
+
+    # this function returns the actions of the state in the order in which they should be searched
+    def ordered_actions(state, turn, depth):
+        actions = list(game.get_actions(state))
+        best_action = None
+        if transposition_table is not None:
+            best_action = transposition_table.best_action(key(state))
+        if best_action is None:
+            best_action = search_context.best_moves.get(game.get_state_key(state))
+        node_killers = killers.get((turn, depth), ())
+        def priority(action):
+            if action == best_action:
+                return (2, 0)
+            if action in node_killers:
+                return (1, -node_killers.index(action))
+            return (0, history.get((turn, action), 0))
+        # the sort is stable, so the ties keep the order of the game's actions
+        actions.sort(key=priority, reverse=True)
+        return actions
+
+    # this function records that the action caused a cutoff
+    def record_cutoff(turn, depth, action):
+        node_killers = killers.setdefault((turn, depth), [])
+        if action in node_killers:
+            node_killers.remove(action)
+        node_killers.insert(0, action)
+        del node_killers[2:]
+        weight = 1 if max_depth == -1 else (max_depth - depth) ** 2
+        history[(turn, action)] = history.get((turn, action), 0) + weight
+
+    # this function returns the value of the state (a max node if it is the turn of agent 0, otherwise a min node)
+    def search(state, depth, alpha, beta):
+        # check if the state is terminal
+        terminal, values = game.is_terminal(state)
+
+        # if the state is terminal, return the state utility
+        if terminal:
+            return values[orignal_turn], None
+
+        # if the depth is equal to the maximum depth, return the heuristic value
+        if depth == max_depth:
+            return heuristic(game, state, orignal_turn), None
+
+        turn = game.get_turn(state)
+        maximize = turn == 0
+        best_val = -math.inf if maximize else math.inf
+        correct_action = None
+
+        # the successors are only generated when they are searched (the actions after a cutoff are never generated)
+        for index, action in enumerate(ordered_actions(state, turn, depth)):
+            successor = game.get_successor(state, action)
+            if index == 0 or (alpha == -math.inf if maximize else beta == math.inf):
+                # the first action (or any action while the window is still unbounded) is searched with the full window
+                successor_value = search(successor, depth + 1, alpha, beta)[0]
+            else:
+                # test whether the action is better than the best action so far using a null window
+                if maximize:
+                    successor_value = search(successor, depth + 1, alpha, math.nextafter(alpha, math.inf))[0]
+                else:
+                    successor_value = search(successor, depth + 1, math.nextafter(beta, -math.inf), beta)[0]
+                # if it is better (and it does not cause a cutoff), search it again with the full window to get its exact value
+                if alpha < successor_value < beta:
+                    successor_value = search(successor, depth + 1, alpha, beta)[0]
+
+            if maximize:
+                if successor_value > best_val:
+                    best_val, correct_action = successor_value, action
+                if best_val >= beta:
+                    record_cutoff(turn, depth, action)
+                    return best_val, correct_action
+                alpha = max(alpha, best_val)
+            else:
+                if successor_value <= best_val:
+                    best_val, correct_action = successor_value, action
+                if best_val <= alpha:
+                    record_cutoff(turn, depth, action)
+                    return best_val, correct_action
+                beta = min(beta, best_val)
+
+        # return the best value and the correct action
+        return best_val, correct_action
+
+    # if a transposition table is given, the results of the visited states are stored in it and reused
+    if transposition_table is not None:
+        transposition_table.new_search()
+        search = with_transposition_table(search, transposition_table, key, max_depth, context)
+
+    # if a search context is given, record the best actions and stop at the deadline
+    if context is not None:
+        context.reached_max_depth = False
+        search = with_search_context(search, context, game.get_state_key, max_depth)
+
+    return search(state, 0, -math.inf, math.inf)
+
+
 # Apply Expectimax search and return the tree value and the best action
 # Hint: Read the hint for minimax, but note that the monsters (turn > 0) do not act as min nodes anymore,
 # they now act as chance nodes (they act randomly).
 def expectimax(
-    game: Game[S, A], state: S, heuristic: HeuristicFunction, max_depth: int = -1
+    game: Game[S, A], state: S, heuristic: HeuristicFunction, max_depth: int = -1,
+    transposition_table: Optional[TranspositionTable] = None
 ) -> Tuple[float, A]:
     # TODO: Write this function
     # get the turn of the player that starts the game
@@ -495,6 +836,13 @@ def expectimax(
         # return the maximum value and the correct action
         return max_val, correct_action
 
+    # if a transposition table is given, the results of the visited states are stored in it and reused
+    if transposition_table is not None:
+        transposition_table.new_search()
+        key = transposition_key(game, "expectimax", orignal_turn)
+        max_value = with_transposition_table(max_value, transposition_table, key, max_depth)
+        expected_value = with_transposition_table(expected_value, transposition_table, key, max_depth)
+
     # return the value of the state and the correct action
     # if the current turn is 0, return the maximum value of the successors
     if orignal_turn == 0:
@@ -503,3 +851,35 @@ def expectimax(
     # if the current turn is not 0, return the expected value of the successors
     else:
         return expected_value(state, 0)
+
+
+
+# Apply iterative deepening using Alpha Beta pruning with move ordering and return the tree value and the best action
+# The search function can be replaced by any search that takes a search context (e.g. principal_variation_search).
+# The search is repeated with the maximum depth increased by 1 every time (starting from 1) until:
+#   - the time limit (in seconds) passes, in which case the unfinished search is abandoned,
+#   - the given maximum depth is reached (if it is not -1),
+#   - or a search does not reach its maximum depth (so searching deeper would not change the result).
+# Every search starts with the best actions (the principal variation and the best replies to the other moves)
+# found by the previous searches, so most of the pruning happens early.
+# The result of the deepest completed search is returned. The first search (depth 1) is always completed.
+def iterative_deepening(
+    game: Game[S, A], state: S, heuristic: HeuristicFunction, max_depth: int = -1,
+    time_limit: float = 1.0,
+    transposition_table: Optional[TranspositionTable] = None,
+    search_fn = alphabeta_with_move_ordering
+) -> Tuple[float, A]:
+    deadline = time.perf_counter() + time_limit
+    context = SearchContext()
+    result = search_fn(game, state, heuristic, 1, transposition_table, context)
+    depth = 1
+    # A deeper search is only needed if the last search reached its maximum depth
+    # (with a transposition table, the reused entries tell whether they reached it, see "with_transposition_table")
+    while (max_depth == -1 or depth < max_depth) and context.reached_max_depth:
+        depth += 1
+        context.deadline = deadline
+        try:
+            result = search_fn(game, state, heuristic, depth, transposition_table, context)
+        except SearchTimeout:
+            break
+    return result
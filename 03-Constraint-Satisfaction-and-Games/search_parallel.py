@@ -0,0 +1,149 @@
+from typing import Callable, Optional, Tuple
+from game import HeuristicFunction, Game, S, A
+from helpers.utils import fetch_tracked_call_count
+import math, multiprocessing, os
+
+# This file contains a parallel version of alpha-beta pruning that splits the search at the root (Young Brothers Wait):
+#   1- The first root action (the eldest brother) is searched serially to get a bound on the root value.
+#   2- The other root actions (the younger brothers) are searched in parallel by a pool of worker processes.
+# The best value found so far is shared with the workers (through shared memory), and every worker reads it at every node
+# it searches, so a worker prunes using the values found by the other workers even if they finish after it started.
+# The result (the value and the action) is the same as the result of "search.alphabeta" if the root is a max node
+# (the turn of agent 0, which is always the case for the player's agent). At a min root, the value is the same,
+# but the action is the last action with the minimum value (like "search.minimax") since the action that "search.alphabeta"
+# returns there depends on the bounds it gets for the pruned actions.
+# The nodes explored by the workers are added to the call counter of "is_terminal" (if the game tracks it),
+# so they can be read by "fetch_tracked_call_count" as if the search ran in the current process.
+
+# A function that takes the window (alpha, beta) of a node and returns a window that is as tight or tighter
+WindowFunction = Callable[[float, float], Tuple[float, float]]
+
+# Searches the state using alpha-beta pruning within the window (alpha, beta) and returns its value for the given agent.
+# The search is fail-soft: if the value is outside the window, the returned value is a bound on the value
+# (an upper bound if it is <= alpha, or a lower bound if it is >= beta).
+# The state is at the given depth of the whole search (so it stops at the same depth as a search started from the root).
+# If a tighten function is given, the window of every node is tightened using it before searching the node's children.
+def alphabeta_value(
+    game: Game[S, A], state: S, heuristic: HeuristicFunction, agent: int, depth: int, max_depth: int,
+    alpha: float = -math.inf, beta: float = math.inf, tighten: Optional[WindowFunction] = None
+) -> float:
+    def value(state, depth, alpha, beta):
+        terminal, values = game.is_terminal(state)
+        if terminal:
+            return values[agent]
+        if depth == max_depth:
+            return heuristic(game, state, agent)
+        if tighten is not None:
+            alpha, beta = tighten(alpha, beta)
+        # Like "search.alphabeta", it is a max node if it is the turn of agent 0, otherwise it is a min node
+        if game.get_turn(state) == 0:
+            best = -math.inf
+            for action in game.get_actions(state):
+                best = max(best, value(game.get_successor(state, action), depth + 1, alpha, beta))
+                if best >= beta:
+                    return best
+                alpha = max(alpha, best)
+        else:
+            best = math.inf
+            for action in game.get_actions(state):
+                best = min(best, value(game.get_successor(state, action), depth + 1, alpha, beta))
+                if best <= alpha:
+                    return best
+                beta = min(beta, best)
+        return best
+    return value(state, depth, alpha, beta)
+
+# Returns the number of nodes explored since the last call (if the game tracks the calls of "is_terminal")
+def fetch_explored_nodes(game: Game) -> int:
+    calls = fetch_tracked_call_count(type(game).is_terminal)
+    return calls if isinstance(calls, int) else 0
+
+# Returns the function that tightens the windows using the shared best value of the root's children.
+# The bound is loosened by the smallest possible step, so that an action whose value equals the best value is
+# still searched exactly (so the ties are broken in the same way as the serial search).
+def root_window(bound, maximize: bool) -> WindowFunction:
+    if maximize:
+        return lambda alpha, beta: (max(alpha, math.nextafter(bound.value, -math.inf)), beta)
+    return lambda alpha, beta: (alpha, min(beta, math.nextafter(bound.value, math.inf)))
+
+# The search that each worker process runs (it is set by "init_worker" when the worker starts)
+worker_search = None
+
+# Prepares the worker process to search the root actions of the given state.
+# The bound is the shared best value of the root's children (it is only written by the main process).
+def init_worker(game: Game[S, A], state: S, heuristic: HeuristicFunction, max_depth: int, bound) -> None:
+    global worker_search
+    agent = game.get_turn(state)
+    tighten = root_window(bound, agent == 0)
+    def search(task: Tuple[int, A]) -> Tuple[int, float, int]:
+        index, action = task
+        fetch_explored_nodes(game) # Clear the call counter
+        value = alphabeta_value(game, game.get_successor(state, action), heuristic, agent, 1, max_depth, tighten=tighten)
+        return index, value, fetch_explored_nodes(game)
+    worker_search = search
+
+# This is the function run by each worker process for every task
+def search_worker(task: Tuple[int, A]) -> Tuple[int, float, int]:
+    return worker_search(task)
+
+# Apply Alpha Beta pruning in parallel (see the top of this file) and return the tree value and the best action
+# If workers is None, the number of CPUs is used. With a single worker, the whole search runs in the current process.
+def parallel_alphabeta(
+    game: Game[S, A], state: S, heuristic: HeuristicFunction, max_depth: int = -1,
+    workers: Optional[int] = None
+) -> Tuple[float, A]:
+    workers = workers or os.cpu_count() or 1
+    agent = game.get_turn(state)
+    maximize = agent == 0
+
+    terminal, values = game.is_terminal(state)
+    if terminal:
+        return values[agent], None
+    if max_depth == 0:
+        return heuristic(game, state, agent), None
+
+    actions = list(game.get_actions(state))
+    results = [None] * len(actions)
+
+    # Search the first action serially to get the first bound
+    results[0] = alphabeta_value(game, game.get_successor(state, actions[0]), heuristic, agent, 1, max_depth)
+
+    # The best value found so far (shared with the workers)
+    bound = multiprocessing.RawValue('d', results[0])
+    update_bound = max if maximize else min
+
+    if len(actions) > 1 and workers > 1:
+        # Search the other actions in parallel
+        explored = 0
+        pool = multiprocessing.Pool(
+            min(workers, len(actions) - 1), initializer=init_worker, initargs=(game, state, heuristic, max_depth, bound)
+        )
+        try:
+            tasks = list(enumerate(actions))[1:]
+            for index, value, nodes in pool.imap_unordered(search_worker, tasks):
+                results[index] = value
+                explored += nodes
+                bound.value = update_bound(bound.value, value)
+        finally:
+            pool.terminate()
+            pool.join()
+        is_terminal = type(game).is_terminal
+        if isinstance(getattr(is_terminal, "calls", None), int):
+            is_terminal.calls += explored
+    else:
+        # With a single worker, the other actions are searched serially in the same way
+        tighten = root_window(bound, maximize)
+        for index in range(1, len(actions)):
+            successor = game.get_successor(state, actions[index])
+            results[index] = alphabeta_value(game, successor, heuristic, agent, 1, max_depth, tighten=tighten)
+            bound.value = update_bound(bound.value, results[index])
+
+    # The values that are not exact (the pruned actions) are always worse than the best value, so the best action
+    # is the first action with the best value at a max node, or the last one at a min node
+    if maximize:
+        value = max(results)
+        action = actions[results.index(value)]
+    else:
+        value = min(results)
+        action = actions[len(results) - 1 - results[::-1].index(value)]
+    return value, action
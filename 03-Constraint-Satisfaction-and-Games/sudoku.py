@@ -1,5 +1,6 @@
-from typing import Dict
-from CSP import Assignment, Problem, UnaryConstraint, BinaryConstraint
+from typing import Dict, List, Optional, Tuple
+import re
+from CSP import Assignment, Problem, UnaryConstraint, BinaryConstraint, NotEqual, NotEqualTo
 
 # A class for the sudoku problem which inherits from the generic CSP problem class
 class SudokuProblem(Problem):
@@ -17,11 +18,58 @@ class SudokuProblem(Problem):
         lines = [' | '.join(' '.join(group) for group in group_elements(line, cell_dim)) for line in lines]
         return separator.join('\n'.join(group) for group in group_elements(lines, cell_dim))
 
+    # Convert an assignment into a single line (row by row) where each cell is a character or '.' if it has no value.
+    # This is the format used by "from_line" and by the batch solver (see "from_line" for the values above 9).
+    def format_line(self, assignment: Assignment) -> str:
+        values = {**assignment, **self.clues}
+        cells = [values.get(str((r,c))) for r in range(self.size) for c in range(self.size)]
+        if self.size >= len(SudokuProblem.LINE_CHARACTERS):
+            return ' '.join(str(value or '.') for value in cells)
+        return ''.join(SudokuProblem.LINE_CHARACTERS[value] if value else '.' for value in cells)
+
+    # The characters of the values in a line (the index of a character is its value, and '0' also means an empty cell)
+    LINE_CHARACTERS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    # The value of every character that can appear in a line (None for an empty cell)
+    LINE_VALUES = {
+        '.': None, '0': None,
+        **{character: value for value, character in enumerate(LINE_CHARACTERS) if value != 0},
+        **{character.lower(): value for value, character in enumerate(LINE_CHARACTERS) if value > 9},
+    }
+
+    # Read a sudoku puzzle from a single line (row by row) in one of the following formats:
+    #   - One character per cell: a digit, a letter for the values above 9 ('A' = 10, 'B' = 11, ..., 'Z' = 35),
+    #     or '.' (or '0') if it is empty. For example, a 9x9 puzzle is a line of 81 characters.
+    #   - The cells separated by spaces or commas: a number or '.' (or '0') if it is empty (e.g. for puzzles larger than 35x35).
+    # The line is rejected (using the same exception as "from_text") if a cell is not a valid value for the size of the puzzle
+    # or if two clues conflict (the same value appears twice in a row, column or square).
+    # The problem is built from the cached skeleton of its size, so it is much faster than "from_text".
+    # The built problem is equivalent to the one built by "from_text" after applying 1-Consistency.
+    @staticmethod
+    def from_line(line: str) -> 'SudokuProblem':
+        line = line.strip()
+        cells = re.split(r'[\s,]+', line) if re.search(r'[\s,]', line) else line
+        size = int(round(len(cells) ** 0.5))
+        cell_dim = int(round(size ** 0.5))
+        if size == 0 or size * size != len(cells) or cell_dim * cell_dim != size:
+            raise Exception("Failed to parse:" + line)
+        values = SudokuProblem.LINE_VALUES
+        if cells is line:
+            grid = [values.get(cell, -1) for cell in cells]
+        else:
+            grid = [None if cell in ('.', '0') else (int(cell) if cell.isdecimal() else -1) for cell in cells]
+        if any(value is not None and not 1 <= value <= size for value in grid):
+            raise Exception("Failed to parse:" + line)
+        skeleton = SudokuSkeleton.get(size)
+        if skeleton.has_conflicts(grid):
+            raise Exception("Failed to parse:" + line)
+        return skeleton.build(grid)
+
     # Read a sudoku puzzle from a string
     @staticmethod
     def from_text(text: str) -> 'SudokuProblem':
-        not_equal_condition = lambda a, b: a != b
-        unary_not_equal_condition = lambda f: (lambda v: v != f)
+        # The conditions are relations (instead of lambdas) so that the problem can be pickled
+        not_equal_condition = NotEqual()
+        unary_not_equal_condition = NotEqualTo
         
         lines = [line.strip() for line in text.splitlines()]
         lines = [line.replace('| ', '').split() for line in lines if len(line) != 0 and not line.startswith('-')]
@@ -84,4 +132,88 @@ class SudokuProblem(Problem):
     @staticmethod
     def from_file(path: str) -> "SudokuProblem":
         with open(path, 'r') as f:
-            return SudokuProblem.from_text(f.read())
\ No newline at end of file
+            return SudokuProblem.from_text(f.read())
+
+# This class contains the parts of a sudoku problem that only depend on the size of the grid.
+# It is built once for each size and reused to build the problems of many puzzles quickly (see "SudokuProblem.from_line").
+# The binary constraints are kept in the same order in which "SudokuProblem.from_text" creates them,
+# so the problems built from the skeleton are solved exactly like the ones built from the text.
+class SudokuSkeleton:
+    size: int                                   # The size of the sudoku puzzle.
+    cells: List[str]                            # The variable name of each cell (row by row).
+    groups: List[List[int]]                     # The indices of the cells in each row, column and square.
+    peers: List[List[int]]                      # For each cell, the indices of the cells in the same row, column or square.
+    pairs: List[Tuple[int, int]]                # The indices of the cells in each binary constraint.
+    constraints: List[BinaryConstraint]         # The binary constraints between every pair in "pairs".
+
+    __cache: Dict[int, 'SudokuSkeleton'] = {}
+
+    def __init__(self, size: int) -> None:
+        not_equal_condition = NotEqual()
+        cell_dim = int(size ** 0.5)
+        if cell_dim * cell_dim != size:
+            raise Exception(f"Invalid sudoku size: {size}")
+        self.size = size
+        self.cells = [str((r, c)) for r in range(size) for c in range(size)]
+        rows = [[r * size + c for c in range(size)] for r in range(size)]
+        cols = [[r * size + c for r in range(size)] for c in range(size)]
+        sqrs = [[] for _ in range(size)]
+        for r in range(size):
+            for c in range(size):
+                sqrs[(r//cell_dim) * cell_dim + (c//cell_dim)].append(r * size + c)
+        self.groups = rows + cols + sqrs
+        self.pairs = []
+        # Like "from_text", the pairs are created for each cell in the rows, then the columns, then the squares.
+        # Note that the cells in the same row (or column) and square appear in two pairs, like in "from_text".
+        for groups in (rows, cols, sqrs):
+            for group in groups:
+                for index, cell in enumerate(group):
+                    self.pairs.extend((cell, other) for other in group[index+1:])
+        self.peers = [set() for _ in self.cells]
+        for cell, other in self.pairs:
+            self.peers[cell].add(other)
+            self.peers[other].add(cell)
+        self.peers = [sorted(peers) for peers in self.peers]
+        self.constraints = [
+            BinaryConstraint((self.cells[cell], self.cells[other]), not_equal_condition)
+            for cell, other in self.pairs
+        ]
+
+    # Returns the skeleton of the given size (it is only built the first time it is requested).
+    @staticmethod
+    def get(size: int) -> 'SudokuSkeleton':
+        skeleton = SudokuSkeleton.__cache.get(size)
+        if skeleton is None:
+            skeleton = SudokuSkeleton.__cache[size] = SudokuSkeleton(size)
+        return skeleton
+
+    # Returns True if the same value is given to two cells in the same row, column or square
+    # (the grid is a list of values (row by row) where None means that the cell is empty).
+    def has_conflicts(self, grid: List[Optional[int]]) -> bool:
+        for group in self.groups:
+            values = [grid[cell] for cell in group if grid[cell] is not None]
+            if len(set(values)) != len(values):
+                return True
+        return False
+
+    # Builds the problem of a puzzle given as a list of values (row by row) where None means that the cell is empty.
+    # Instead of creating unary constraints for the clues, the domains are directly restricted
+    # (which is the same result that 1-Consistency would give).
+    def build(self, grid: List[Optional[int]]) -> SudokuProblem:
+        if len(grid) != len(self.cells):
+            raise Exception(f"Expected {len(self.cells)} cells, got {len(grid)}")
+        domain = set(range(1, self.size+1))
+        problem = SudokuProblem()
+        problem.size = self.size
+        problem.clues = {self.cells[cell]: value for cell, value in enumerate(grid) if value is not None}
+        problem.variables = [self.cells[cell] for cell, value in enumerate(grid) if value is None]
+        problem.domains = {
+            self.cells[cell]: domain.difference(grid[peer] for peer in self.peers[cell])
+            for cell, value in enumerate(grid) if value is None
+        }
+        problem.constraints = [
+            constraint
+            for (cell, other), constraint in zip(self.pairs, self.constraints)
+            if grid[cell] is None and grid[other] is None
+        ]
+        return problem
@@ -1,7 +1,8 @@
 from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 from dataclasses import dataclass
+from array import array
 from game import Game
-import json
+import json, os, sys
 
 from helpers.utils import record_calls
 
@@ -63,18 +64,217 @@ class TreeNode:
         root = convert(problem_def, 'root')
         return root
 
+# A flat (array-backed) representation of a game tree that is built once when the tree is loaded.
+# The nodes are numbered in breadth-first order (the root is 0), so the children of every node are consecutive:
+# the children of the node i are the nodes offsets[i] to offsets[i+1]-1 (in the same order as in the tree file).
+# The leaf values are stored as integers if all the leaves are integers (like in the JSON file), otherwise as floats.
+# The arrays can be saved to (and loaded from) a binary file, which is much faster to load than the JSON file.
+# The binary file is little-endian (whatever the byte order of the machine that saved it).
+class ArrayTree:
+    MAGIC = b"ARRAYTREE2"   # The first bytes of a binary tree file
+
+    labels: List[str]       # The name of the action that leads to each node from its parent ("root" for the root)
+    parents: array          # The index of the parent of each node (-1 for the root)
+    offsets: array          # The index of the first child of each node (followed by an extra entry for the end of the last node)
+    leaves: bytearray       # 1 if the node is a leaf (a terminal state), otherwise 0
+    values: array           # The value of each leaf (0 for the other nodes) as integers ('q') or floats ('d')
+    depths: array           # The depth of each node (the root is at depth 0)
+    means: array            # The value of each leaf, or the mean of the children's means for the other nodes (used by tree_heuristic)
+
+    def __init__(self, labels: List[str], parents: array, offsets: array, leaves: bytearray, values: array, depths: array, means: array) -> None:
+        self.labels = labels
+        self.parents = parents
+        self.offsets = offsets
+        self.leaves = leaves
+        self.values = values
+        self.depths = depths
+        self.means = means
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    # Builds the tree from its JSON definition (a nested dictionary where the leaves are the values)
+    @staticmethod
+    def from_json(definition: Union[float, Dict[str, Any]]) -> 'ArrayTree':
+        labels, parents, depths = ["root"], array('q', [-1]), array('i', [0])
+        offsets, leaves, values = array('q'), bytearray(), []
+        # The nodes are visited in breadth-first order (the children are appended to the list while it is being iterated)
+        nodes = [definition]
+        for index, node in enumerate(nodes):
+            offsets.append(len(nodes))
+            if isinstance(node, dict):
+                leaves.append(0)
+                values.append(0)
+                for label, child in node.items():
+                    labels.append(label)
+                    parents.append(index)
+                    depths.append(depths[index] + 1)
+                    nodes.append(child)
+            else:
+                leaves.append(1)
+                values.append(node)
+        offsets.append(len(nodes))
+        integral = all(type(value) is int for value in values)
+        values = array('q' if integral else 'd', values)
+        # The means are computed from the deepest nodes up (the children always come after their parent)
+        means = array('d', values)
+        for index in range(len(nodes) - 1, -1, -1):
+            start, end = offsets[index], offsets[index + 1]
+            if start != end:
+                means[index] = sum(means[start:end]) / (end - start)
+        return ArrayTree(labels, parents, offsets, leaves, values, depths, means)
+
+    # Builds the tree from a tree node (see TreeNode)
+    @staticmethod
+    def from_node(root: TreeNode) -> 'ArrayTree':
+        def to_json(node: TreeNode) -> Union[float, Dict[str, Any]]:
+            if node.children is None:
+                return node.value
+            return {key: to_json(child) for key, child in node.children.items()}
+        return ArrayTree.from_json(to_json(root))
+
+    # Returns the index of the child that the action leads to
+    def child(self, index: int, action: str) -> int:
+        return self.labels.index(action, self.offsets[index], self.offsets[index + 1])
+
+    # Returns the full name of a node (e.g. "root/A/B")
+    def name(self, index: int) -> str:
+        labels = []
+        while index != -1:
+            labels.append(self.labels[index])
+            index = self.parents[index]
+        return '/'.join(reversed(labels))
+
+    # Returns the subtree under the given node as a tree node (used to draw the tree)
+    def to_node(self, index: int = 0) -> TreeNode:
+        def convert(index: int, name: str) -> TreeNode:
+            if self.leaves[index]:
+                return TreeNode(name, None, self.values[index])
+            children = range(self.offsets[index], self.offsets[index + 1])
+            return TreeNode(name, {self.labels[child]: convert(child, f'{name}/{self.labels[child]}') for child in children}, 0)
+        return convert(index, self.name(index))
+
+    # Saves the tree to a binary file
+    # The file contains the magic bytes, the typecode of the values, the number of nodes, the arrays, the leaf flags and the labels.
+    def save(self, path: str) -> None:
+        encoded = [label.encode() for label in self.labels]
+        label_ends = array('q')
+        end = 0
+        for label in encoded:
+            end += len(label)
+            label_ends.append(end)
+        with open(path, 'wb') as f:
+            f.write(ArrayTree.MAGIC)
+            f.write(self.values.typecode.encode())
+            for data in (array('q', [len(self.labels)]), self.parents, self.offsets, self.values, self.depths, self.means, label_ends):
+                if sys.byteorder == 'big':
+                    data = array(data.typecode, data)
+                    data.byteswap()
+                data.tofile(f)
+            f.write(self.leaves)
+            f.write(b''.join(encoded))
+
+    # Loads a tree saved by "save"
+    @staticmethod
+    def load(path: str) -> 'ArrayTree':
+        with open(path, 'rb') as f:
+            if f.read(len(ArrayTree.MAGIC)) != ArrayTree.MAGIC:
+                raise ValueError(f"'{path}' is not a binary tree file")
+            value_typecode = f.read(1).decode()
+            def read(typecode: str, size: int) -> array:
+                data = array(typecode)
+                data.fromfile(f, size)
+                if sys.byteorder == 'big':
+                    data.byteswap()
+                return data
+            count = read('q', 1)[0]
+            arrays = [
+                read(typecode, size)
+                for typecode, size in (('q', count), ('q', count + 1), (value_typecode, count), ('i', count), ('d', count), ('q', count))
+            ]
+            parents, offsets, values, depths, means, label_ends = arrays
+            leaves = bytearray(f.read(count))
+            encoded = f.read()
+        labels, start = [], 0
+        for end in label_ends:
+            labels.append(encoded[start:end].decode())
+            start = end
+        return ArrayTree(labels, parents, offsets, leaves, values, depths, means)
+
+    # Reads a tree from a JSON file.
+    # If cache is True, the tree is saved to a binary file next to the JSON file (with the extension ".bin" appended),
+    # and it is loaded from that binary file next time (unless the JSON file was modified after it was saved,
+    # or the binary file was saved in an older format, in which case it is saved again).
+    @staticmethod
+    def from_file(path: str, cache: bool = False) -> 'ArrayTree':
+        cache_path = path + ".bin"
+        if cache and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+            try:
+                return ArrayTree.load(cache_path)
+            except ValueError:
+                pass
+        with open(path, 'r') as f:
+            tree = ArrayTree.from_json(json.load(f))
+        if cache:
+            tree.save(cache_path)
+        return tree
+
+# A state of the tree game is a reference to a node in the array tree.
+# It has a "name" (e.g. "root/A/B") and a "value" (for the leaves) like the tree nodes.
+class TreeState:
+    __slots__ = ("tree", "index")
+
+    tree: ArrayTree
+    index: int
+
+    def __init__(self, tree: ArrayTree, index: int) -> None:
+        self.tree = tree
+        self.index = index
+
+    @property
+    def name(self) -> str:
+        return self.tree.name(self.index)
+
+    @property
+    def value(self) -> float:
+        return self.tree.values[self.index]
+
+    # Returns the subtree under this state as a tree node
+    def to_node(self) -> TreeNode:
+        return self.tree.to_node(self.index)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, TreeState) and self.tree is other.tree and self.index == other.index
+
+    def __hash__(self) -> int:
+        return hash(self.index)
+
+    def __str__(self) -> str:
+        return str(self.to_node())
+
+    def __repr__(self) -> str:
+        return f"TreeState({self.name})"
+
 # This is the implementation of a game played on a game tree
-class TreeGame(Game[List, str]):
+# The tree is stored as an ArrayTree, and the states are references to its nodes
+class TreeGame(Game[TreeState, str]):
     
-    __root: TreeNode    # the root of the game tree
+    __tree: ArrayTree   # the game tree
     
-    def __init__(self, root: TreeNode) -> None:
+    def __init__(self, tree: Union[ArrayTree, TreeNode]) -> None:
         super().__init__()
-        self.__root = root
+        if isinstance(tree, TreeNode):
+            tree = ArrayTree.from_node(tree)
+        self.__tree = tree
+
+    # the game tree
+    @property
+    def tree(self) -> ArrayTree:
+        return self.__tree
     
     # This function returns the initial state
-    def get_initial_state(self) -> TreeNode:
-        return self.__root
+    def get_initial_state(self) -> TreeState:
+        return TreeState(self.__tree, 0)
 
     # how many agents are playing this game
     # For this game, there are 2 agents
@@ -86,39 +286,40 @@ class TreeGame(Game[List, str]):
     # if it is a terminal state, the second return value will be a list of terminal values for all agents
     # if it is not a terminal state, the second return value will be None
     @record_calls
-    def is_terminal(self, state: TreeNode) -> Tuple[bool, Optional[List[float]]]:
-        if state.children is None:
-            return True, [state.value, -state.value]
+    def is_terminal(self, state: TreeState) -> Tuple[bool, Optional[List[float]]]:
+        tree = state.tree
+        if tree.leaves[state.index]:
+            value = tree.values[state.index]
+            return True, [value, -value]
         else:
             return False, None
 
     # This function returns the index of the agent whose turn in now
-    def get_turn(self, state: TreeNode) -> int:
-        return state.name.count('/') % 2
+    def get_turn(self, state: TreeState) -> int:
+        return state.tree.depths[state.index] % 2
 
     # This function returns all the possible actions from the given state
-    def get_actions(self, state: TreeNode) -> Iterable[int]:
-        if state.children is None:
-            return []
-        return list(state.children.keys())
+    def get_actions(self, state: TreeState) -> Iterable[str]:
+        tree, index = state.tree, state.index
+        return tree.labels[tree.offsets[index]:tree.offsets[index + 1]]
 
     # Given a state and an action, this function returns the next state 
-    def get_successor(self, state: TreeNode, action: str) -> TreeNode:
-        return state.children[action]
+    def get_successor(self, state: TreeState, action: str) -> TreeState:
+        return TreeState(state.tree, state.tree.child(state.index, action))
+
+    # Since the game is a tree, every node is reached by a single path, so its index identifies it
+    def get_state_key(self, state: TreeState) -> int:
+        return state.index
     
-    # create a tree game from a path to a tree file
+    # create a tree game from a path to a tree file (see "ArrayTree.from_file" for the binary cache)
     @staticmethod
-    def from_file(path: str) -> 'TreeGame':
-        return TreeGame(TreeNode.from_file(path))
+    def from_file(path: str, cache: bool = False) -> 'TreeGame':
+        return TreeGame(ArrayTree.from_file(path, cache))
 
 # This heuristic is unrealistic but so is the tree game (we rarely have the whole game tree stored in memory)
 # We will use it for the ordering in Alpha Beta with Move Ordering
-def tree_heuristic(game: TreeGame, state: TreeNode, agent: int):
-    def recursive_sum(state: TreeNode):
-        if state.children is None:
-            return state.value
-        else:
-            return sum(recursive_sum(child) for child in state.children.values())/len(state.children)
-    value = recursive_sum(state)
+# The value is the mean of the children's values computed recursively (it is precomputed for all the nodes by ArrayTree)
+def tree_heuristic(game: TreeGame, state: TreeState, agent: int):
+    value = state.tree.means[state.index]
     if agent != 0: value = -value
     return value
\ No newline at end of file
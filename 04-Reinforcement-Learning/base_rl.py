@@ -6,6 +6,11 @@ from helpers.mt19937 import RandomGenerator
 import json
 from collections import defaultdict
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 RLAgent = Agent[S, A]
 
 # The type definition for a set of features representing a state
@@ -23,4 +28,11 @@ class FeatureExtractor(Generic[S, A]):
     
     # Given an enviroment and an observation (a state), return a set of features that represent the given state
     def extract_features(self, env: Environment[S, A], state: S) -> Features:
-        return {}
\ No newline at end of file
+        return {}
+
+    # Given an enviroment and an observation (a state), return the features as a NumPy array ordered by "feature_names"
+    # This is used by the vectorized Approximate Q-Learning agent. By default, it converts the output of "extract_features",
+    # but it can be overriden to build the array directly.
+    def extract_feature_vector(self, env: Environment[S, A], state: S) -> "np.ndarray":
+        features = self.extract_features(env, state)
+        return np.array([features.get(feature, 0) for feature in self.feature_names], dtype=float)
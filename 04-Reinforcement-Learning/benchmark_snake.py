@@ -0,0 +1,81 @@
+from snake import SnakeEnv
+from agents import RandomAgent
+from reinforcement_learning import ApproximateQLearningAgent
+from features_snake import SnakeFeatureExtractor
+from training_loops import q_agent_training_loop, vector_q_agent_training_loop
+from vector_env import VectorEnv
+from evaluate_snake import ACTIONS
+import argparse, time
+
+# This script measures the throughput (steps per second) of the snake learning pipeline on levels of different sizes:
+#   - Environment: stepping the environment with random actions.
+#   - Features: stepping the environment with random actions and extracting the features of every observation.
+#   - Training: training the approximate Q-learning agent (using dictionaries or vectorized) with a single environment
+#     and with copies of the environment stepped in lockstep (see "vector_env.py") in the current process
+#     and in worker processes (if "--processes" is positive).
+# Every measurement is repeated a few times and the fastest run is reported (to reduce the noise of the measurements).
+
+# Steps the environment with random actions (and extracts the features if requested) and returns the elapsed time
+def time_environment(width: int, height: int, steps: int, step_limit: int, seed: int, features: bool) -> float:
+    env, agent = SnakeEnv(width, height), RandomAgent(seed)
+    extractor = SnakeFeatureExtractor()
+    start = time.perf_counter()
+    state, step = env.reset(seed), 0
+    for _ in range(steps):
+        state, _, done, _ = env.step(agent.act(env, state))
+        if features: extractor.extract_features(env, state)
+        step += 1
+        if done or step == step_limit:
+            state, step = env.reset(), 0
+    return time.perf_counter() - start
+
+# Trains an agent for the given number of steps (on copies of the environment if envs > 1) and returns the elapsed time
+def time_training(width: int, height: int, steps: int, step_limit: int, seed: int, envs: int, vectorized: bool,
+                  processes: int = 0) -> float:
+    agent = ApproximateQLearningAgent(SnakeFeatureExtractor(), ACTIONS, 0.9, 0.1, 0.01, seed, vectorized=vectorized)
+    if envs > 1:
+        vector_env = VectorEnv.from_factory(lambda: SnakeEnv(width, height), envs, processes)
+        start = time.perf_counter() # the workers are started before measuring
+        vector_q_agent_training_loop(vector_env, agent, steps, step_limit, seed)
+        elapsed = time.perf_counter() - start
+        vector_env.close()
+        return elapsed
+    start = time.perf_counter()
+    q_agent_training_loop(SnakeEnv(width, height), agent, steps, step_limit, seed)
+    return time.perf_counter() - start
+
+def main(args: argparse.Namespace):
+    print(f"Steps: {args.steps} / Repeats: {args.repeats} / Environments: {args.envs} / Processes: {args.processes}")
+    for size in args.sizes:
+        measurements = {
+            "Environment": lambda: time_environment(size, size, args.steps, args.step_limit, args.seed, False),
+            "Features": lambda: time_environment(size, size, args.steps, args.step_limit, args.seed, True),
+            "Training (Dictionary)": lambda: time_training(size, size, args.steps, args.step_limit, args.seed, 1, False),
+            "Training (Vectorized)": lambda: time_training(size, size, args.steps, args.step_limit, args.seed, 1, True),
+            f"Training (Vectorized, {args.envs} Environments)": lambda: time_training(size, size, args.steps, args.step_limit, args.seed, args.envs, True),
+        }
+        if args.processes > 0:
+            measurements[f"Training (Vectorized, {args.envs} Environments, {args.processes} Processes)"] = \
+                lambda: time_training(size, size, args.steps, args.step_limit, args.seed, args.envs, True, args.processes)
+        print(f"{size}x{size}:")
+        for name, measure in measurements.items():
+            elapsed = min(measure() for _ in range(args.repeats))
+            print(f"  {name}: {args.steps / elapsed:.0f} steps/s")
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Measure the throughput of the snake learning pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 10, 20], help="the widths (and heights) of the levels")
+    parser.add_argument("--steps", type=int, default=20000, help="the number of steps per measurement")
+    parser.add_argument("--repeats", "-r", type=int, default=3, help="the number of times every measurement is repeated")
+    parser.add_argument("--envs", type=int, default=8, help="the number of environment copies for the lockstep training")
+    parser.add_argument("--processes", "-p", type=int, default=0,
+                        help="if positive, also measure the lockstep training with the copies stepped in that many worker processes")
+    parser.add_argument("--step-limit", "-sl", type=int, default=1000, help="the maximum number of steps per episode")
+    parser.add_argument("--seed", "-s", type=int, default=0, help="the seed value used for the measurements")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!")
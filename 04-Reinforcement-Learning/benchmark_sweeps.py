@@ -0,0 +1,54 @@
+from grid import GridMDP
+from value_iteration import ValueIterationAgent
+from benchmark_value_iteration import scaled_grid
+import argparse, time
+
+# This script compares the modes of value iteration (synchronous, Gauss-Seidel and prioritized sweeping)
+# on a grid (optionally tiled to a larger size, see "benchmark_value_iteration.py").
+# For every mode, it runs sweeps until the utilities converge, and prints the error (the maximum difference from
+# the converged utilities) and the elapsed time after every power of 2 sweeps, then the sweeps and the time till convergence.
+
+def main(args: argparse.Namespace):
+    mdp = GridMDP.from_file(args.level)
+    if args.noise is not None:
+        mdp.noise = args.noise
+    if args.size is not None:
+        mdp = scaled_grid(mdp, args.size, args.size)
+    print(f"Level: {args.level} / States: {len(mdp.walkable)} / Noise: {mdp.noise} / Discount: {args.discount} / Tolerance: {args.tolerance}")
+
+    # The reference utilities are computed by the compiled agent with a much smaller tolerance
+    reference = ValueIterationAgent(mdp, args.discount, compiled=True)
+    reference.train(None, args.tolerance * 1e-3)
+    reference_utilities = reference.utilities
+
+    for mode in ValueIterationAgent.MODES:
+        agent = ValueIterationAgent(mdp, args.discount, mode=mode)
+        print(f"{mode}:")
+        elapsed, sweeps, checkpoint, converged = 0, 0, 1, False
+        while not converged and sweeps < args.max_sweeps:
+            start = time.perf_counter()
+            converged = agent.update(args.tolerance)
+            elapsed += time.perf_counter() - start
+            sweeps += 1
+            if sweeps == checkpoint:
+                error = max(abs(agent.utilities[state] - value) for state, value in reference_utilities.items())
+                print(f"  Sweeps: {sweeps:6d} / Time: {elapsed:8.3f} seconds / Error: {error:.3e}")
+                checkpoint *= 2
+        status = "Converged" if converged else "Did not converge"
+        print(f"  {status} after {sweeps} sweeps in {elapsed:.3f} seconds ({elapsed / sweeps:.4f} seconds per sweep)")
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Compare the convergence of the value iteration modes")
+    parser.add_argument("level", type=str, nargs="?", default="grids/grid3.json", help="path to the level")
+    parser.add_argument("--size", type=int, default=None, help="if set, the level is tiled to a grid of this width (and height)")
+    parser.add_argument("--discount", "-d", type=float, default=0.99, help="the discount factor")
+    parser.add_argument("--noise", "-n", type=float, help="the action noise (if set, overrides the original value from level file)")
+    parser.add_argument("--tolerance", "-t", type=float, default=1e-6, help="the tolerance of the convergence check")
+    parser.add_argument("--max-sweeps", type=int, default=100000, help="the maximum number of sweeps per mode")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!")
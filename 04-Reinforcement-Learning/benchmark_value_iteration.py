@@ -0,0 +1,60 @@
+from grid import GridMDP
+from mathutils import Point
+from value_iteration import ValueIterationAgent
+import argparse, time
+
+# This script compares the dictionary-based value iteration with the compiled one (see "mdp_compiler.py")
+# on grids of different sizes. Every grid is created by tiling a level file to the requested size.
+# For each size, it prints the time to compile the MDP, the average time of an update for both agents,
+# the speedup of the update and whether both agents computed the same utilities.
+
+# Creates a grid of the given size by repeating the tiles of the given grid
+def scaled_grid(grid: GridMDP, width: int, height: int) -> GridMDP:
+    w, h = grid.size
+    walkable, terminals, rewards = set(), set(), {}
+    for j in range(height):
+        for i in range(width):
+            tile = Point(i % w, j % h)
+            if tile not in grid.walkable: continue
+            point = Point(i, j)
+            walkable.add(point)
+            rewards[point] = grid.rewards[tile]
+            if tile in grid.terminals: terminals.add(point)
+    return GridMDP((width, height), walkable, terminals, rewards, grid.noise)
+
+# Applies the given number of updates and returns the average time of an update
+def time_updates(agent: ValueIterationAgent, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        agent.update()
+    agent.utilities # The compiled agent converts its utilities to a dictionary when they are requested
+    return (time.perf_counter() - start) / iterations
+
+def main(args: argparse.Namespace):
+    grid = GridMDP.from_file(args.level)
+    print(f"Level: {args.level} / Discount: {args.discount} / Iterations: {args.iterations}")
+    for size in args.sizes:
+        mdp = scaled_grid(grid, size, size)
+        start = time.perf_counter()
+        compiled = ValueIterationAgent(mdp, args.discount, compiled=True)
+        compile_time = time.perf_counter() - start
+        compiled_time = time_updates(compiled, args.iterations)
+        agent = ValueIterationAgent(mdp, args.discount)
+        update_time = time_updates(agent, args.iterations)
+        print(f"{size}x{size} ({len(mdp.walkable)} states): Compile: {compile_time:.3f} seconds"
+              f" / Update: {update_time:.4f} seconds / Compiled Update: {compiled_time:.4f} seconds"
+              f" / Speedup: {update_time / compiled_time:.1f}x / Same Utilities: {agent.utilities == compiled.utilities}")
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Compare the dictionary-based and the compiled value iteration on scaled grids")
+    parser.add_argument("level", type=str, nargs="?", default="grids/grid2.json", help="path to the level to tile")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 300, 1000], help="the widths (and heights) of the grids")
+    parser.add_argument("--iterations", "-i", type=int, default=3, help="the number of updates to time for each agent")
+    parser.add_argument("--discount", "-d", type=float, default=0.9, help="the discount factor")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!")
@@ -0,0 +1,105 @@
+from typing import Dict, List, Optional, Tuple
+from snake import SnakeEnv
+from agents import Agent
+from reinforcement_learning import ApproximateQLearningAgent
+from features_snake import SnakeFeatureExtractor
+from helpers.mt19937 import RandomGenerator
+from mathutils import Direction
+import argparse, statistics, time
+
+# This script evaluates a snake agent by playing many episodes (without exploration) and reporting the average results.
+# Every episode is seeded by a seed generator, so the evaluation is reproducible and different agents can be compared
+# on the same episodes. An episode ends if the snake bites itself, wins or reaches the step limit.
+# The score of an episode is the number of eaten apples.
+
+ACTIONS = [Direction.LEFT, Direction.RIGHT, Direction.DOWN, Direction.UP, Direction.NONE]
+
+# Plays the given number of episodes and returns the average score, reward and length (in steps) of the episodes,
+# the maximum score and the ratio of the episodes that were won, lost (the snake bit itself) or reached the step limit
+def evaluate_agent(env: SnakeEnv, agent: Agent, episodes: int, step_limit: int, seed: int) -> Dict[str, float]:
+    seed_gen = RandomGenerator(seed) # a random seed generator used to seed the environment on reset
+    total_score = total_reward = total_steps = max_score = 0
+    wins = losses = 0
+    for _ in range(episodes):
+        state = env.reset(seed_gen.generate())
+        episode_reward, step, done = 0, 0, False
+        while not done and step < step_limit:
+            state, reward, done, _ = env.step(agent.act(env, state))
+            episode_reward += reward
+            step += 1
+        score = len(state.snake) - 1
+        if done:
+            if len(state.snake) == env.width * env.height: wins += 1
+            else: losses += 1
+        total_score += score
+        total_reward += episode_reward
+        total_steps += step
+        max_score = max(max_score, score)
+    return {
+        "score": total_score / episodes,
+        "max_score": max_score,
+        "reward": total_reward / episodes,
+        "steps": total_steps / episodes,
+        "win_rate": wins / episodes,
+        "loss_rate": losses / episodes,
+        "timeout_rate": (episodes - wins - losses) / episodes,
+    }
+
+# Formats the results of "evaluate_agent"
+def format_evaluation(results: Dict[str, float]) -> str:
+    return (f"Average Score: {results['score']:.2f} (Max: {results['max_score']}) / Average Reward: {results['reward']:.2f}"
+            f" / Average Steps: {results['steps']:.1f} / Wins: {results['win_rate']:.1%} / Losses: {results['loss_rate']:.1%}"
+            f" / Timeouts: {results['timeout_rate']:.1%}")
+
+# Summarizes the results of "evaluate_agent" for several agents (e.g. the same agent trained with different seeds)
+# and returns the mean, the standard deviation, the minimum and the maximum of every result
+def summarize_evaluations(results: List[Dict[str, float]]) -> Dict[str, Tuple[float, float, float, float]]:
+    summary = {}
+    for key in results[0]:
+        values = [result[key] for result in results]
+        summary[key] = (statistics.mean(values), statistics.pstdev(values), min(values), max(values))
+    return summary
+
+# Formats the summary returned by "summarize_evaluations"
+def format_summary(summary: Dict[str, Tuple[float, float, float, float]]) -> str:
+    def spread(key: str, percent: bool = False) -> str:
+        mean, deviation, low, high = summary[key]
+        if percent:
+            return f"{mean:.1%} ± {deviation:.1%} [{low:.1%}, {high:.1%}]"
+        return f"{mean:.2f} ± {deviation:.2f} [{low:.2f}, {high:.2f}]"
+    return (f"Average Score: {spread('score')} / Average Steps: {spread('steps')}"
+            f" / Wins: {spread('win_rate', True)} / Losses: {spread('loss_rate', True)} / Timeouts: {spread('timeout_rate', True)}")
+
+def main(args: argparse.Namespace):
+    start = time.time() # Track run time
+
+    size = [int(dim) for dim in args.size]
+    if len(size) == 1: size *= 2 # If only one value for size was sent, use it as width and height
+    env = SnakeEnv(size[0], size[1])
+
+    # Load the trained approximate Q-learning agent (see "train_snake.py")
+    agent = ApproximateQLearningAgent(SnakeFeatureExtractor(), ACTIONS, vectorized=args.vectorized)
+    agent.load(env, args.model)
+
+    print(f"Evaluating on {size[0]}x{size[1]} for {args.episodes} episodes...")
+    print(format_evaluation(evaluate_agent(env, agent, args.episodes, args.step_limit, args.seed)))
+
+    # Finally print the elapsed time for the whole process
+    print(f"Elapsed time: {time.time() - start} seconds")
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Evaluate a trained snake agent over many seeded episodes")
+    parser.add_argument("model", type=str, help="path to the model to evaluate")
+    parser.add_argument("size", type=int, nargs="*", default=[5, 5], help="The size of the level")
+    parser.add_argument("--episodes", "-e", type=int, default=100, help="the number of evaluation episodes")
+    parser.add_argument("--step-limit", "-sl", type=int, default=1000, help="the maximum number of steps per episode")
+    parser.add_argument("--seed", "-s", type=int, default=0, help="the seed value used to seed the episodes")
+    parser.add_argument("--vectorized", action="store_true", default=False,
+                        help="store the weights in a NumPy matrix and the features in NumPy arrays")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!")
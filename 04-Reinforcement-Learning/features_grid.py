@@ -3,6 +3,11 @@ from grid import GridEnv
 from mathutils import Direction, Point
 from base_rl import FeatureExtractor, Features
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # A class that convert a GridEnv state to a set of features
 # The features are the x and y position of the player in addition to a constant (1)
 
@@ -29,3 +34,9 @@ class GridFeatureExtractor(FeatureExtractor[Point, Direction]):
             "1": 1
         }
         return features
+
+    # Returns the same features as "extract_features" as a NumPy array (in the order of "feature_names")
+    def extract_feature_vector(self, env: GridEnv, obs: Point) -> "np.ndarray":
+        x, y = obs
+        w, h = env.mdp.size
+        return np.array([x / w, y / h, 1.0])
@@ -0,0 +1,138 @@
+from typing import Dict, List, Tuple
+from snake import SnakeEnv, SnakeObservation
+from mathutils import Direction
+from base_rl import FeatureExtractor, Features
+
+# A class that convert a SnakeEnv observation to a set of features
+# The features are:
+#   - "1": a constant.
+#   - "Danger Ahead", "Danger Left" & "Danger Right": whether the next cell is occupied by the snake body
+#     if the snake keeps its direction, turns left or turns right (relative to the current direction).
+#     NOTE: The tail counts as a danger since the environment considers entering the tail cell as biting the body.
+#   - "Space Up", "Space Down", "Space Left" & "Space Right": the number of free cells that can be reached from
+#     the cell next to the head in the given direction (0 if that cell is occupied), divided by the number of cells.
+#     They are computed by flood filling the regions of the free cells on bitboards (every region is filled once).
+#   - "Apple Up", "Apple Down", "Apple Left" & "Apple Right": whether the apple is closer in the given direction
+#     (the snake can wrap around the level, so the shortest way to the apple may cross the border).
+#   - "Apple Ahead": whether the apple is closer in the current direction. Keeping the direction (the action NONE)
+#     is the only way to move straight on, so without this feature, the agent can not tell when going straight
+#     gets it closer to the apple and tends to circle forever.
+# The features only depend on the observation and the level size, so they can be extracted from stored observations
+# (e.g. in a replay buffer). The features of the last 2 observations are cached since the same observation is requested
+# repeatedly during a training step (the flood fill is the most expensive part).
+
+class SnakeFeatureExtractor(FeatureExtractor[SnakeObservation, Direction]):
+    DIRECTIONS = [Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT] # The order of the "Space" features
+    APPLE_FEATURES = { # The "Apple" feature of every direction
+        Direction.UP: "Apple Up", Direction.DOWN: "Apple Down", Direction.LEFT: "Apple Left", Direction.RIGHT: "Apple Right",
+    }
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.__recent = [(None, None, None), (None, None, None)]
+        self.__masks: Dict[Tuple[int, int], Tuple[int, int, int, int]] = {} # The bitboard masks of every level size
+
+    # Returns a list of feature names.
+    # This will be used by the Approximate Q-Learning agent to initialize its weights dictionary.
+    @property
+    def feature_names(self) -> List[str]:
+        features = [
+            "1",
+            "Danger Ahead", "Danger Left", "Danger Right",
+            "Space Up", "Space Down", "Space Left", "Space Right",
+            "Apple Up", "Apple Down", "Apple Left", "Apple Right",
+            "Apple Ahead",
+        ]
+        return features
+
+    # Given an enviroment and an observation (a state), return a set of features that represent the given state
+    # NOTE: The returned dictionary is cached, so it should not be modified.
+    def extract_features(self, env: SnakeEnv, obs: SnakeObservation) -> Features:
+        recent = self.__recent
+        if obs is recent[1][1] and env is recent[1][0]:
+            return recent[1][2]
+        if obs is recent[0][1] and env is recent[0][0]:
+            return recent[0][2]
+        features = self.__compute_features(env.width, env.height, obs)
+        recent[0] = recent[1]
+        recent[1] = (env, obs, features)
+        return features
+
+    def __compute_features(self, width: int, height: int, obs: SnakeObservation) -> Features:
+        occupied = 0 # A bitboard where the bit (x * height + y) is set if the cell (x, y) is occupied by the snake
+        for point in obs.snake:
+            occupied |= 1 << (point.x * height + point.y)
+        head = obs.snake[0]
+
+        # The bit of the cell next to the head in the given direction
+        def neighbor(direction: Direction) -> int:
+            vector = direction.to_vector()
+            return 1 << (((head.x + vector.x) % width) * height + (head.y + vector.y) % height)
+
+        def is_occupied(direction: Direction) -> float:
+            return 1.0 if occupied & neighbor(direction) else 0.0
+
+        direction = obs.direction
+        features = {
+            "1": 1.0,
+            "Danger Ahead": is_occupied(direction),
+            "Danger Left": is_occupied(direction.rotate(1)),
+            "Danger Right": is_occupied(direction.rotate(-1)),
+        }
+
+        region_sizes = self.__region_sizes(width, height, occupied, [neighbor(d) for d in SnakeFeatureExtractor.DIRECTIONS])
+        cell_count = width * height
+        for name, size in zip(("Space Up", "Space Down", "Space Left", "Space Right"), region_sizes):
+            features[name] = size / cell_count
+
+        apple = obs.apple
+        dx = dy = 0
+        if apple is not None:
+            # The signed shortest offsets to the apple (considering the wrap around)
+            dx = (apple.x - head.x) % width
+            if dx > width // 2: dx -= width
+            dy = (apple.y - head.y) % height
+            if dy > height // 2: dy -= height
+        features["Apple Up"] = 1.0 if dy < 0 else 0.0
+        features["Apple Down"] = 1.0 if dy > 0 else 0.0
+        features["Apple Left"] = 1.0 if dx < 0 else 0.0
+        features["Apple Right"] = 1.0 if dx > 0 else 0.0
+        features["Apple Ahead"] = features[SnakeFeatureExtractor.APPLE_FEATURES[direction]]
+        return features
+
+    # Returns the sizes of the regions of free cells containing each of the given cells (0 for an occupied cell)
+    # The cells are given as bits, and the regions are filled on bitboards (Python integers) where the cell (x, y) is the bit
+    # (x * height + y), so every column is a run of "height" bits. Every iteration of the flood fill grows the region
+    # by one cell in the 4 directions (wrapping around the level) using a few shifts and masks on the whole board at once.
+    def __region_sizes(self, width: int, height: int, occupied: int, cells: List[int]) -> List[int]:
+        masks = self.__masks.get((width, height))
+        if masks is None:
+            column = (1 << height) - 1
+            first_rows = sum(1 << (x * height) for x in range(width)) # the cells where y = 0
+            last_rows = first_rows << (height - 1) # the cells where y = height - 1
+            board = (1 << (width * height)) - 1
+            masks = self.__masks[(width, height)] = (first_rows, last_rows, column, board)
+        first_rows, last_rows, column, board = masks
+        free = board & ~occupied
+        last_column_shift = height * (width - 1)
+        regions: List[int] = []
+        result = []
+        for cell in cells:
+            if not cell & free:
+                result.append(0)
+                continue
+            region = next((region for region in regions if region & cell), None)
+            if region is None:
+                region = cell
+                while True:
+                    grown = (region
+                        | ((region << 1) & ~first_rows) | ((region & last_rows) >> (height - 1))    # y + 1
+                        | ((region >> 1) & ~last_rows) | ((region & first_rows) << (height - 1))    # y - 1
+                        | ((region << height) & board) | (region >> last_column_shift)              # x + 1
+                        | (region >> height) | ((region & column) << last_column_shift)             # x - 1
+                    ) & free
+                    if grown == region: break
+                    region = grown
+                regions.append(region)
+            result.append(bin(region).count("1"))
+        return result
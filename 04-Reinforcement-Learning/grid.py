@@ -3,6 +3,7 @@ from mdp import MarkovDecisionProcess
 from environment import Environment
 from mathutils import Point, Direction
 from helpers.mt19937 import RandomGenerator
+from itertools import accumulate
 import json
 
 # The grid markov decision process similar to the one described in the course book
@@ -12,7 +13,7 @@ class GridMDP(MarkovDecisionProcess[Point, Direction]):
     walkable: Set[Point] # A set of positions where the player can stand
     terminals: Set[Point] # A set of positions where the episode would end when the player reaches it
     rewards: Dict[Point, float] # The reward of each position
-    noise: float # The action noise, aka the probability of steering left or right of the intended direction
+    # noise: float # The action noise, aka the probability of steering left or right of the intended direction (a property, see below)
 
     def __init__(self, 
             size: Tuple[int, int], 
@@ -44,9 +45,39 @@ class GridMDP(MarkovDecisionProcess[Point, Direction]):
     def get_actions(self, state: Point) -> List[Dict]:
         return [Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT]
     
+    # The successors of every (state, action) are computed once and stored in the cache (see "get_successor_table").
+    # Since they depend on the noise, the cache is cleared whenever the noise changes.
+    # NOTE: If the walkable positions are modified, the cache must be cleared manually (by calling "self.cache().clear()").
+    @property
+    def noise(self) -> float:
+        return self._noise
+
+    @noise.setter
+    def noise(self, noise: float):
+        self._noise = noise
+        self.cache().clear()
+
     # Given a state and an actions, returns a dictionary of possible next states and their probabilities {s': P(s'|s,a)}
     # each key is a possible next state and its conrresponding value is the probability of reaching it P(s'|s,a) 
+    # NOTE: The returned dictionary is cached, so it must not be modified.
     def get_successor(self, state: Point, action: Direction) -> Dict[Point, float]:
+        return self.get_successor_table(state, action)[0]
+
+    # Given a state and an action, returns a tuple that contains:
+    # - The dictionary of the possible next states and their probabilities (as returned by "get_successor")
+    # - A tuple of the possible next states (in the order of the dictionary)
+    # - A list of the cumulative sums of their probabilities (which can be used to sample a next state)
+    # The tuple is computed once for every (state, action) and cached.
+    def get_successor_table(self, state: Point, action: Direction) -> Tuple[Dict[Point, float], Tuple[Point, ...], List[float]]:
+        cache = self.cache()
+        table = cache.get((state, action))
+        if table is None:
+            states = self.__compute_successor(state, action)
+            table = cache[(state, action)] = (states, tuple(states), list(accumulate(states.values())))
+        return table
+
+    # Computes the dictionary of possible next states and their probabilities (without caching)
+    def __compute_successor(self, state: Point, action: Direction) -> Dict[Point, float]:
         noisy_actions = [
             (action, 1 - self.noise),
             (action.rotate(1), 0.5 * self.noise),
@@ -159,9 +190,9 @@ class GridEnv(Environment[Point, Direction]):
     
     # Updates the current state using the given action
     def step(self, action: Direction) -> Tuple[Point, float, bool, Dict]:
-        next_states, probabilities = zip(*self.mdp.get_successor(self.current_state, action).items())
+        _, next_states, cumulative = self.mdp.get_successor_table(self.current_state, action)
         # since we may have more than one possible next state, we use a random generator to sample the next state
-        next_state = next_states[self.rng.sample(weights=probabilities)]
+        next_state = next_states[self.rng.sample_cumulative(cumulative)]
         reward = self.mdp.get_reward(self.current_state, action, next_state)
         self.current_state = next_state
         return (
@@ -1,63 +1,132 @@
 # This is a Pseudo Random Number Generator using the Mersene Twister Algorithm
+# After every twist, the whole table is tempered at once, so generating a number only reads it from a list.
+# If NumPy is installed, the twist and the tempering are vectorized (otherwise, they are done in pure python).
+# The bulk functions ("generate_many", "ints", "floats" and "sample_many") return exactly the same numbers
+# as calling the corresponding single-value functions the same number of times.
+# The function "sample_cumulative" returns the same number as "sample" given the precomputed cumulative sums of the weights.
+from itertools import accumulate
+from bisect import bisect_left
 from typing import List, Optional, Any
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 class RandomGenerator:
     __N = 624
+    __M = 397
 
     def __init__(self, seed: Optional[int] = None) -> None:
-        self.table = [0] * RandomGenerator.__N
         self.seed(seed)
 
     def seed(self, seed: Optional[int] = None):
         """Initializes the generators using the given seed.
-        
+
         Args:
             seed (Optional[int]): The seed used for initialization. If None, the current time is used. (default: None)
         """
         if seed is None:
             import time
             seed = time.time_ns()
-        self.table[0] = seed
+        table = [seed] * RandomGenerator.__N
+        previous = seed
         for i in range(1, RandomGenerator.__N):
-            temp = 1812433253 * (self.table[i-1] ^ (self.table[i-1] >> 30)) + i
-            self.table[i] = temp & 0xffffffff
+            previous = (1812433253 * (previous ^ (previous >> 30)) + i) & 0xffffffff
+            table[i] = previous
+        # Only the lower 32 bits of the seed affect the twist
+        table[0] = seed & 0xffffffff
+        self.table = table if np is None else np.array(table, dtype=np.uint32)
+        self.outputs = []
         self.index = RandomGenerator.__N+1
 
     def __twist(self):
-        for i in range(0, RandomGenerator.__N):
-            x = (self.table[i] & 0x80000000) + (self.table[(i+1) % RandomGenerator.__N] & 0x7FFFFFFF)
-            xA = x >> 1
-            if (x % 2) != 0:
-                xA = xA ^ 0x9908B0DF
-            self.table[i] = self.table[(i + 397) % RandomGenerator.__N] ^ xA
+        N, M = RandomGenerator.__N, RandomGenerator.__M
+        table = self.table
+        if np is None:
+            for i in range(0, N):
+                x = (table[i] & 0x80000000) + (table[(i+1) % N] & 0x7FFFFFFF)
+                xA = x >> 1
+                if (x % 2) != 0:
+                    xA = xA ^ 0x9908B0DF
+                table[i] = table[(i + M) % N] ^ xA
+            outputs = []
+            for y in table:
+                y = y ^ (y >> 11)
+                y = y ^ ((y << 7) & 0x9D2C5680)
+                y = y ^ ((y << 15) & 0xEFC60000)
+                outputs.append(y ^ (y >> 18))
+            self.outputs = outputs
+        else:
+            # Every entry is computed from the next entry and the entry M steps ahead (wrapping around).
+            # The entries that are M or more steps before the end use the already twisted entries at the start,
+            # so the table is twisted in blocks of N-M entries where each block only depends on the previous blocks.
+            def mix(upper, lower):
+                x = (upper & np.uint32(0x80000000)) | (lower & np.uint32(0x7FFFFFFF))
+                return (x >> np.uint32(1)) ^ ((x & np.uint32(1)) * np.uint32(0x9908B0DF))
+            K = N - M
+            table[:K] = table[M:] ^ mix(table[:K], table[1:K+1])
+            table[K:2*K] = table[:K] ^ mix(table[K:2*K], table[K+1:2*K+1])
+            table[2*K:N-1] = table[K:N-1-K] ^ mix(table[2*K:N-1], table[2*K+1:])
+            table[N-1] = table[N-1-K] ^ mix(table[N-1], table[0])
+            y = table ^ (table >> np.uint32(11))
+            y ^= (y << np.uint32(7)) & np.uint32(0x9D2C5680)
+            y ^= (y << np.uint32(15)) & np.uint32(0xEFC60000)
+            y ^= y >> np.uint32(18)
+            self.output_array = y
+            self.outputs = y.tolist()
+        self.index = 0
 
     def generate(self) -> int:
         """Generates a pseudorandom 32-bit integer.
-        
+
         Returns:
             generate (int): A pseudorandom 32-bit integer.
         """
         if self.index >= RandomGenerator.__N:
             self.__twist()
-            self.index = 0
+        y = self.outputs[self.index]
+        self.index += 1
+        return y
 
-        y = self.table[self.index]
-        y = y ^ ((y >> 11) & 0xFFFFFFFF)
-        y = y ^ ((y << 7) & 0x9D2C5680)
-        y = y ^ ((y << 15) & 0xEFC60000)
-        y = y ^ (y >> 18)
+    def generate_many(self, count: int) -> List[int]:
+        """Generates many pseudorandom 32-bit integers (the same as calling `generate` `count` times).
+
+        Args:
+            count (int): The number of integers to generate.
+
+        Returns:
+            generate_many (List[int]): A list of `count` pseudorandom 32-bit integers.
+        """
+        result = []
+        while len(result) < count:
+            if self.index >= RandomGenerator.__N:
+                self.__twist()
+            end = min(RandomGenerator.__N, self.index + count - len(result))
+            result.extend(self.outputs[self.index:end])
+            self.index = end
+        return result
+
+    def __generate_array(self, count: int):
+        # The same as "generate_many" but it returns a NumPy array of 64-bit integers (only used if NumPy is installed)
+        blocks = []
+        while count > 0:
+            if self.index >= RandomGenerator.__N:
+                self.__twist()
+            end = min(RandomGenerator.__N, self.index + count)
+            blocks.append(self.output_array[self.index:end])
+            count -= end - self.index
+            self.index = end
+        return np.concatenate(blocks).astype(np.int64) if blocks else np.zeros(0, dtype=np.int64)
 
-        self.index += 1
-        return y & 0xffffffff
-    
     def int(self, l: int, u: int) -> int:
         """Generates a uniform pseudorandom integer in the range [l, u] (inclusive).
-        
+
         Args:
             l (int): The lower bound of the range.
             u (int): The upper bound of the range.
-        
+
         Returns:
             int (int): A uniform pseudorandom integer in the range [l, u] (inclusive).
         """
@@ -65,24 +134,59 @@ class RandomGenerator:
         if l == u: return l
         return l + self.generate() % (u - l + 1)
 
+    def ints(self, count: int, l: int, u: int) -> List[int]:
+        """Generates many uniform pseudorandom integers in the range [l, u] (the same as calling `int(l, u)` `count` times).
+
+        Args:
+            count (int): The number of integers to generate.
+            l (int): The lower bound of the range.
+            u (int): The upper bound of the range.
+
+        Returns:
+            ints (List[int]): A list of `count` uniform pseudorandom integers in the range [l, u] (inclusive).
+        """
+        assert l <= u, f"the lower bound must be less then or equal the upper bound, got {l=} nd {u=}"
+        if l == u: return [l] * count
+        size = u - l + 1
+        if np is None or not (-2**62 < l and u < 2**62):
+            return [l + value % size for value in self.generate_many(count)]
+        return (self.__generate_array(count) % size + l).tolist()
+
     def float(self, l: float = 0, u: float = 1) -> float:
         """Generates a uniform pseudorandom floating-point number in the range [l, u] (inclusive).
-        
+
         Args:
             l (float): The lower bound of the range.
             u (float): The upper bound of the range.
-        
+
         Returns:
             float (float): A uniform pseudorandom floating-point number in the range [l, u] (inclusive).
         """
         return (self.generate() / 0xffffffff) * (u - l) + l
-    
+
+    def floats(self, count: int, l: float = 0, u: float = 1) -> List[float]:
+        """Generates many uniform pseudorandom floating-point numbers in the range [l, u] (the same as calling `float(l, u)` `count` times).
+
+        Args:
+            count (int): The number of floating-point numbers to generate.
+            l (float): The lower bound of the range.
+            u (float): The upper bound of the range.
+
+        Returns:
+            floats (List[float]): A list of `count` uniform pseudorandom floating-point numbers in the range [l, u] (inclusive).
+        """
+        if np is None:
+            scale = u - l
+            return [(value / 0xffffffff) * scale + l for value in self.generate_many(count)]
+        # The operations are the same (in the same order) as in "float", so the results are identical
+        return ((self.__generate_array(count) / 0xffffffff) * (u - l) + l).tolist()
+
     def sample(self, weights: List[float]) -> int:
         """Samples an integer `i` in the range [0, len(weights)-1] with a probability proportional to `weights[i]`.
-        
+
         Args:
             weights (List[float]): The unnormalized probabilities where `weights[i]` is proportional to the likelihood of sampling `i`.
-        
+
         Returns:
             sample (int): The randomly sampled integer.
         """
@@ -93,13 +197,44 @@ class RandomGenerator:
             if random <= cumulative:
                 return index
         return len(weights)-1
-    
+
+    def sample_many(self, weights: List[float], count: int) -> List[int]:
+        """Samples many integers in the range [0, len(weights)-1] (the same as calling `sample(weights)` `count` times).
+
+        Args:
+            weights (List[float]): The unnormalized probabilities where `weights[i]` is proportional to the likelihood of sampling `i`.
+            count (int): The number of integers to sample.
+
+        Returns:
+            sample_many (List[int]): A list of `count` randomly sampled integers.
+        """
+        # The cumulative sums are computed in the same order as in "sample", so the results are identical
+        cumulative = list(accumulate(weights))
+        randoms = self.floats(count, 0, sum(weights))
+        last = len(weights)-1
+        if np is None:
+            return [min(bisect_left(cumulative, random), last) for random in randoms]
+        return np.minimum(np.searchsorted(cumulative, randoms, side='left'), last).tolist()
+
+    def sample_cumulative(self, cumulative: List[float]) -> int:
+        """Samples an integer in the range [0, len(cumulative)-1] given the cumulative sums of the weights
+        (the same as calling `sample(weights)` where `cumulative` is `list(accumulate(weights))`).
+
+        Args:
+            cumulative (List[float]): The cumulative sums of the unnormalized probabilities.
+
+        Returns:
+            sample_cumulative (int): The randomly sampled integer.
+        """
+        random = self.float(0, cumulative[-1])
+        return min(bisect_left(cumulative, random), len(cumulative)-1)
+
     def choice(self, items: List[Any]) -> Any:
         """Randomly chooses an item from `items` with equal probability.
-        
+
         Args:
             items (List[Any]): The list of items to choose from.
-        
+
         Returns:
             choice (Any): the selected item.
         """
@@ -110,6 +245,6 @@ if __name__ == "__main__":
     prob = [0.8, 0.1, 0.1]
     freq = [0]*len(prob)
     iterations = 10000
-    for _ in range(iterations):
-        freq[rng.sample(prob)] += 1
+    for index in rng.sample_many(prob, iterations):
+        freq[index] += 1
     print([f/iterations for f in freq])
@@ -43,6 +43,11 @@ class Point:
     def __deepcopy__(self, memo):
         return self
 
+    # the default pickling of a frozen class with slots sets the fields after creating the object (which fails),
+    # so the point is pickled as a call to the constructor instead
+    def __reduce__(self):
+        return (Point, (self.x, self.y))
+
 # This is a helper function to compute the manhattan distance between 2 points
 def manhattan_distance(p1: Point, p2: Point) -> int:
     return abs(p1.x - p2.x) + abs(p1.y - p2.y)
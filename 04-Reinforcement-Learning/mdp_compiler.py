@@ -0,0 +1,97 @@
+from typing import Dict, Generic, List
+from mdp import MarkovDecisionProcess, S, A
+import numpy as np
+
+# This file contains an MDP compiler that converts any "MarkovDecisionProcess" into NumPy arrays once,
+# so that the Bellman backup of all the states can be computed by a few array operations instead of python loops.
+# The transitions are stored as a padded sparse table (the ELLPACK format): for every action "a" and state "s",
+# the k-th possible next state of (s, a) is "next_states[k, a, s]", its probability P(s'|s,a) is "probabilities[k, a, s]"
+# and its reward R(s,a,s') is "rewards[k, a, s]". Rows with fewer next states are padded with zero probabilities.
+# This format is used (instead of CSR) since it keeps the next states of every (s, a) in the same order as the dictionary
+# returned by "get_successor", so the expected utilities are summed in the same order as "ValueIterationAgent.compute_bellman"
+# and the results are identical (not just close) to the results of the dictionary-based implementation.
+# NOTE: The compiled MDP is a snapshot. If the MDP is modified (e.g. its noise or rewards), it must be compiled again.
+
+class CompiledMDP(Generic[S, A]):
+    states: List[S]             # The states of the MDP (in the order of "get_states")
+    state_index: Dict[S, int]   # The index of every state in "states"
+    actions: List[A]            # All the actions that are available in any state (in the order they were first seen)
+    terminal: np.ndarray        # [S] (bool) whether each state is terminal
+    valid: np.ndarray           # [A, S] (bool) whether each action is available in each state (False for terminal states)
+    next_states: np.ndarray     # [K, A, S] (int) the indices of the next states
+    probabilities: np.ndarray   # [K, A, S] (float) the transition probabilities P(s'|s,a)
+    rewards: np.ndarray         # [K, A, S] (float) the rewards R(s,a,s')
+
+    def __init__(self, mdp: MarkovDecisionProcess[S, A]) -> None:
+        self.states = list(mdp.get_states())
+        self.state_index = {state: index for index, state in enumerate(self.states)}
+        self.actions = []
+        action_index = {}
+
+        state_count = len(self.states)
+        self.terminal = np.zeros(state_count, dtype=bool)
+        # Every entry of the table is collected as (k, a, s, s', P(s'|s,a), R(s,a,s'))
+        ks, action_ids, state_ids, next_ids, probabilities, rewards = [], [], [], [], [], []
+        for s, state in enumerate(self.states):
+            if mdp.is_terminal(state):
+                self.terminal[s] = True
+                continue
+            for action in mdp.get_actions(state):
+                a = action_index.get(action)
+                if a is None:
+                    a = action_index[action] = len(self.actions)
+                    self.actions.append(action)
+                for k, (next_state, probability) in enumerate(mdp.get_successor(state, action).items()):
+                    ks.append(k)
+                    action_ids.append(a)
+                    state_ids.append(s)
+                    next_ids.append(self.state_index[next_state])
+                    probabilities.append(probability)
+                    rewards.append(mdp.get_reward(state, action, next_state))
+
+        width = max(ks, default=-1) + 1
+        shape = (width, len(self.actions), state_count)
+        self.valid = np.zeros(shape[1:], dtype=bool)
+        self.valid[action_ids, state_ids] = True
+        # The padding entries point to the state itself (with a zero probability and a zero reward)
+        self.next_states = np.broadcast_to(np.arange(state_count, dtype=np.int64), shape).copy()
+        self.next_states[ks, action_ids, state_ids] = next_ids
+        self.probabilities = np.zeros(shape)
+        self.probabilities[ks, action_ids, state_ids] = probabilities
+        self.rewards = np.zeros(shape)
+        self.rewards[ks, action_ids, state_ids] = rewards
+
+    # Returns the utilities of all the states as an array (the missing states are given a utility of 0)
+    def to_array(self, utilities: Dict[S, float]) -> np.ndarray:
+        return np.array([utilities.get(state, 0) for state in self.states], dtype=float)
+
+    # Returns the utilities of all the states as a dictionary
+    def to_dict(self, values: np.ndarray) -> Dict[S, float]:
+        return dict(zip(self.states, values.tolist()))
+
+    # Returns the expected utility sum(P(s'|s,a) * (R(s,a,s') + gamma * U(s'))) of every action "a" in every state "s" as an [A, S] array
+    # The unavailable actions are given a value of -inf (and the actions of the terminal states are all unavailable)
+    def q_values(self, values: np.ndarray, discount_factor: float) -> np.ndarray:
+        q = None
+        # The terms are added one column at a time (in the order of the successor dictionaries) to match the python sum
+        for probabilities, rewards, next_states in zip(self.probabilities, self.rewards, self.next_states):
+            term = probabilities * (rewards + discount_factor * values[next_states])
+            q = term if q is None else q + term
+        if q is None:
+            q = np.zeros(self.valid.shape)
+        return np.where(self.valid, q, -np.inf)
+
+    # Applies the bellman equation to all the states and returns their new utilities (the terminal states get 0)
+    def bellman(self, values: np.ndarray, discount_factor: float) -> np.ndarray:
+        q = self.q_values(values, discount_factor)
+        if q.shape[0] == 0:
+            return np.zeros(len(self.states))
+        return np.where(self.terminal, 0.0, q.max(axis=0))
+
+    # Returns the index of the best action in every state (the first action with the maximum expected utility)
+    # The terminal states get -1
+    def greedy_actions(self, values: np.ndarray, discount_factor: float) -> np.ndarray:
+        q = self.q_values(values, discount_factor)
+        if q.shape[0] == 0:
+            return np.full(len(self.states), -1)
+        return np.where(self.terminal, -1, q.argmax(axis=0))
@@ -4,11 +4,12 @@ from agents import HumanAgent, RandomAgent
 from value_iteration import ValueIterationAgent
 # from policy_iteration import PolicyIterationAgent
 from reinforcement_learning import SARSALearningAgent, QLearningAgent, ApproximateQLearningAgent
+from features_snake import SnakeFeatureExtractor
 import argparse
 
 from mathutils import Direction, Point
 
-ACTIONS = [Direction.LEFT, Direction.RIGHT, Direction.DOWN, Direction.UP]
+ACTIONS = [Direction.LEFT, Direction.RIGHT, Direction.DOWN, Direction.UP, Direction.NONE]
 
 # Create an agent based on the user selections
 def create_agent(env: SnakeEnv, args: argparse.Namespace):
@@ -59,16 +60,14 @@ def create_agent(env: SnakeEnv, args: argparse.Namespace):
         # agent = QLearningAgent(ACTIONS, args.discount)
     
     elif agent_type == "q_learning_approx":
-        print(f"Requested Agent '{agent_type}' is not supported yet.")
-        exit(-1)
-        # agent = ApproximateQLearningAgent(SnakeFeatureExtractor(), ACTIONS, args.discount)
+        agent = ApproximateQLearningAgent(SnakeFeatureExtractor(), ACTIONS, args.discount)
     
     else:
         print(f"Requested Agent '{agent_type}' is invalid.")
         exit(-1)
 
     # The model file is supplied, we load the pretrained model file
-    # To train a model, run "train.py"
+    # To train a model, run "train.py" (or "train_snake.py" for the approximate Q-learning agent)
     if args.model: agent.load(env, args.model)
     
     return agent
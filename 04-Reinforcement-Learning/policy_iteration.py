@@ -0,0 +1,251 @@
+from typing import Dict, Optional, Tuple
+from agents import Agent
+from environment import Environment
+from mdp import MarkovDecisionProcess, S, A
+from mdp_compiler import CompiledMDP
+import json
+import numpy as np
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.linalg import spsolve
+except ImportError:
+    csr_matrix = spsolve = None
+
+
+# This is a class for a generic Policy Iteration agent
+# Every update evaluates the current policy (computes its utilities) then improves it by acting greedily
+# with respect to these utilities. The agent works on the compiled MDP (see "mdp_compiler.py").
+# There are two ways to evaluate the policy:
+#   - "exact": solves the linear system U = R_pi + gamma * P_pi U. If SciPy is installed, a sparse solver is used.
+#     Otherwise, small systems are solved as dense matrices, and large systems (where a dense matrix would not fit in memory)
+#     are solved by sweeping the bellman equation of the policy until the utilities stop changing.
+#     NOTE: If the discount factor is 1, the system is singular for policies that can get stuck without reaching
+#     a terminal state (and it can be ill-conditioned even if the solver does not fail). So the system is only solved if
+#     every state can reach a terminal state under the policy, and the solution is rejected if it does not satisfy the system.
+#     Otherwise, the policy is evaluated by sweeping its bellman equation (starting from zeros) until the utilities stop changing.
+#   - "iterative": applies k sweeps of the bellman equation for the current policy starting from the current utilities
+#     (aka modified policy iteration). The utilities are approximate, but every sweep is much cheaper than a solve.
+class PolicyIterationAgent(Agent[S, A]):
+    mdp: MarkovDecisionProcess[S, A]  # The MDP used by this agent for training
+    compiled_mdp: CompiledMDP[S, A]  # The compiled MDP used for the evaluation and the improvement
+    policy: Dict[S, A]  # The current policy (an action for every non-terminal state)
+    utilities: Dict[S, float]  # The utilities of the current policy
+    discount_factor: float  # The discount factor (gamma)
+    evaluation: str  # The policy evaluation method ("exact" or "iterative")
+    sweeps: int  # The number of sweeps per evaluation (for the "iterative" evaluation only)
+
+    DENSE_LIMIT = 4096  # The maximum number of states for which the dense solver is used (if SciPy is not installed)
+    MAX_SWEEPS = 100000  # The maximum number of sweeps when sweeping until the utilities stop changing
+    RESIDUAL_TOLERANCE = 1e-9  # The maximum (relative) residual of an accepted solution of the linear system
+    IMPROVEMENT_EPSILON = 1e-9  # The minimum (relative) improvement needed to switch the action of a state
+
+    # NOTE: The agent uses the MDP as it was when the agent was created (later changes to the MDP are ignored).
+    def __init__(
+        self,
+        mdp: MarkovDecisionProcess[S, A],
+        discount_factor: float = 0.99,
+        evaluation: str = "exact",
+        sweeps: int = 20,
+    ) -> None:
+        super().__init__()
+        if evaluation not in ("exact", "iterative"):
+            raise ValueError(f"Unknown policy evaluation method: {evaluation}")
+        self.mdp = mdp
+        self.compiled_mdp = CompiledMDP(mdp)
+        self.discount_factor = discount_factor
+        self.evaluation = evaluation
+        self.sweeps = sweeps
+        compiled = self.compiled_mdp
+        # We initialize the utilities by applying one bellman backup to zeros and the policy to be greedy with respect to them
+        # (starting from an arbitrary policy, such as the first action everywhere, can get stuck in loops if the discount is 1)
+        self.values = compiled.bellman(np.zeros(len(compiled.states)), discount_factor)
+        self.actions = np.where(compiled.valid.any(axis=0), compiled.greedy_actions(self.values, discount_factor), -1)
+        self.__sync()
+
+    # Copies the utilities and the policy from the arrays to the dictionaries
+    def __sync(self):
+        compiled = self.compiled_mdp
+        self.utilities = compiled.to_dict(self.values)
+        self.policy = {
+            state: compiled.actions[action]
+            for state, action in zip(compiled.states, self.actions.tolist())
+            if action >= 0
+        }
+
+    # Returns the transitions of the current policy as arrays [K, S] of next states, probabilities and rewards
+    # (the terminal states have no transitions)
+    def __policy_transitions(self):
+        compiled = self.compiled_mdp
+        states = np.arange(len(compiled.states))
+        actions = np.maximum(self.actions, 0)
+        active = self.actions >= 0
+        next_states = compiled.next_states[:, actions, states]
+        probabilities = np.where(active, compiled.probabilities[:, actions, states], 0.0)
+        rewards = np.where(active, compiled.rewards[:, actions, states], 0.0)
+        return next_states, probabilities, rewards
+
+    # Returns whether every state can reach a terminal state under the current policy (following the transitions with non-zero probabilities)
+    def __is_proper(self, next_states: np.ndarray, probabilities: np.ndarray) -> bool:
+        reaches_terminal = self.compiled_mdp.terminal.copy()
+        while True:
+            reaches = reaches_terminal | ((probabilities != 0) & reaches_terminal[next_states]).any(axis=0)
+            if np.array_equal(reaches, reaches_terminal):
+                return bool(reaches.all())
+            reaches_terminal = reaches
+
+    # Computes the utilities of the current policy by solving the linear system (I - gamma * P_pi) U = R_pi
+    def __evaluate_exact(self) -> np.ndarray:
+        next_states, probabilities, rewards = self.__policy_transitions()
+        state_count = len(self.compiled_mdp.states)
+        # If the discount factor is 1, the system is singular unless every state can reach a terminal state.
+        # The sweeps start from zeros, so the states that loop forever without rewards get a utility of 0.
+        if self.discount_factor >= 1 and not self.__is_proper(next_states, probabilities):
+            return self.__evaluate_iterative(None, np.zeros(state_count), improper=True)[0]
+        expected_rewards = (probabilities * rewards).sum(axis=0)
+        nonzero = probabilities != 0
+        rows = np.broadcast_to(np.arange(state_count), probabilities.shape)[nonzero]
+        columns = next_states[nonzero]
+        data = self.discount_factor * probabilities[nonzero]
+        values = None
+        if spsolve is not None:
+            diagonal = np.arange(state_count)
+            matrix = csr_matrix(
+                (np.concatenate((np.ones(state_count), -data)), (np.concatenate((diagonal, rows)), np.concatenate((diagonal, columns)))),
+                shape=(state_count, state_count)
+            )
+            values = spsolve(matrix, expected_rewards)
+        elif state_count <= PolicyIterationAgent.DENSE_LIMIT:
+            matrix = np.eye(state_count)
+            np.add.at(matrix, (rows, columns), -data)
+            try:
+                values = np.linalg.solve(matrix, expected_rewards)
+            except np.linalg.LinAlgError:
+                pass
+        if values is not None and np.all(np.isfinite(values)):
+            # An ill-conditioned system can be "solved" without errors, so the solution is checked against the system
+            residual = values - np.bincount(rows, data * values[columns], minlength=state_count) - expected_rewards
+            scale = max(1.0, float(np.abs(values).max(initial=0)), float(np.abs(expected_rewards).max(initial=0)))
+            if np.abs(residual).max(initial=0) <= PolicyIterationAgent.RESIDUAL_TOLERANCE * scale:
+                return values
+        # Without SciPy, a large system is solved by sweeping until the utilities stop changing,
+        # and so is a system that could not be solved accurately
+        return self.__evaluate_iterative(None, np.where(np.isfinite(self.values), self.values, 0.0))[0]
+
+    # Returns the expected utility of every action in every state as an [A, S] array (see "CompiledMDP.q_values")
+    # The utilities of an improper policy can be infinite, so an action that can reach a state with an infinite utility
+    # gets the same infinite utility (-inf wins if both +inf and -inf can be reached since the outcome is undefined)
+    def __q_values(self, values: np.ndarray) -> np.ndarray:
+        compiled = self.compiled_mdp
+        infinite = np.isinf(values)
+        if not infinite.any():
+            return compiled.q_values(values, self.discount_factor)
+        q = compiled.q_values(np.where(infinite, 0.0, values), self.discount_factor)
+        reachable = compiled.probabilities != 0
+        next_values = values[compiled.next_states]
+        q = np.where((reachable & (next_values == np.inf)).any(axis=0), np.inf, q)
+        q = np.where((reachable & (next_values == -np.inf)).any(axis=0), -np.inf, q)
+        return np.where(compiled.valid, q, -np.inf)
+
+    # Approximates the utilities of the current policy by applying the bellman equation of the policy for the given number of sweeps
+    # starting from the given utilities (or the current utilities if None).
+    # If sweeps is None, the sweeps continue until the utilities stop changing (up to the floating point precision).
+    # If the policy is improper (some states never reach a terminal state and the discount factor is 1), the utilities of
+    # the states that keep collecting rewards grow without bound (by the same amount every sweep once the transients fade out),
+    # so the sweeps also stop when the changes stop changing, and the utilities of these states are set to +inf or -inf.
+    # Returns the utilities and the maximum utility change in the last sweep
+    def __evaluate_iterative(self, sweeps: Optional[int], values: Optional[np.ndarray] = None, improper: bool = False) -> Tuple[np.ndarray, float]:
+        next_states, probabilities, rewards = self.__policy_transitions()
+        values, max_change = (self.values if values is None else values), 0.0
+        sweep, change = 0, None
+        while sweep < (PolicyIterationAgent.MAX_SWEEPS if sweeps is None else sweeps):
+            sweep += 1
+            updated_values = np.zeros_like(values)
+            for k in range(len(probabilities)):
+                updated_values += probabilities[k] * (rewards[k] + self.discount_factor * values[next_states[k]])
+            previous_change, change = change, updated_values - values
+            max_change = float(np.abs(change).max(initial=0))
+            values = updated_values
+            if sweeps is None:
+                tolerance = 1e-12 * max(1.0, float(np.abs(values).max(initial=0)))
+                if max_change <= tolerance:
+                    break
+                if improper and previous_change is not None and np.abs(change - previous_change).max(initial=0) <= tolerance:
+                    values = np.where(np.abs(change) > tolerance, np.copysign(np.inf, change), values)
+                    break
+        return values, max_change
+
+    # Applies a single policy iteration (a policy evaluation followed by a policy improvement)
+    # then returns True if the policy has converged and False otherwise.
+    # For the "exact" evaluation, the policy has converged if it did not change.
+    # For the "iterative" evaluation, the utilities are approximate, so the policy has converged if it did not change
+    # and the maximum utility change in the last sweep is less than the tolerance.
+    def update(self, tolerance: float = 0) -> bool:
+        if self.evaluation == "exact":
+            self.values = self.__evaluate_exact()
+            evaluated = True
+        else:
+            self.values, max_change = self.__evaluate_iterative(self.sweeps)
+            evaluated = max_change < tolerance
+
+        # The action of a state only changes if another action is better by more than a small relative epsilon,
+        # so the policy cannot keep switching between actions whose utilities only differ by rounding errors
+        compiled = self.compiled_mdp
+        q = self.__q_values(self.values)
+        converged = True
+        if q.shape[0] != 0:
+            best_actions = q.argmax(axis=0)
+            states = np.arange(len(compiled.states))
+            best, current = q[best_actions, states], q[np.maximum(self.actions, 0), states]
+            with np.errstate(invalid="ignore"): # (inf - inf) is never an improvement
+                margin = PolicyIterationAgent.IMPROVEMENT_EPSILON * np.maximum(1.0, np.where(np.isfinite(current), np.abs(current), 0.0))
+                improved = (self.actions >= 0) & (best - current > margin)
+            converged = not improved.any()
+            self.actions = np.where(improved, best_actions, self.actions)
+        self.__sync()
+        return converged and evaluated
+
+    # This function applies policy iteration starting from the current policy stored in the agent
+    # NOTE: this function does incremental update and does not reset the policy before running
+    # In other words, calling train(M) followed by train(N) is equivalent to just calling train(N+M)
+    def train(self, iterations: Optional[int] = None, tolerance: float = 0) -> int:
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            iteration += 1
+            if self.update(tolerance):
+                break
+        return iteration
+
+    # Given an environment and a state, return the best action as guided by the learned policy
+    # If the state is terminal, return None
+    def act(self, env: Environment[S, A], state: S) -> A:
+        if self.mdp.is_terminal(state):
+            return None
+        return self.policy[state]
+
+    # Save the utilities and the policy to a json file
+    def save(self, env: Environment[S, A], file_path: str):
+        with open(file_path, "w") as f:
+            data = {
+                "utilities": {
+                    self.mdp.format_state(state): value
+                    for state, value in self.utilities.items()
+                },
+                "policy": {
+                    self.mdp.format_state(state): self.mdp.format_action(action)
+                    for state, action in self.policy.items()
+                },
+            }
+            json.dump(data, f, indent=2, sort_keys=True)
+
+    # loads the utilities and the policy from a json file
+    def load(self, env: Environment[S, A], file_path: str):
+        with open(file_path, "r") as f:
+            data = json.load(f)
+        compiled = self.compiled_mdp
+        utilities = {self.mdp.parse_state(state): value for state, value in data["utilities"].items()}
+        policy = {self.mdp.parse_state(state): self.mdp.parse_action(action) for state, action in data["policy"].items()}
+        action_index = {action: index for index, action in enumerate(compiled.actions)}
+        self.values = compiled.to_array(utilities)
+        self.actions = np.array([action_index[policy[state]] if state in policy else -1 for state in compiled.states])
+        self.__sync()
@@ -1,4 +1,4 @@
-from typing import Callable, DefaultDict, Dict, Generic, List, Optional, Union
+from typing import TYPE_CHECKING, Callable, DefaultDict, Dict, Generic, List, Optional, Union
 from agents import Agent
 from environment import Environment, S, A
 from helpers.mt19937 import RandomGenerator
@@ -6,8 +6,16 @@ from helpers.mt19937 import RandomGenerator
 import json
 from collections import defaultdict
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from helpers.utils import NotImplemented
 
+if TYPE_CHECKING:
+    from replay_buffer import ReplayBatch
+
 
 # The base class for all Reinforcement Learning Agents required for this problem set
 class RLAgent(Agent[S, A]):
@@ -57,13 +65,18 @@ class RLAgent(Agent[S, A]):
             # if more than one action has the maximum q-value, return the one that appears first in the "actions" list
             # NotImplemented()
 
-            # calculate the action with the maximum q-value as calculated by "compute_q" above
-            action = max(
-                actions, key=lambda action: self.compute_q(env, observation, action)
-            )
-
             # return the action with the maximum q-value
-            return action
+            return self.compute_best_action(env, observation, actions)
+
+    # Returns the action with the maximum q-value as calculated by "compute_q" above
+    # if more than one action has the maximum q-value, return the one that appears first in the "actions" list
+    # This can be overriden by the derived RL agents to compute it more efficiently
+    def compute_best_action(self, env: Environment[S, A], observation: S, actions: List[A]) -> A:
+        # calculate the action with the maximum q-value as calculated by "compute_q" above
+        action = max(
+            actions, key=lambda action: self.compute_q(env, observation, action)
+        )
+        return action
 
 
 #############################
@@ -199,6 +212,23 @@ class QLearningAgent(RLAgent[S, A]):
             - self.Q[state][action]
         )
 
+    # Update the Q-values using a batch of transitions sampled from a replay buffer (see "replay_buffer.py")
+    # The transitions are applied one after the other, and the update of every transition is scaled by its importance sampling weight.
+    # Since the transitions were stored in the past, the environment is not in their next states,
+    # so the utility of a next state is the maximum Q-value over all the agent actions (and 0 if the next state is terminal).
+    # Returns the TD errors of the transitions (to update their priorities in the replay buffer)
+    def update_batch(self, env: Environment[S, A], batch: "ReplayBatch[S, A]") -> List[float]:
+        td_errors = []
+        for state, action, reward, next_state, done, weight in zip(
+            batch.states, batch.actions, batch.rewards.tolist(), batch.next_states, batch.dones.tolist(), batch.weights.tolist()
+        ):
+            utility = 0 if done else max([self.compute_q(env, next_state, next_action) for next_action in self.actions])
+            q = self.compute_q(env, state, action)
+            td_error = reward + self.discount_factor * utility - q
+            self.Q[state][action] = q + self.learning_rate * weight * td_error
+            td_errors.append(td_error)
+        return td_errors
+
     # Save the Q-table to a json file
     def save(self, env: Environment[S, A], file_path: str):
         with open(file_path, "w") as f:
@@ -244,15 +274,25 @@ class FeatureExtractor(Generic[S, A]):
     def extract_features(self, env: Environment[S, A], state: S) -> Features:
         return {}
 
+    # Given an enviroment and an observation (a state), return the features as a NumPy array ordered by "feature_names"
+    # This is used by the vectorized Approximate Q-Learning agent. By default, it converts the output of "extract_features",
+    # but it can be overriden to build the array directly.
+    def extract_feature_vector(self, env: Environment[S, A], state: S) -> "np.ndarray":
+        features = self.extract_features(env, state)
+        return np.array([features.get(feature, 0) for feature in self.feature_names], dtype=float)
+
 
 # This is a class for a generic Q-learning agent
 class ApproximateQLearningAgent(RLAgent[S, A]):
-    weights: Dict[A, Features]  # The weights dictionary for this agent.
+    # weights: Dict[A, Features]  # The weights dictionary for this agent (a property, see below).
     # The first key is action and the second key is the feature name
     # The value is the weight
     feature_extractor: FeatureExtractor[
         S, A
     ]  # The feature extractor used to extract the features corresponding to a state
+    vectorized: bool  # If True, the weights are stored in a NumPy matrix [actions, features] and the features are NumPy arrays
+
+    RECENT_ENVIRONMENTS = 64  # The maximum number of environments for which the recent feature vectors are remembered
 
     def __init__(
         self,
@@ -262,13 +302,62 @@ class ApproximateQLearningAgent(RLAgent[S, A]):
         epsilon: float = 0.5,
         learning_rate: float = 0.01,
         seed: Optional[int] = None,
+        vectorized: bool = False,
     ) -> None:
         super().__init__(actions, discount_factor, epsilon, learning_rate, seed)
         feature_names = feature_extractor.feature_names
+        self.feature_extractor = feature_extractor
+        self.vectorized = vectorized
+        if vectorized:
+            self.feature_names = list(feature_names)
+            self.action_ids = {action: index for index, action in enumerate(actions)}
+            self.weight_matrix = np.zeros((len(actions), len(self.feature_names)))
+            self.__action_ids_cache = {}
+            self.__recent = {}
         self.weights = {
             action: {feature: 0 for feature in feature_names} for action in actions
         }  # we initialize the weights to 0
-        self.feature_extractor = feature_extractor
+
+    # The weights of the vectorized agent are stored in a matrix (self.weight_matrix) where the row is the action
+    # and the column is the feature, and they are only converted to a dictionary when they are requested
+    @property
+    def weights(self) -> Dict[A, Features]:
+        if not self.vectorized:
+            return self.__weights
+        return {
+            action: dict(zip(self.feature_names, row))
+            for action, row in zip(self.actions, self.weight_matrix.tolist())
+        }
+
+    @weights.setter
+    def weights(self, weights: Dict[A, Features]):
+        if not self.vectorized:
+            self.__weights = weights
+            return
+        self.weight_matrix = np.zeros((len(self.actions), len(self.feature_names)))
+        feature_ids = {feature: index for index, feature in enumerate(self.feature_names)}
+        for action, action_weights in weights.items():
+            for feature, weight in action_weights.items():
+                self.weight_matrix[self.action_ids[action], feature_ids[feature]] = weight
+
+    # Returns the feature vector of the state (for the vectorized agent)
+    # The last 2 requested states of every environment are remembered, since every state is requested repeatedly during
+    # a training step (a transition uses its state and its next state, and the next state is the state of the following action),
+    # so the features of every state are only extracted once (even if the agent is trained on many environments in lockstep).
+    def __feature_vector(self, env: Environment[S, A], state: S) -> "np.ndarray":
+        recent = self.__recent.get(env)
+        if recent is None:
+            if len(self.__recent) >= ApproximateQLearningAgent.RECENT_ENVIRONMENTS:
+                self.__recent.clear() # forget the environments that are no longer used
+            recent = self.__recent[env] = [(None, None), (None, None)]
+        if state is recent[1][0]:
+            return recent[1][1]
+        if state is recent[0][0]:
+            return recent[0][1]
+        features = self.feature_extractor.extract_feature_vector(env, state)
+        recent[0] = recent[1]
+        recent[1] = (state, features)
+        return features
 
     # Given the features of state and an action, compute and return the Q value
     def __compute_q_from_features(self, features: Dict[str, float], action: A) -> float:
@@ -303,9 +392,23 @@ class ApproximateQLearningAgent(RLAgent[S, A]):
         return utility
 
     def compute_q(self, env: Environment[S, A], state: S, action: A) -> float:
+        if self.vectorized:
+            return float(self.weight_matrix[self.action_ids[action]] @ self.__feature_vector(env, state))
         features = self.feature_extractor.extract_features(env, state)
         return self.__compute_q_from_features(features, action)
 
+    def compute_best_action(self, env: Environment[S, A], observation: S, actions: List[A]) -> A:
+        if not self.vectorized:
+            return super().compute_best_action(env, observation, actions)
+        # compute the q-values of all the actions with a single matrix-vector product
+        key = tuple(actions)
+        action_ids = self.__action_ids_cache.get(key)
+        if action_ids is None:
+            action_ids = self.__action_ids_cache[key] = [self.action_ids[action] for action in key]
+        q_values = (self.weight_matrix @ self.__feature_vector(env, observation)).tolist()
+        q_values = [q_values[action_id] for action_id in action_ids]
+        return actions[q_values.index(max(q_values))]
+
     # Update the value of Q(state, action) using this transition via the Q-Learning update rule
     def update(
         self,
@@ -320,6 +423,10 @@ class ApproximateQLearningAgent(RLAgent[S, A]):
         # If done is True, then next_state is a terminal state in which case, we consider the Q-value of next_state to be 0
         # NotImplemented()
 
+        if self.vectorized:
+            self.__update_vectorized(env, state, action, reward, next_state, done)
+            return
+
         # if the next state is a terminal state, then the q-value of the next state is 0
         # otherwise, calculate the q-value of the next state
         q_next = (
@@ -353,6 +460,53 @@ class ApproximateQLearningAgent(RLAgent[S, A]):
         # update the weights
         self.weights = weights_temp
 
+    # Applies the Q-Learning update to the weight matrix
+    # The features of every state are extracted once, and the TD error is computed and applied to the row of the action in place
+    # w_a = w_a + alpha * (r + gamma * max(w_a' . f(s')) - w_a . f(s)) * f(s)
+    def __update_vectorized(self, env: Environment[S, A], state: S, action: A, reward: float, next_state: S, done: bool):
+        weights = self.weight_matrix
+        features = self.__feature_vector(env, state)
+        q_next = 0 if done else float((weights @ self.__feature_vector(env, next_state)).max())
+        row = weights[self.action_ids[action]]
+        td_error = reward + self.discount_factor * q_next - float(row @ features)
+        row += (self.learning_rate * td_error) * features
+
+    # Update the weights using a batch of transitions sampled from a replay buffer (see "replay_buffer.py")
+    # The batch is a single gradient step (with or without the vectorized weights): the TD errors of all the transitions
+    # are computed using the weights from before the update, then the average of their gradients (scaled by the importance
+    # sampling weights) is applied using the learning rate:
+    # w_a = w_a + alpha * (1/N) * sum(weight_i * td_error_i * f(s_i) for every transition i where a_i = a)
+    # So the order of the transitions in the batch does not matter, and a batch moves the weights about as far as a single online update.
+    # NOTE: The features are extracted from the stored states using the given environment,
+    # so the feature extractor should only use the parts of the environment that do not change (e.g. the grid size).
+    # Returns the TD errors of the transitions (to update their priorities in the replay buffer)
+    def update_batch(self, env: Environment[S, A], batch: "ReplayBatch[S, A]") -> List[float]:
+        if not self.vectorized:
+            extractor, scale = self.feature_extractor, self.learning_rate / len(batch)
+            transitions = []
+            for state, action, reward, next_state, done in zip(
+                batch.states, batch.actions, batch.rewards.tolist(), batch.next_states, batch.dones.tolist()
+            ):
+                features = extractor.extract_features(env, state)
+                q_next = 0 if done else self.__compute_utility_from_features(extractor.extract_features(env, next_state))
+                td_error = reward + self.discount_factor * q_next - self.__compute_q_from_features(features, action)
+                transitions.append((action, features, td_error))
+            for (action, features, td_error), weight in zip(transitions, batch.weights.tolist()):
+                action_weights = self.weights[action]
+                for feature in features:
+                    action_weights[feature] += scale * weight * td_error * features[feature]
+            return [td_error for _, _, td_error in transitions]
+        extractor, weights = self.feature_extractor, self.weight_matrix
+        features = np.array([extractor.extract_feature_vector(env, state) for state in batch.states])
+        next_features = np.array([extractor.extract_feature_vector(env, state) for state in batch.next_states])
+        action_ids = np.array([self.action_ids[action] for action in batch.actions])
+        q = (weights[action_ids] * features).sum(axis=1)
+        q_next = np.where(batch.dones, 0.0, (next_features @ weights.T).max(axis=1))
+        td_errors = batch.rewards + self.discount_factor * q_next - q
+        scales = (self.learning_rate / len(batch)) * batch.weights * td_errors
+        np.add.at(weights, action_ids, scales[:, None] * features)
+        return td_errors.tolist()
+
     # Save the weights to a json file
     def save(self, env: Environment[S, A], file_path: str):
         with open(file_path, "w") as f:
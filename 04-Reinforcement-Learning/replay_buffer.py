@@ -0,0 +1,206 @@
+from typing import Dict, Generic, List, Optional
+from dataclasses import dataclass
+from environment import S, A
+from helpers.mt19937 import RandomGenerator
+import numpy as np
+
+# This file contains an experience replay buffer which stores the latest transitions (up to a fixed capacity)
+# so that the agents can learn from every transition more than once (see "replay_q_agent_training_loop" in "training_loops.py").
+# The transitions are stored in preallocated NumPy arrays used as a circular buffer (the oldest transition is overwritten first).
+# The states are stored as ids assigned by a state indexer (see "StateIndexer" below), and the actions are stored as action ids.
+# There are two ways to sample the transitions:
+#   - uniform: every stored transition has the same probability.
+#   - prioritized: the probability of a transition is proportional to (priority ^ alpha) where the priority is the absolute
+#     TD error of the last time it was sampled (new transitions get the maximum priority so that they are sampled at least once).
+#     Since the transitions are not sampled uniformly, every sampled transition has an importance sampling weight
+#     (N * P(i)) ^ -beta (normalized by the maximum weight in the batch) which should scale its update.
+#     The values (priority + epsilon) ^ alpha are kept in a sum tree (see "SumTree" below), so adding a transition,
+#     updating the priorities of a batch and sampling a batch cost O(log N) per transition (instead of O(N) per batch).
+# The samples are drawn from a random generator owned by the buffer, so the batches are deterministic given the seed.
+
+# Assigns a unique id (0, 1, 2, ...) to every state in the order in which the states are seen
+class StateIndexer(Generic[S]):
+    states: List[S]             # The states ordered by their ids
+    ids: Dict[S, int]           # The id of every state
+
+    def __init__(self) -> None:
+        self.states = []
+        self.ids = {}
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    # Returns the id of the state (a new id is assigned if the state was not seen before)
+    def __call__(self, state: S) -> int:
+        state_id = self.ids.get(state)
+        if state_id is None:
+            state_id = self.ids[state] = len(self.states)
+            self.states.append(state)
+        return state_id
+
+# A binary tree where every leaf holds a non-negative value and every inner node holds the sum of its children
+# The tree is stored in an array: the root is at index 1, the children of the node i are at 2i and 2i+1,
+# and the leaves are at [leaf_count, 2 * leaf_count) where leaf_count is the capacity rounded up to a power of 2.
+# The leaves (and inner nodes) are updated and searched for a whole batch at once, one tree level at a time.
+class SumTree:
+    def __init__(self, capacity: int) -> None:
+        self.depth = max(1, (capacity - 1).bit_length())
+        self.leaf_count = 1 << self.depth
+        self.nodes = np.zeros(2 * self.leaf_count)
+
+    # Returns the sum of all the values
+    @property
+    def total(self) -> float:
+        return float(self.nodes[1])
+
+    # Returns the values of the given leaves
+    def get(self, indices: np.ndarray) -> np.ndarray:
+        return self.nodes[indices + self.leaf_count]
+
+    # Sets the values of the given leaves then recomputes the sums of their ancestors
+    # NOTE: If an index is repeated, its last value is kept (a repeated ancestor gets the same sum every time).
+    def set(self, indices: np.ndarray, values: np.ndarray):
+        nodes = indices + self.leaf_count
+        self.nodes[nodes] = values
+        for _ in range(self.depth):
+            nodes = nodes >> 1
+            self.nodes[nodes] = self.nodes[2 * nodes] + self.nodes[2 * nodes + 1]
+
+    # Sets the value of a single leaf (faster than "set" for a single leaf)
+    def set_one(self, index: int, value: float):
+        nodes, node = self.nodes, index + self.leaf_count
+        nodes[node] = value
+        while node > 1:
+            node >>= 1
+            nodes[node] = nodes[2 * node] + nodes[2 * node + 1]
+
+    # Returns, for every given prefix sum, the first leaf where the sum of the values up to this leaf (inclusive) reaches it
+    def find(self, prefix_sums: np.ndarray) -> np.ndarray:
+        remaining = np.array(prefix_sums, dtype=float)
+        nodes = np.ones(len(remaining), dtype=np.int64)
+        for _ in range(self.depth):
+            nodes = 2 * nodes
+            left = self.nodes[nodes]
+            right = remaining > left
+            remaining -= np.where(right, left, 0)
+            nodes += right
+        return nodes - self.leaf_count
+
+# A batch of transitions sampled from the replay buffer
+@dataclass
+class ReplayBatch(Generic[S, A]):
+    indices: np.ndarray         # [batch] The indices of the transitions in the buffer (used to update their priorities)
+    states: List[S]             # The states of the transitions
+    actions: List[A]            # The actions of the transitions
+    rewards: np.ndarray         # [batch] The rewards
+    next_states: List[S]        # The next states of the transitions
+    dones: np.ndarray           # [batch] Whether the next states are terminal
+    weights: np.ndarray         # [batch] The importance sampling weights (all ones for uniform sampling)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+class ReplayBuffer(Generic[S, A]):
+    capacity: int                       # The maximum number of stored transitions
+    actions: List[A]                    # The actions (ordered by their ids)
+    indexer: StateIndexer[S]            # The state indexer which assigns the ids of the stored states
+    prioritized: bool                   # Whether the transitions are sampled with probabilities proportional to their priorities
+    alpha: float                        # How much the priorities affect the probabilities (0 is uniform) (for prioritized sampling only)
+    beta: float                         # The exponent of the importance sampling weights (for prioritized sampling only)
+    rng: RandomGenerator                # The random generator used for sampling
+
+    PRIORITY_EPSILON = 1e-6  # A small priority added to every transition so that no transition has a zero probability
+
+    def __init__(
+        self,
+        capacity: int,
+        actions: List[A],
+        seed: Optional[int] = None,
+        prioritized: bool = False,
+        alpha: float = 0.6,
+        beta: float = 0.4,
+    ) -> None:
+        assert capacity > 0, "The capacity of the replay buffer must be positive"
+        self.capacity = capacity
+        self.actions = list(actions)
+        self.action_ids = {action: index for index, action in enumerate(self.actions)}
+        self.indexer = StateIndexer()
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.beta = beta
+        self.rng = RandomGenerator(seed)
+        self.state_ids = np.zeros(capacity, dtype=np.int64)
+        self.action_indices = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity)
+        self.next_state_ids = np.zeros(capacity, dtype=np.int64)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.priorities = np.zeros(capacity)
+        self.tree = SumTree(capacity) if prioritized else None # The sampling values of the transitions (for prioritized sampling only)
+        self.size = 0           # The number of stored transitions
+        self.position = 0       # The index where the next transition will be stored
+        self.max_priority = 1.0 # The maximum priority seen so far (given to the new transitions)
+
+    def __len__(self) -> int:
+        return self.size
+
+    # Stores a transition (overwriting the oldest transition if the buffer is full)
+    def add(self, state: S, action: A, reward: float, next_state: S, done: bool):
+        index = self.position
+        self.state_ids[index] = self.indexer(state)
+        self.action_indices[index] = self.action_ids[action]
+        self.rewards[index] = reward
+        self.next_state_ids[index] = self.indexer(next_state)
+        self.dones[index] = done
+        self.priorities[index] = self.max_priority
+        if self.tree is not None:
+            self.tree.set_one(index, (self.max_priority + ReplayBuffer.PRIORITY_EPSILON) ** self.alpha)
+        self.position = (index + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        # The indexer keeps every state it has seen, so the states that are no longer stored are removed once in a while
+        if len(self.indexer) > 4 * self.capacity:
+            self.__compact()
+
+    # Rebuilds the state indexer to only contain the stored states and updates the stored ids
+    def __compact(self):
+        size, states = self.size, self.indexer.states
+        live_ids = np.unique(np.concatenate((self.state_ids[:size], self.next_state_ids[:size])))
+        indexer = StateIndexer()
+        for state_id in live_ids.tolist():
+            indexer(states[state_id])
+        mapping = np.zeros(len(states), dtype=np.int64)
+        mapping[live_ids] = np.arange(len(live_ids))
+        self.state_ids[:size] = mapping[self.state_ids[:size]]
+        self.next_state_ids[:size] = mapping[self.next_state_ids[:size]]
+        self.indexer = indexer
+
+    # Samples a batch of transitions (with replacement)
+    def sample(self, batch_size: int) -> ReplayBatch[S, A]:
+        assert self.size > 0, "Can not sample from an empty replay buffer"
+        if self.prioritized:
+            total = self.tree.total
+            randoms = np.array(self.rng.floats(batch_size, 0, total))
+            indices = np.minimum(self.tree.find(randoms), self.size - 1)
+            weights = (self.size * self.tree.get(indices) / total) ** -self.beta
+            weights /= weights.max()
+        else:
+            indices = np.array(self.rng.ints(batch_size, 0, self.size - 1), dtype=np.int64)
+            weights = np.ones(batch_size)
+        states = self.indexer.states
+        return ReplayBatch(
+            indices=indices,
+            states=[states[state_id] for state_id in self.state_ids[indices].tolist()],
+            actions=[self.actions[action_id] for action_id in self.action_indices[indices].tolist()],
+            rewards=self.rewards[indices],
+            next_states=[states[state_id] for state_id in self.next_state_ids[indices].tolist()],
+            dones=self.dones[indices],
+            weights=weights,
+        )
+
+    # Sets the priorities of the sampled transitions to their absolute TD errors (for prioritized sampling only)
+    def update_priorities(self, indices: np.ndarray, td_errors: np.ndarray):
+        priorities = np.abs(np.asarray(td_errors, dtype=float))
+        self.priorities[indices] = priorities
+        if self.tree is not None:
+            self.tree.set(indices, (priorities + ReplayBuffer.PRIORITY_EPSILON) ** self.alpha)
+        if len(priorities) != 0:
+            self.max_priority = max(self.max_priority, float(priorities.max()))
@@ -1,11 +1,13 @@
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
 from mdp import MarkovDecisionProcess
 from environment import Environment
 from mathutils import Point, Direction
 from helpers.mt19937 import RandomGenerator
 from helpers.utils import NotImplemented
 import json
+from collections import deque
 from dataclasses import dataclass
+from math import isqrt
 
 """
 Environment Description:
@@ -36,10 +38,17 @@ class SnakeObservation:
     ]  # The location of the apple. If the game was already won, apple will be None
 
 
+# The snake body is stored in a deque (so moving the snake does not shift the whole body), and the number of body parts
+# on every cell is stored in a list indexed by the cell id (x * height + y), so checking whether the head bites the body
+# does not scan the body. The cell ids follow the order in which the free cells were listed to sample an apple
+# (column by column), so the k-th free cell in that order can be found without building the list:
+# the cells are split into blocks of about sqrt(width * height) cells and the number of free cells in every block is tracked
+# (updated in O(1) whenever the snake moves), then the apple is found by skipping whole blocks and scanning a single block.
+# Therefore, for the same seed, the apples are the same as sampling from the list of free cells.
 class SnakeEnv(Environment[SnakeObservation, Direction]):
     rng: RandomGenerator  # A random generator which will be used to sample apple locations
 
-    snake: List[Point]
+    # snake: Deque[Point]  # The snake body (a property, see below)
     direction: Direction
     apple: Optional[Point]
 
@@ -53,19 +62,58 @@ class SnakeEnv(Environment[SnakeObservation, Direction]):
         self.direction = Direction.LEFT
         self.apple = None
 
+    # The points occupied by the snake body where the head is the first point and the tail is the last
+    @property
+    def snake(self) -> Deque[Point]:
+        return self.__snake
+
+    # Setting the snake body rebuilds the occupied cells and the free cell counts
+    @snake.setter
+    def snake(self, snake: Iterable[Point]):
+        cell_count = self.width * self.height
+        block_size = max(1, isqrt(cell_count))
+        self.__snake = deque(snake)
+        self.__counts = [0] * cell_count
+        self.__block_size = block_size
+        self.__free_counts = [min(block_size, cell_count - start) for start in range(0, cell_count, block_size)]
+        self.__free_count = cell_count
+        for point in self.__snake:
+            self.__occupy(point.x * self.height + point.y)
+
+    # Adds a body part to the cell
+    def __occupy(self, cell: int):
+        counts = self.__counts
+        counts[cell] += 1
+        if counts[cell] == 1:
+            self.__free_counts[cell // self.__block_size] -= 1
+            self.__free_count -= 1
+
+    # Removes a body part from the cell
+    def __release(self, cell: int):
+        counts = self.__counts
+        counts[cell] -= 1
+        if counts[cell] == 0:
+            self.__free_counts[cell // self.__block_size] += 1
+            self.__free_count += 1
+
     def generate_random_apple(self) -> Point:
         """
         Generates and returns a random apple position which is not on a cell occupied
         by the snake's body.
         """
-        snake_positions = set(self.snake)
-        possible_points = [
-            Point(x, y)
-            for x in range(self.width)
-            for y in range(self.height)
-            if Point(x, y) not in snake_positions
-        ]
-        return self.rng.choice(possible_points)
+        assert self.__free_count > 0, "There is no free cell for the apple"
+        # The index of the apple in the list of free cells (the same as choosing from the list of free cells)
+        index = self.rng.int(0, self.__free_count - 1)
+        block_size = self.__block_size
+        for block, free_count in enumerate(self.__free_counts):
+            if index < free_count:
+                break
+            index -= free_count
+        counts, cell = self.__counts, block * block_size - 1
+        end = min(cell + 1 + block_size, len(counts))
+        for _ in range(index + 1):
+            cell = counts.index(0, cell + 1, end)
+        return Point(cell // self.height, cell % self.height)
 
     def reset(self, seed: Optional[int] = None) -> Point:
         """
@@ -82,7 +130,7 @@ class SnakeEnv(Environment[SnakeObservation, Direction]):
         # TODO add your code here
         # IMPORTANT NOTE: Define the snake before calling generate_random_apple
         # NotImplemented()
-        self.snake = [Point(self.width // 2, self.height // 2)]
+        self.snake = (Point(self.width // 2, self.height // 2),)
         self.direction = Direction.LEFT
         self.apple = self.generate_random_apple()
 
@@ -157,21 +205,24 @@ class SnakeEnv(Environment[SnakeObservation, Direction]):
             head = Point(head.x, (head.y - 1) % self.height)
         elif self.direction == Direction.DOWN:
             head = Point(head.x, (head.y + 1) % self.height)
+        snake, height = self.__snake, self.height
+        head_cell = head.x * height + head.y
         # check if the snake bites itself
-        if head in self.snake:
+        if self.__counts[head_cell] != 0:
             done = True
             reward += -100
-        try:
-            # check if the snake eats the apple
-            if head == self.apple:
-                self.snake.insert(0, head)
-                reward += 1
+        snake.appendleft(head)
+        self.__occupy(head_cell)
+        # check if the snake eats the apple
+        apple = self.apple
+        if apple is not None and head.x == apple.x and head.y == apple.y:
+            reward += 1
+            # if the snake covers all the cells, there is no place for a new apple, so the apple is not changed
+            if self.__free_count > 0:
                 self.apple = self.generate_random_apple()
-            else:
-                self.snake.insert(0, head)
-                self.snake.pop()
-        except:
-            pass
+        else:
+            tail = snake.pop()
+            self.__release(tail.x * height + tail.y)
         # check if the snake wins
         if len(self.snake) == self.width * self.height:
             done = True
@@ -194,7 +245,7 @@ class SnakeEnv(Environment[SnakeObservation, Direction]):
                 if p == self.snake[0]:
                     char = ">^<v"[self.direction]
                     print(char, end="")
-                elif p in self.snake:
+                elif self.__counts[x * self.height + y] != 0:
                     print("*", end="")
                 elif p == self.apple:
                     print("$", end="")
@@ -3,23 +3,18 @@ from value_iteration import ValueIterationAgent
 from policy_iteration import PolicyIterationAgent
 from helpers.rl_utils import *
 from reinforcement_learning import RLAgent, SARSALearningAgent, QLearningAgent, ApproximateQLearningAgent
-from training_loops import q_agent_training_loop, sarsa_agent_training_loop
+from training_loops import q_agent_training_loop, replay_q_agent_training_loop, sarsa_agent_training_loop, vector_q_agent_training_loop, vector_sarsa_agent_training_loop
+from vector_env import VectorEnv
 from features_grid import GridFeatureExtractor
 import argparse, time
 
 # Prints the training results to the console
 def print_results(env: GridEnv, agent: Agent[Point, Direction]):
     size = env.mdp.size
-    if isinstance(agent, ValueIterationAgent):
+    if isinstance(agent, (ValueIterationAgent, PolicyIterationAgent)):
         print("Utility:")
         print(format_utilities(extract_utilities(env, agent), size))
         print()
-    if isinstance(agent, PolicyIterationAgent):
-        print("Utility:")
-        print(format_utilities(extract_utilities(env, agent), size))
-        print("Policy:")
-        print(format_utilities(extract_policy(env, agent), size))
-        print()
     elif isinstance(agent, RLAgent):
         print("Q-Values:")
         print(format_q_values(extract_q_values(env, agent), size))
@@ -42,7 +37,7 @@ def train_value_iteration(args: argparse.Namespace):
     env.reset()
 
     # Create the Value iteration agent
-    agent = ValueIterationAgent(mdp, args.discount)
+    agent = ValueIterationAgent(mdp, args.discount, compiled=args.compiled, mode=args.mode)
 
     print_frequency = args.verbosity # How frequently should the agent results be printed
     tolerance = args.tolerance
@@ -79,14 +74,15 @@ def train_policy_iteration(args: argparse.Namespace):
     env = GridEnv(mdp)
     env.reset()
 
-    # Create the Value iteration agent
-    agent = PolicyIterationAgent(mdp, args.discount)
+    # Create the Policy iteration agent
+    agent = PolicyIterationAgent(mdp, args.discount, args.evaluation, args.sweeps)
 
     print_frequency = args.verbosity # How frequently should the agent results be printed
+    tolerance = args.tolerance
 
-    # Apply value iteration for the given number of iterations 
+    # Apply policy iteration for the given number of iterations 
     for iteration in range(int(args.iterations)):
-        converged = agent.update()
+        converged = agent.update(tolerance)
         if converged:
             print(f"Coverged in {iteration + 1} iterations")
             break
@@ -124,8 +120,12 @@ def train_sarsa(args: argparse.Namespace):
             print(f"Results after {iteration} iterations:")
             print_results(env, agent)
     
-    # Run the SARSA agent training loop
-    sarsa_agent_training_loop(env, agent, args.iterations, args.step_limit, args.seed, callback)
+    # Run the SARSA agent training loop (on copies of the environment if requested)
+    if args.envs > 1:
+        envs = VectorEnv([env] + [GridEnv(env.mdp) for _ in range(args.envs - 1)]) # The copies share the MDP of the environment
+        vector_sarsa_agent_training_loop(envs, agent, args.iterations, args.step_limit, args.seed, callback)
+    else:
+        sarsa_agent_training_loop(env, agent, args.iterations, args.step_limit, args.seed, callback)
     
     # print the agent results (Q-values & Policy) after training was finished
     print("Final Results:")
@@ -143,7 +143,7 @@ def train_q_learning(args: argparse.Namespace):
         agent = QLearningAgent(ACTIONS, args.discount, args.epsilon, args.learning_rate, args.seed)
     elif agent_type == "q_learning_approx":
         print("Training a Approximate Q Learning Agent...")
-        agent = ApproximateQLearningAgent(GridFeatureExtractor(), ACTIONS, args.discount, args.epsilon, args.learning_rate)
+        agent = ApproximateQLearningAgent(GridFeatureExtractor(), ACTIONS, args.discount, args.epsilon, args.learning_rate, vectorized=args.vectorized)
     else:
         print(f"Requested Agent '{agent_type}' is invalid")
         exit(-1)
@@ -162,8 +162,16 @@ def train_q_learning(args: argparse.Namespace):
             print(f"Results after {iteration} iterations:")
             print_results(env, agent)
     
-    # Run the Q-learning agent training loop
-    q_agent_training_loop(env, agent, args.iterations, args.step_limit, args.seed, callback)
+    # Run the Q-learning agent training loop (on copies of the environment or using experience replay if requested)
+    if args.replay > 0:
+        from replay_buffer import ReplayBuffer
+        buffer = ReplayBuffer(args.replay, ACTIONS, args.seed, args.prioritized)
+        replay_q_agent_training_loop(env, agent, buffer, args.iterations, args.step_limit, args.seed, args.batch_size, callback)
+    elif args.envs > 1:
+        envs = VectorEnv([env] + [GridEnv(env.mdp) for _ in range(args.envs - 1)]) # The copies share the MDP of the environment
+        vector_q_agent_training_loop(envs, agent, args.iterations, args.step_limit, args.seed, callback)
+    else:
+        q_agent_training_loop(env, agent, args.iterations, args.step_limit, args.seed, callback)
     
     # print the agent results (Q-values & Policy) after training was finished
     print("Final Results:")
@@ -179,7 +187,7 @@ def main(args: argparse.Namespace):
     agent_type: str = args.agent
     if agent_type == "value_iteration":
         train_value_iteration(args)
-    if agent_type == "policy_iteration":
+    elif agent_type == "policy_iteration":
         train_policy_iteration(args)
     elif agent_type == "sarsa":
         train_sarsa(args)
@@ -199,7 +207,24 @@ if __name__ == "__main__":
     parser.add_argument("level", type=str, help="path to the level to play")
     parser.add_argument("model", type=str, help="path to the model to save after training")
     parser.add_argument("--iterations", "-i", type=int, default=100, help="the number of training iteration")
-    parser.add_argument("--tolerance", "-t", type=float, default=0, help="the tolerence of the convergence check in Value Iteration")
+    parser.add_argument("--tolerance", "-t", type=float, default=0, help="the tolerence of the convergence check in Value Iteration (and the iterative Policy Iteration)")
+    parser.add_argument("--compiled", action="store_true", default=False,
+                        help="compile the MDP into arrays to speed up the updates (For Value Iteration Only)")
+    parser.add_argument("--mode", type=str, default="synchronous", choices=ValueIterationAgent.MODES,
+                        help="how the utilities are updated in every sweep (For Value Iteration Only)")
+    parser.add_argument("--evaluation", type=str, default="exact", choices=["exact", "iterative"],
+                        help="the policy evaluation method (For Policy Iteration Only)")
+    parser.add_argument("--sweeps", type=int, default=20,
+                        help="the number of sweeps per iterative policy evaluation (For Policy Iteration Only)")
+    parser.add_argument("--vectorized", action="store_true", default=False,
+                        help="store the weights in a NumPy matrix and the features in NumPy arrays (For Approximate Q-Learning Only)")
+    parser.add_argument("--envs", type=int, default=1,
+                        help="the number of environment copies stepped in lockstep during training (For SARSA & Q-Learning Only)")
+    parser.add_argument("--replay", type=int, default=0,
+                        help="if positive, the capacity of the experience replay buffer used for training (For Q-Learning Only)")
+    parser.add_argument("--prioritized", action="store_true", default=False,
+                        help="sample the replayed transitions with probabilities proportional to their TD errors (For Q-Learning Only)")
+    parser.add_argument("--batch-size", type=int, default=32, help="the number of replayed transitions per update (For Q-Learning Only)")
     parser.add_argument("--step-limit", "-sl", type=int, default=100,
                         help="the maximum number of steps per episode (For SARSA & Q-Learning Only)")
     parser.add_argument("--discount", "-d", type=float, default=0.9, help="the discount factor")
@@ -0,0 +1,124 @@
+from typing import Dict, Tuple
+from snake import SnakeEnv, SnakeObservation
+from reinforcement_learning import ApproximateQLearningAgent
+from features_snake import SnakeFeatureExtractor
+from training_loops import vector_q_agent_training_loop
+from vector_env import VectorEnv
+from evaluate_snake import ACTIONS, evaluate_agent, format_evaluation, summarize_evaluations, format_summary
+from helpers.rl_utils import format_weights
+from mathutils import Direction
+import argparse, time
+
+# This script trains an approximate Q-learning agent on the snake environment using the snake features (see "features_snake.py")
+# The agent is trained on copies of the environment stepped in lockstep (see "vector_env.py"),
+# which can be stepped in worker processes (see "--processes"),
+# then it is evaluated over many seeded episodes (see "evaluate_snake.py") and its weights are saved to the model file.
+# A single training run says little about the training itself (some seeds learn to circle forever while others
+# eat most of the apples), so the agent is trained once for every seed in "--runs" (seed, seed + 1, ...),
+# the evaluation of every run is printed with the mean, the standard deviation and the range over the runs,
+# and the weights of the run with the best average score are saved.
+
+# A snake environment used for training which starves the snake: the episode ends if the snake does not eat an apple
+# for "starvation_limit" steps (0 disables the limit) and "starvation_reward" is added to the reward of the last step.
+# Since the snake environment gives no reward for wandering around, a snake that circles forever
+# is as good as a snake that eats the apple later, so the agent has no reason to go for the apple.
+# NOTE: The class is defined at the module level so that it can be sent to the worker processes (see "--processes").
+class StarvingSnakeEnv(SnakeEnv):
+    def __init__(self, width: int, height: int, starvation_limit: int, starvation_reward: float) -> None:
+        super().__init__(width, height)
+        self.starvation_limit = starvation_limit
+        self.starvation_reward = starvation_reward
+        self.hunger = 0 # the number of steps since the snake ate an apple (or since the episode started)
+
+    def reset(self, seed=None) -> SnakeObservation:
+        self.hunger = 0
+        return super().reset(seed)
+
+    def step(self, action: Direction) -> Tuple[SnakeObservation, float, bool, Dict]:
+        length = len(self.snake)
+        observation, reward, done, info = super().step(action)
+        self.hunger = 0 if len(observation.snake) > length else self.hunger + 1
+        if not done and self.starvation_limit > 0 and self.hunger >= self.starvation_limit:
+            done = True
+            reward += self.starvation_reward
+        return observation, reward, done, info
+
+def main(args: argparse.Namespace):
+    start = time.time() # Track run time
+
+    size = [int(dim) for dim in args.size]
+    if len(size) == 1: size *= 2 # If only one value for size was sent, use it as width and height
+    width, height = size
+    # By default, the snake starves if it does not eat an apple for as many steps as there are cells
+    starvation_limit = width * height if args.starvation_limit < 0 else args.starvation_limit
+
+    best_agent, best_score, all_results = None, None, []
+    for seed in range(args.seed, args.seed + args.runs):
+        print(f"Training a Approximate Q Learning Agent (seed: {seed})...")
+        agent = ApproximateQLearningAgent(SnakeFeatureExtractor(), ACTIONS, args.discount, args.epsilon, args.learning_rate,
+                                          seed, vectorized=args.vectorized)
+        envs = VectorEnv.from_factory(lambda: StarvingSnakeEnv(width, height, starvation_limit, args.starvation_reward),
+                                      args.envs, args.processes)
+
+        # This callback function will be called after every agent update
+        # It will be used to evaluate the agent and print the results if requested
+        def callback(iteration):
+            if args.verbosity != 0 and iteration % args.verbosity == 0:
+                results = evaluate_agent(SnakeEnv(width, height), agent, args.eval_episodes, args.eval_step_limit, args.eval_seed)
+                print(f"Results after {iteration} iterations: {format_evaluation(results)}")
+
+        training_start = time.perf_counter()
+        vector_q_agent_training_loop(envs, agent, args.iterations, args.step_limit, seed, callback)
+        training_time = time.perf_counter() - training_start
+        envs.close()
+        print(f"Trained for {args.iterations} steps in {training_time:.2f} seconds ({args.iterations / training_time:.0f} steps/s)")
+
+        # The agent is evaluated on the original environment (without starvation)
+        results = evaluate_agent(SnakeEnv(width, height), agent, args.eval_episodes, args.eval_step_limit, args.eval_seed)
+        print(format_evaluation(results))
+        all_results.append(results)
+        if best_score is None or results["score"] > best_score:
+            best_agent, best_score = agent, results["score"]
+
+    # print the agent results (Weights & Evaluation) after training was finished
+    print("Final Results:")
+    print(format_weights(best_agent.weights))
+    print()
+    print(f"Over {args.runs} training runs: {format_summary(summarize_evaluations(all_results))}")
+
+    # save the model weights to a file
+    best_agent.save(SnakeEnv(width, height), args.model)
+
+    # Finally print the elapsed time for the whole process
+    print(f"Elapsed time: {time.time() - start} seconds")
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Train an approximate Q-learning agent to play snake")
+    parser.add_argument("model", type=str, help="path to the model to save after training")
+    parser.add_argument("size", type=int, nargs="*", default=[5, 5], help="The size of the level")
+    parser.add_argument("--iterations", "-i", type=int, default=200000, help="the number of training iteration")
+    parser.add_argument("--runs", "-r", type=int, default=5, help="the number of training runs (every run uses the next seed)")
+    parser.add_argument("--envs", type=int, default=8, help="the number of environment copies stepped in lockstep during training")
+    parser.add_argument("--processes", "-p", type=int, default=0,
+                        help="the number of worker processes that step the environment copies (0 steps them in the current process)")
+    parser.add_argument("--step-limit", "-sl", type=int, default=1000, help="the maximum number of steps per training episode")
+    parser.add_argument("--starvation-limit", type=int, default=-1,
+                        help="end a training episode if the snake does not eat for this number of steps (-1 uses the number of cells, 0 disables it)")
+    parser.add_argument("--starvation-reward", type=float, default=-1, help="the reward added when the snake starves")
+    parser.add_argument("--discount", "-d", type=float, default=0.9, help="the discount factor")
+    parser.add_argument("--epsilon", "-e", type=float, default=0.1, help="the epsilon value of the e-greedy exploration")
+    parser.add_argument("--learning-rate", "-lr", type=float, default=0.001, help="the learning rate")
+    parser.add_argument("--vectorized", action=argparse.BooleanOptionalAction, default=True,
+                        help="store the weights in a NumPy matrix and the features in NumPy arrays")
+    parser.add_argument("--seed", "-s", type=int, default=time.time_ns(), help="the seed value of the first training run (To ensure reproducibility)")
+    parser.add_argument("--eval-episodes", type=int, default=100, help="the number of evaluation episodes")
+    parser.add_argument("--eval-step-limit", type=int, default=1000, help="the maximum number of steps per evaluation episode")
+    parser.add_argument("--eval-seed", type=int, default=0, help="the seed value used to seed the evaluation episodes")
+    parser.add_argument("--verbosity", "-v", type=int, default=0, help="How often to evaluate the agent during training (0 will evaluate at the end only)")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!")
@@ -1,8 +1,12 @@
-from typing import Callable, Optional, Union
+from typing import TYPE_CHECKING, Callable, Optional, Union
 from environment import Environment
 from helpers.mt19937 import RandomGenerator
 from mdp import A, S
 from base_rl import RLAgent
+from vector_env import VectorEnv
+
+if TYPE_CHECKING:
+    from replay_buffer import ReplayBuffer # The replay buffer requires NumPy, so it is not imported at runtime
 
 # This training loop is used to train a SARSA agent
 # It does not store any experience; instead it updates the agent as soon as a transition is done
@@ -83,4 +87,145 @@ def q_agent_training_loop(
         # if the episode ended or we spent to long in it, we restart the episode
         if done or step == step_limit:
             state = env.reset(seed_gen.generate())
-            step = 0
\ No newline at end of file
+            step = 0
+
+# This training loop is used to train a SARSA agent on a vectorized environment (see "vector_env.py")
+# Every round, the agent acts in every environment, then all the environments are stepped together
+# and the agent is updated using the transitions of the environments one after the other.
+# Every environment has its own previous transition and step count,
+# and its seeds (on every reset) are drawn from a single seed generator.
+# NOTE: Like "sarsa_agent_training_loop", the updates of the last round are completed,
+# so the number of updates may exceed the requested iterations by less than twice the number of environments.
+# With a single environment, it is equivalent to "sarsa_agent_training_loop".
+def vector_sarsa_agent_training_loop(
+    envs: VectorEnv[S, A], agent: RLAgent[S, A],
+    iterations: int, step_limit: int, seed: int,
+    callback: Optional[Callable[[int], None]] = None):
+
+    count = len(envs)
+    prev_transitions = [None] * count # This will store the previous State, Action & Reward of every environment
+    dones = [False] * count # Store whether the past transition of every environment lead to a terminal state
+    steps = [0] * count # the number of steps taking in the current episode of every environment
+
+    seed_gen = RandomGenerator(seed) # a random seed generator used to seed the environments on reset
+
+    states = envs.reset([seed_gen.generate() for _ in range(count)]) # reset the environments and retrieve the initial states
+
+    # loop for a certain number of updates
+    iteration = 0
+    while iteration < iterations:
+
+        # if an episode ended or we spent to long in it, we restart the episode of its environment
+        for index, env in enumerate(envs.envs):
+            if dones[index] or steps[index] == step_limit:
+                if dones[index]: # if this is a terminal state, we update the agent where next_action = None
+                    agent.update(env, *prev_transitions[index], states[index], None)
+                    if callback: callback(iteration) # call the callback after every update
+                    iteration += 1
+                # reset the environment, steps and clear the previous transition
+                states[index] = envs.reset_at(index, seed_gen.generate())
+                steps[index] = 0
+                prev_transitions[index] = None
+
+        # Ask the agent for an action in every environment in training mode to enable exploration (if epsilon > 0)
+        actions = [agent.act(env, state, training=True) for env, state in zip(envs.envs, states)]
+        # Act on the environments
+        next_states, rewards, dones, _ = envs.step(actions)
+
+        for index, env in enumerate(envs.envs):
+            # if there is previous transition stored, we update the agent
+            if prev_transitions[index] is not None:
+                agent.update(env, *prev_transitions[index], states[index], actions[index])
+                steps[index] += 1
+                if callback: callback(iteration) # call the callback after every update
+                iteration += 1
+
+            prev_transitions[index] = (states[index], actions[index], rewards[index]) # store the new transition
+
+        states = next_states # move to the new states
+
+# This training loop is used to train a Q-Learning agent (tabular or approximate) on a vectorized environment (see "vector_env.py")
+# Every round, the agent acts in every environment, then all the environments are stepped together
+# and the agent is updated using the transitions of the environments one after the other.
+# Every environment has its own step count, and its seeds (on every reset) are drawn from a single seed generator.
+# With a single environment, it is equivalent to "q_agent_training_loop".
+def vector_q_agent_training_loop(
+    envs: VectorEnv[S, A], agent: RLAgent[S, A],
+    iterations: int, step_limit: int, seed: int,
+    callback: Optional[Callable[[int], None]] = None):
+
+    count = len(envs)
+    seed_gen = RandomGenerator(seed) # a random seed generator used to seed the environments on reset
+
+    states = envs.reset([seed_gen.generate() for _ in range(count)]) # reset the environments and retrieve the initial states
+
+    steps = [0] * count # the number of steps taking in the current episode of every environment
+
+    # loop for a certain number of updates
+    iteration = 0
+    while iteration < iterations:
+
+        # Ask the agent for an action in every environment in training mode to enable exploration (if epsilon > 0)
+        actions = [agent.act(env, state, training=True) for env, state in zip(envs.envs, states)]
+        # Act on the environments
+        next_states, rewards, dones, _ = envs.step(actions)
+
+        for index, env in enumerate(envs.envs):
+            if iteration == iterations: break
+
+            # update the agent
+            agent.update(env, states[index], actions[index], rewards[index], next_states[index], dones[index])
+            if callback: callback(iteration) # call the callback after every update
+            iteration += 1
+
+            steps[index] += 1
+
+            # if the episode ended or we spent to long in it, we restart the episode
+            if dones[index] or steps[index] == step_limit:
+                next_states[index] = envs.reset_at(index, seed_gen.generate())
+                steps[index] = 0
+
+        states = next_states # move to the new states
+
+# This training loop is used to train a Q-Learning agent (tabular or approximate) using experience replay
+# Every transition is stored in the replay buffer (see "replay_buffer.py") and, once the buffer has at least "batch_size" transitions,
+# the agent is updated using a batch sampled from the buffer after every step (instead of the transition itself).
+# If the buffer uses prioritized sampling, the priorities of the sampled transitions are updated using their TD errors.
+# NOTE: The batches are sampled from the random generator of the buffer, so the buffer should be created with a seed
+# to ensure reproducibility.
+def replay_q_agent_training_loop(
+    env: Environment[S, A], agent: RLAgent[S, A], buffer: 'ReplayBuffer[S, A]',
+    iterations: int, step_limit: int, seed: int, batch_size: int = 32,
+    callback: Optional[Callable[[int], None]] = None):
+
+    seed_gen = RandomGenerator(seed) # a random seed generator used to seed the environment on reset
+
+    state = env.reset(seed_gen.generate()) # reset the environment and retrieve the initial state
+
+    step = 0 # the number of steps taking in the current episode
+
+    # loop for a certain number of steps
+    for iteration in range(iterations):
+
+        # Ask the agent for an action in training mode to enable exploration (if epsilon > 0)
+        action = agent.act(env, state, training=True)
+        # Act on the environment
+        next_state, reward, done, _ = env.step(action)
+
+        # store the transition then update the agent using a batch of stored transitions
+        buffer.add(state, action, reward, next_state, done)
+        if len(buffer) >= batch_size:
+            batch = buffer.sample(batch_size)
+            td_errors = agent.update_batch(env, batch)
+            if buffer.prioritized:
+                buffer.update_priorities(batch.indices, td_errors)
+        if callback: callback(iteration) # call the callback after every step
+
+        state = next_state # move to the new state
+
+        step += 1
+
+        # if the episode ended or we spent to long in it, we restart the episode
+        if done or step == step_limit:
+            state = env.reset(seed_gen.generate())
+            step = 0
@@ -1,8 +1,13 @@
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 from agents import Agent
 from environment import Environment
 from mdp import MarkovDecisionProcess, S, A
-import json
+import heapq, itertools, json
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 from helpers.utils import NotImplemented
 
@@ -10,19 +15,69 @@ from helpers.utils import NotImplemented
 # This is a class for a generic Value Iteration agent
 class ValueIterationAgent(Agent[S, A]):
     mdp: MarkovDecisionProcess[S, A]  # The MDP used by this agent for training
-    utilities: Dict[S, float]  # The computed utilities
+    # utilities: Dict[S, float]  # The computed utilities (a property, see below)
     # The key is the string representation of the state and the value is the utility
     discount_factor: float  # The discount factor (gamma)
+    compiled_mdp: Optional["CompiledMDP[S, A]"]  # The compiled MDP (if the agent is compiled, otherwise None)
+    mode: str  # How the utilities are updated ("synchronous", "gauss_seidel" or "prioritized")
+
+    MODES = ("synchronous", "gauss_seidel", "prioritized")
 
+    # If compiled is True, the MDP is compiled into arrays (see "mdp_compiler.py") when the agent is created,
+    # and every update applies the bellman equation to all the states at once using NumPy.
+    # The results (and the number of iterations till convergence) are identical to the uncompiled agent.
+    # NOTE: The compiled agent uses the MDP as it was when the agent was created (later changes to the MDP are ignored).
+    # The mode selects how every update (a sweep) applies the bellman equation:
+    #   - "synchronous": computes the new utilities of all the states from the old utilities.
+    #   - "gauss_seidel": updates the utilities in place, so the later states in the sweep use the new utilities
+    #     of the earlier states.
+    #   - "prioritized": (prioritized sweeping) keeps a priority queue of the states ordered by (an upper bound on)
+    #     their bellman error |bellman(s) - U(s)|, and repeatedly updates the state with the largest error.
+    #     After a state is updated, only the errors of its predecessors (the states that can reach it in one step)
+    #     can change, so only their priorities are raised (using an index of the predecessors of every state).
+    #     A sweep is as many updates as the number of states (about the same work as a synchronous sweep),
+    #     and the utilities have converged when no state has an error greater than or equal to the tolerance.
+    # The asynchronous modes usually converge in fewer sweeps than the synchronous one, but the utilities after
+    # a given number of sweeps are different (they converge to the same utilities).
+    # The compiled agent only supports the synchronous mode.
     def __init__(
-        self, mdp: MarkovDecisionProcess[S, A], discount_factor: float = 0.99
+        self,
+        mdp: MarkovDecisionProcess[S, A],
+        discount_factor: float = 0.99,
+        compiled: bool = False,
+        mode: str = "synchronous",
     ) -> None:
         super().__init__()
+        if mode not in ValueIterationAgent.MODES:
+            raise ValueError(f"Unknown value iteration mode: {mode}")
+        if compiled and mode != "synchronous":
+            raise ValueError(f"The compiled agent does not support the {mode} mode")
         self.mdp = mdp
         self.utilities = {
             state: 0 for state in self.mdp.get_states()
         }  # We initialize all the utilities to be 0
         self.discount_factor = discount_factor
+        self.mode = mode
+        self.__predecessors = None
+        self.compiled_mdp = None
+        if compiled:
+            from mdp_compiler import CompiledMDP
+            self.compiled_mdp = CompiledMDP(mdp)
+
+    # The utilities of the compiled agent are stored in an array (self.__values) during training,
+    # and they are only converted to a dictionary when they are requested
+    @property
+    def utilities(self) -> Dict[S, float]:
+        if self.__values is not None:
+            self.__utilities = self.compiled_mdp.to_dict(self.__values)
+            self.__values = None
+        return self.__utilities
+
+    @utilities.setter
+    def utilities(self, utilities: Dict[S, float]):
+        self.__utilities = utilities
+        self.__values = None
+        self.__queue = None # The priorities must be recomputed for the new utilities (in the prioritized mode)
 
     # Given a state, compute its utility using the bellman equation
     # if the state is terminal, return 0
@@ -38,12 +93,13 @@ class ValueIterationAgent(Agent[S, A]):
         # U(s) = max( sum( P(s'|s,a) * (R(s,a,s') + gamma * U(s')) for s' in S ) for a in A )
         # where S is the set of all neighbors states of the current state and A is the set of all possible actions at this state
         # self.mdp.get_successor(state, action)[next_state] gives the probability of next_state given state and action
+        utilities = self.utilities
         utility = max(
             sum(
                 self.mdp.get_successor(state, action)[next_state]
                 * (
                     self.mdp.get_reward(state, action, next_state)
-                    + self.discount_factor * self.utilities[next_state]
+                    + self.discount_factor * utilities[next_state]
                 )
                 for next_state in self.mdp.get_successor(state, action)
             )
@@ -57,6 +113,13 @@ class ValueIterationAgent(Agent[S, A]):
     # then returns True if the utilities has converged (the maximum utility change is less or equal the tolerance)
     # and False otherwise
     def update(self, tolerance: float = 0) -> bool:
+        if self.compiled_mdp is not None:
+            return self.__update_compiled(tolerance)
+        if self.mode == "gauss_seidel":
+            return self.__update_gauss_seidel(tolerance)
+        if self.mode == "prioritized":
+            return self.__update_prioritized(tolerance)
+
         # TODO: Complete this function
         # NotImplemented()
 
@@ -83,6 +146,94 @@ class ValueIterationAgent(Agent[S, A]):
         # return True if the maximum change in the utilities is less than to the tolerance , otherwise return False
         return max_change < tolerance
 
+    # The same as "update" but all the states are updated at once using the compiled MDP
+    def __update_compiled(self, tolerance: float) -> bool:
+        values = self.__values
+        if values is None:
+            values = self.compiled_mdp.to_array(self.__utilities)
+        updated_values = self.compiled_mdp.bellman(values, self.discount_factor)
+        max_change = float(np.abs(updated_values - values).max(initial=0))
+        self.__values = updated_values
+        return max_change < tolerance
+
+    # The same as "update" but the utilities are updated in place (Gauss-Seidel)
+    def __update_gauss_seidel(self, tolerance: float) -> bool:
+        utilities = self.utilities
+        max_change = 0
+        for state in self.mdp.get_states():
+            utility = self.compute_bellman(state)
+            max_change = max(max_change, abs(utility - utilities[state]))
+            utilities[state] = utility
+        return max_change < tolerance
+
+    # Returns a dictionary that maps every state to its predecessors (the states that can reach it using a single action)
+    # Every predecessor is paired with the maximum probability of reaching the state from it (over all the actions)
+    def __get_predecessors(self) -> Dict[S, List[Tuple[S, float]]]:
+        if self.__predecessors is None:
+            predecessors = {state: {} for state in self.mdp.get_states()}
+            for state in self.mdp.get_states():
+                if self.mdp.is_terminal(state): continue
+                for action in self.mdp.get_actions(state):
+                    for next_state, probability in self.mdp.get_successor(state, action).items():
+                        if probability > predecessors[next_state].get(state, 0):
+                            predecessors[next_state][state] = probability
+            self.__predecessors = {state: list(states.items()) for state, states in predecessors.items()}
+        return self.__predecessors
+
+    # The same as "update" but it applies a sweep of prioritized sweeping
+    # The bound of every state is an upper bound on its bellman error. When the utility of a state changes by "delta",
+    # the bellman error of each of its predecessors can change by at most gamma * P(s|predecessor, a) * |delta|,
+    # so this value is added to the predecessor's bound (without recomputing its bellman equation).
+    # The bounds of all the states are kept (even if they are less than the tolerance, since many small changes can add up),
+    # and the bound of a state is only reset to 0 when its utility is updated (its bellman error is 0 right after the update).
+    # The queue is a heap of (-bound, counter, state) that contains the states whose bounds are greater than or equal to
+    # the tolerance. Since the heap entries cannot be updated, a new entry is pushed whenever the bound of a state changes,
+    # and the old entries are skipped when they are popped.
+    def __update_prioritized(self, tolerance: float) -> bool:
+        utilities = self.utilities
+        if self.__queue is None:
+            self.__bounds: Dict[S, float] = {
+                state: abs(self.compute_bellman(state) - utilities[state]) for state in self.mdp.get_states()
+            }
+            self.__tolerance = None
+        if self.__tolerance != tolerance:
+            # The queue only contains the states whose bounds reach the tolerance, so it is rebuilt if the tolerance changes
+            self.__tolerance = tolerance
+            self.__queue: List[Tuple[float, int, S]] = []
+            self.__counter = itertools.count()
+            for state, bound in self.__bounds.items():
+                self.__push(state, bound)
+        predecessors = self.__get_predecessors()
+        bounds, queue = self.__bounds, self.__queue
+        for _ in range(len(utilities)):
+            if not self.__discard_old_entries(): break
+            _, _, state = heapq.heappop(queue)
+            bounds[state] = 0
+            utility = self.compute_bellman(state)
+            change = abs(utility - utilities[state])
+            utilities[state] = utility
+            if change == 0: continue
+            for predecessor, probability in predecessors[state]:
+                bound = bounds[predecessor] + self.discount_factor * probability * change
+                bounds[predecessor] = bound
+                self.__push(predecessor, bound)
+        # The utilities have converged if the bounds on the bellman errors of all the states are less than the tolerance
+        return not self.__discard_old_entries()
+
+    # Pushes a state to the queue of prioritized sweeping if its bound is greater than or equal to the tolerance
+    # (and not 0, so the queue gets empty when the utilities stop changing even if the tolerance is 0)
+    def __push(self, state: S, bound: float):
+        if bound >= self.__tolerance and bound != 0:
+            heapq.heappush(self.__queue, (-bound, next(self.__counter), state))
+
+    # Pops the old entries (whose bounds were changed after they were pushed) from the top of the queue of prioritized sweeping
+    # then returns whether the queue still has any states
+    def __discard_old_entries(self) -> bool:
+        bounds, queue = self.__bounds, self.__queue
+        while queue and bounds[queue[0][2]] != -queue[0][0]:
+            heapq.heappop(queue)
+        return bool(queue)
+
     # This function applies value iteration starting from the current utilities stored in the agent and stores the new utilities in the agent
     # NOTE: this function does incremental update and does not clear the utilities to 0 before running
     # In other words, calling train(M) followed by train(N) is equivalent to just calling train(N+M)
@@ -0,0 +1,165 @@
+from typing import Callable, Dict, Generic, List, Optional, Tuple
+from environment import Environment
+from mdp import S, A
+import multiprocessing, sys
+
+# This file contains a vectorized environment which runs N independent copies of an environment (e.g. GridEnv or SnakeEnv)
+# in lockstep: every call to "step" applies one action to every copy and returns the lists of results.
+# Every copy has its own random generator, so it must be reset with its own seed (see "vector_*_training_loop"
+# in "training_loops.py" where the seeds are drawn from a single seed generator).
+# By default, the copies are stepped one after the other in the current process.
+# If "processes" is positive, the copies are split into that many contiguous chunks and every chunk is stepped
+# in a worker process. Every call sends a single message (e.g. the actions of the whole chunk) to every worker
+# before waiting for any result, so the workers step their chunks in parallel, then the results of every chunk
+# are received as a single message. Only the environment steps run in the workers; the agent still acts and learns
+# in the current process, so this only pays off if the environment steps are expensive compared to the
+# cost of sending the states through the pipes (and if there are enough free cores).
+# In that mode, "envs" contains a view of every copy (see "EnvironmentView" below) which should be passed to the agents.
+# To share the data that does not change (e.g. the MDP of a grid and its cached successors), create the copies
+# from the same object, for example: VectorEnv.from_factory(lambda: GridEnv(mdp), 8).
+# NOTE: In process mode, every worker gets its own copy of the shared data.
+
+# A view of an environment stepped in a worker process.
+# It returns the actions of the remote copy (sent along with the results of every step and reset),
+# and forwards everything else (e.g. the level size or the formatting functions) to the local copy of the environment,
+# which is never stepped, so its static data is still valid but its current state is not.
+class EnvironmentView(Generic[S, A]):
+    env: Environment[S, A]  # The local copy of the environment
+
+    def __init__(self, env: Environment[S, A]) -> None:
+        self.env = env
+        self.current_actions: List[A] = []
+
+    def __getattr__(self, name: str):
+        return getattr(self.env, name)
+
+    def actions(self) -> List[A]:
+        return self.current_actions
+
+# The loop of a worker process which owns a chunk of the environment copies
+# Every message is a command and its data, and every result is sent back as a single message.
+# The actions of the environments are sent with the states, so that the agents can act without asking the worker.
+def step_worker(connection, envs: List[Environment]):
+    while True:
+        command, data = connection.recv()
+        if command == "step":
+            results = []
+            for env, action in zip(envs, data):
+                next_state, reward, done, info = env.step(action)
+                results.append((next_state, reward, done, info, env.actions()))
+            connection.send(results)
+        elif command == "reset":
+            connection.send([(env.reset(seed), env.actions()) for env, seed in zip(envs, data)])
+        elif command == "reset_at":
+            index, seed = data
+            connection.send((envs[index].reset(seed), envs[index].actions()))
+        elif command == "render":
+            for env in envs:
+                env.render()
+            sys.stdout.flush() # the output is flushed before answering so that it appears in order
+            connection.send(None)
+        else: # "close"
+            connection.close()
+            return
+
+class VectorEnv(Generic[S, A]):
+    envs: List[Environment[S, A]]  # The environment copies (or their views if they are stepped in worker processes)
+
+    def __init__(self, envs: List[Environment[S, A]], processes: int = 0) -> None:
+        assert len(envs) > 0, "A vectorized environment needs at least one environment"
+        self.workers = []       # The worker processes (empty if the copies are stepped in the current process)
+        self.connections = []   # The connections to the workers
+        self.chunks = []        # The (start, end) indices of the copies owned by every worker
+        if processes <= 0:
+            self.envs = list(envs)
+            return
+        self.envs = [EnvironmentView(env) for env in envs]
+        processes = min(processes, len(envs))
+        context = multiprocessing.get_context()
+        for worker_index in range(processes):
+            start, end = worker_index * len(envs) // processes, (worker_index + 1) * len(envs) // processes
+            connection, worker_connection = context.Pipe()
+            worker = context.Process(target=step_worker, args=(worker_connection, envs[start:end]), daemon=True)
+            worker.start()
+            worker_connection.close()
+            self.workers.append(worker)
+            self.connections.append(connection)
+            self.chunks.append((start, end))
+
+    # Creates a vectorized environment with "count" environments returned by the factory
+    @staticmethod
+    def from_factory(factory: Callable[[], Environment[S, A]], count: int, processes: int = 0) -> 'VectorEnv[S, A]':
+        return VectorEnv([factory() for _ in range(count)], processes)
+
+    # Returns the number of environments
+    def __len__(self) -> int:
+        return len(self.envs)
+
+    # Resets all the environments (the i-th environment is seeded with seeds[i]) and returns their initial states
+    def reset(self, seeds: Optional[List[Optional[int]]] = None) -> List[S]:
+        if seeds is None:
+            seeds = [None] * len(self.envs)
+        assert len(seeds) == len(self.envs), "A seed is required for every environment"
+        if not self.workers:
+            return [env.reset(seed) for env, seed in zip(self.envs, seeds)]
+        for connection, (start, end) in zip(self.connections, self.chunks):
+            connection.send(("reset", seeds[start:end]))
+        states = []
+        for connection, (start, _) in zip(self.connections, self.chunks):
+            for index, (state, actions) in enumerate(connection.recv(), start):
+                self.envs[index].current_actions = actions
+                states.append(state)
+        return states
+
+    # Resets the environment at the given index and returns its initial state
+    def reset_at(self, index: int, seed: Optional[int] = None) -> S:
+        if not self.workers:
+            return self.envs[index].reset(seed)
+        worker_index = next(i for i, (start, end) in enumerate(self.chunks) if start <= index < end)
+        connection = self.connections[worker_index]
+        connection.send(("reset_at", (index - self.chunks[worker_index][0], seed)))
+        state, self.envs[index].current_actions = connection.recv()
+        return state
+
+    # Returns the list of the possible actions of every environment
+    def actions(self) -> List[List[A]]:
+        return [env.actions() for env in self.envs]
+
+    # Applies actions[i] to the i-th environment and returns the lists of the next states, the rewards, the done flags and the infos
+    # NOTE: The environments are not reset automatically when they are done.
+    def step(self, actions: List[A]) -> Tuple[List[S], List[float], List[bool], List[Dict]]:
+        assert len(actions) == len(self.envs), "An action is required for every environment"
+        if not self.workers:
+            results = [env.step(action) for env, action in zip(self.envs, actions)]
+            next_states, rewards, dones, infos = (list(result) for result in zip(*results))
+            return next_states, rewards, dones, infos
+        for connection, (start, end) in zip(self.connections, self.chunks):
+            connection.send(("step", actions[start:end]))
+        next_states, rewards, dones, infos = [], [], [], []
+        for connection, (start, _) in zip(self.connections, self.chunks):
+            for index, (next_state, reward, done, info, env_actions) in enumerate(connection.recv(), start):
+                self.envs[index].current_actions = env_actions
+                next_states.append(next_state)
+                rewards.append(reward)
+                dones.append(done)
+                infos.append(info)
+        return next_states, rewards, dones, infos
+
+    # Renders every environment
+    def render(self):
+        if not self.workers:
+            for env in self.envs:
+                env.render()
+            return
+        for connection in self.connections: # The workers render one after the other to keep the output in order
+            connection.send(("render", None))
+            connection.recv()
+
+    # Stops the worker processes (if any)
+    def close(self):
+        for connection in self.connections:
+            connection.send(("close", None))
+            connection.close()
+        for worker in self.workers:
+            worker.join()
+        self.workers, self.connections, self.chunks = [], [], []